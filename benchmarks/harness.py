@@ -0,0 +1,319 @@
+"""
+Measure the throughput, latency and memory use of each algorithm and mode on the
+bundled corpora, and compare them with a baseline.
+
+Run from the root of the repository:
+
+python -m benchmarks.harness [--output results.json] [--baseline benchmarks/baseline.json]
+
+Each combination runs in a fresh process, so that its peak memory use isn't
+hidden by the previous ones, and is solved several times, keeping the fastest run.
+Nothing is downloaded.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Union
+
+from sudokusolver import pipeline, shared
+from sudokusolver.solver import Algorithm, CellSelection, State
+
+_CORPORA_PATH = Path(__file__).parent / "corpora"
+CORPORA = ["easy", "hard", "17clue"]
+MODES = ["sequential", "batch", "parallel", "shared"]
+# The modes which start a pool of processes for each run
+POOL_MODES = ["parallel", "shared"]
+REPEAT = 7
+
+# The latencies are None in the modes which don't return the stats of each puzzle
+Measurement = Dict[str, Union[str, int, float, None]]
+
+
+class Combination(NamedTuple):
+    """
+    What to measure
+    """
+
+    corpus: str
+    algorithm: Algorithm
+    mode: str
+
+
+def read_corpus(name: str) -> List[str]:
+    """
+    :return: the sdms of the bundled corpus
+    """
+    path = _CORPORA_PATH / f"{name}.sdm"
+    return path.read_text(encoding="utf-8").split()
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """
+    :return: the value below which the given fraction of the values are, with the
+    nearest-rank method
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _solve(combination: Combination, sdms: List[str]) -> List[pipeline.Result]:
+    cell_selection = CellSelection.FIRST_EMPTY
+    if combination.mode == "batch":
+        results = pipeline.solve_batches(
+            sdms,
+            algorithm=combination.algorithm,
+            cell_selection=cell_selection,
+            with_stats=True,
+        )
+    elif combination.mode == "parallel":
+        results = pipeline.solve_parallel(
+            sdms,
+            algorithm=combination.algorithm,
+            cell_selection=cell_selection,
+            options=pipeline.PoolOptions(ordered=True),
+            with_stats=True,
+        )
+    elif combination.mode == "shared":
+        results = shared.solve_shared(
+            sdms, algorithm=combination.algorithm, cell_selection=cell_selection
+        )
+    else:
+        results = pipeline.solve_sequential(
+            sdms,
+            algorithm=combination.algorithm,
+            cell_selection=cell_selection,
+            with_stats=True,
+        )
+    return list(results)
+
+
+def measure(combination: Combination, repeat: int = REPEAT) -> Measurement:
+    """
+    :return: the measurements of the fastest of repeat runs solving the corpus with
+    the algorithm and the mode. In the modes with a pool of processes, the time it
+    takes to start and stop the pool, measured by solving no puzzles, is left out of
+    the throughput. The latency of a puzzle is the time spent on it by the solver,
+    as recorded in its statistics, if the mode returns them.
+    """
+    sdms = read_corpus(combination.corpus)
+    runs = []
+    startups = []
+    for _ in range(repeat):
+        if combination.mode in POOL_MODES:
+            start = time.perf_counter()
+            _solve(combination, [])
+            startups.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        results = _solve(combination, sdms)
+        runs.append((time.perf_counter() - start, results))
+    seconds, results = min(runs, key=lambda run: run[0])
+    startup = min(startups, default=0.0)
+    latencies = [
+        stats.parse_seconds
+        + stats.propagate_seconds
+        + stats.search_seconds
+        + stats.validate_seconds
+        for stats in (result.stats for result in results)
+        if stats is not None
+    ]
+    # In kilobytes on Linux
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return {
+        "corpus": combination.corpus,
+        "algorithm": combination.algorithm.value,
+        "mode": combination.mode,
+        "puzzles": len(sdms),
+        "solved": sum(result.state == State.VALID for result in results),
+        "seconds": seconds,
+        "startup_seconds": startup,
+        "puzzles_per_second": len(sdms) / max(seconds - startup, 1e-6),
+        "p50_ms": 1000 * percentile(latencies, 0.5) if latencies else None,
+        "p99_ms": 1000 * percentile(latencies, 0.99) if latencies else None,
+        "peak_rss_kb": peak_rss,
+    }
+
+
+def _measure_in_child(combination: Combination, repeat: int, connection: Connection):
+    # Being spawned made spawn the start method of the pools of this process too:
+    # start them as the command line does
+    multiprocessing.set_start_method(None, force=True)
+    connection.send(measure(combination, repeat))
+    connection.close()
+
+
+def measure_in_process(combination: Combination, repeat: int = REPEAT) -> Measurement:
+    """
+    :return: the measurements of the combination, made in a fresh process
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_measure_in_child, args=(combination, repeat, sender)
+    )
+    process.start()
+    sender.close()
+    measurement = receiver.recv()
+    process.join()
+    return measurement
+
+
+class Thresholds(NamedTuple):
+    """
+    How much worse than the baseline a measurement may be before it is a regression,
+    as fractions of the baseline
+    """
+
+    throughput: float = 0.25
+    latency: float = 0.5
+    memory: float = 0.25
+
+
+def compare(
+    measurement: Measurement, baseline: Measurement, thresholds: Thresholds
+) -> List[str]:
+    """
+    :return: the regressions of the measurement compared to the baseline
+    """
+    regressions = []
+    if measurement["solved"] < baseline["solved"]:
+        regressions.append(
+            f"solved {measurement['solved']} puzzles instead of {baseline['solved']}"
+        )
+    checks = [
+        ("puzzles_per_second", -1, thresholds.throughput),
+        ("p50_ms", 1, thresholds.latency),
+        ("p99_ms", 1, thresholds.latency),
+        ("peak_rss_kb", 1, thresholds.memory),
+    ]
+    for name, direction, threshold in checks:
+        if measurement[name] is None or baseline[name] is None:
+            continue
+        value = float(measurement[name])
+        limit = float(baseline[name]) * (1 + direction * threshold)
+        if (value - limit) * direction > 0:
+            regressions.append(f"{name} {value:.4g}, baseline {baseline[name]:.4g}")
+    return regressions
+
+
+def _format_ms(value: Union[str, int, float, None]) -> str:
+    return f"{'-':>9}" if value is None else f"{float(value):>9.2f}"
+
+
+def _key(measurement: Measurement) -> Combination:
+    return Combination(
+        str(measurement["corpus"]),
+        Algorithm(measurement["algorithm"]),
+        str(measurement["mode"]),
+    )
+
+
+def main():
+    """
+    Measure the combinations, print them, and compare them with the baseline.
+    Exit with status 1 if any of them regressed.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", choices=CORPORA, nargs="+", default=CORPORA)
+    parser.add_argument(
+        "--algorithm", type=Algorithm, choices=list(Algorithm), nargs="+"
+    )
+    parser.add_argument("--mode", choices=MODES, nargs="+", default=MODES)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=REPEAT,
+        help="The number of runs of each combination, of which the fastest is kept."
+        " Default %(default)s",
+    )
+    parser.add_argument("--output", help="File to save the measurements to, as JSON")
+    parser.add_argument(
+        "--baseline", help="Measurements saved by a previous run, to compare with"
+    )
+    defaults = Thresholds()
+    parser.add_argument(
+        "--max-throughput-loss",
+        type=float,
+        default=defaults.throughput,
+        help="Default %(default)s",
+    )
+    parser.add_argument(
+        "--max-latency-increase",
+        type=float,
+        default=defaults.latency,
+        help="Default %(default)s",
+    )
+    parser.add_argument(
+        "--max-memory-increase",
+        type=float,
+        default=defaults.memory,
+        help="Default %(default)s",
+    )
+    options = parser.parse_args()
+    thresholds = Thresholds(
+        options.max_throughput_loss,
+        options.max_latency_increase,
+        options.max_memory_increase,
+    )
+
+    baseline: Dict[Combination, Measurement] = {}
+    if options.baseline:
+        with open(options.baseline, encoding="utf-8") as file:
+            baseline = {
+                _key(measurement): measurement
+                for measurement in json.load(file)["measurements"]
+            }
+
+    print(
+        f"{'corpus':<8}{'algorithm':<15}{'mode':<12}{'puzzles/s':>10}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{'start ms':>10}{'rss MB':>8}"
+    )
+    measurements = []
+    regressed = False
+    for corpus in options.corpus:
+        for algorithm in options.algorithm or list(Algorithm):
+            for mode in options.mode:
+                combination = Combination(corpus, algorithm, mode)
+                measurement = measure_in_process(combination, options.repeat)
+                measurements.append(measurement)
+                print(
+                    f"{corpus:<8}{algorithm.value:<15}{mode:<12}"
+                    f"{measurement['puzzles_per_second']:>10.1f}"
+                    f"{_format_ms(measurement['p50_ms'])}"
+                    f"{_format_ms(measurement['p99_ms'])}"
+                    f"{1000 * float(measurement['startup_seconds']):>10.1f}"
+                    f"{int(measurement['peak_rss_kb']) / 1024:>8.1f}"
+                )
+                reference: Optional[Measurement] = baseline.get(combination)
+                if reference is not None:
+                    for regression in compare(measurement, reference, thresholds):
+                        regressed = True
+                        print(f"  REGRESSION: {regression}")
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "measurements": measurements,
+                },
+                file,
+                indent=2,
+            )
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
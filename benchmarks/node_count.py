@@ -0,0 +1,73 @@
+"""
+Compare the number of search nodes expanded by each cell selection strategy.
+
+Run from the root of the repository:
+
+python -m benchmarks.node_count [--file benchmarks/corpora/17clue.sdm]
+"""
+import argparse
+from pathlib import Path
+
+from sudokusolver import solver
+from sudokusolver.board import Board
+from sudokusolver.solver import Algorithm, CellSelection
+from sudokusolver.stats import SolveStats
+
+# The puzzles with the fewest clues, on which propagation alone leaves the most
+# guessing to the search, so that the choice of the cell to guess in matters most
+_DEFAULT_CORPUS = Path(__file__).parent / "corpora" / "17clue.sdm"
+
+# Dancing links chooses its own constraints, and ignores the cell selection strategy
+_ALGORITHMS = [
+    algorithm for algorithm in Algorithm if algorithm != Algorithm.DANCING_LINKS
+]
+
+
+def count_nodes(sdm: str, algorithm: Algorithm, cell_selection: CellSelection) -> int:
+    """
+    :return: the number of times the solver chose a cell to guess in, while solving
+    the given puzzle.
+    """
+    stats = SolveStats()
+    solver.solve(
+        Board(sdm), algorithm=algorithm, cell_selection=cell_selection, stats=stats
+    )
+    return stats.nodes
+
+
+def main():
+    """
+    Print the total node count per algorithm and cell selection strategy
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--file",
+        type=argparse.FileType("r"),
+        default=str(_DEFAULT_CORPUS),
+        help="File containing sudoku puzzles in sdm format. Default %(default)s",
+    )
+    options = parser.parse_args()
+    with options.file as file:
+        sdms = [line.rstrip() for line in file if line.strip()]
+
+    print(f"{len(sdms)} puzzles")
+    print(
+        f"{'algorithm':<12}{'first_empty':>14}{'min_candidates':>16}{'reduction':>11}"
+    )
+    for algorithm in _ALGORITHMS:
+        totals = {
+            cell_selection: sum(
+                count_nodes(sdm, algorithm, cell_selection) for sdm in sdms
+            )
+            for cell_selection in CellSelection
+        }
+        first_empty = totals[CellSelection.FIRST_EMPTY]
+        min_candidates = totals[CellSelection.MIN_CANDIDATES]
+        print(
+            f"{algorithm.value:<12}{first_empty:>14}{min_candidates:>16}"
+            f"{first_empty / max(min_candidates, 1):>10.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
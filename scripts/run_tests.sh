@@ -1,3 +1,4 @@
+python setup.py build_ext --inplace
 rm -rf reports
 python -m pytest --cov=sudokusolver --cov-report=xml --cov-report=html --junitxml="reports/junit.xml" tests
 mkdir -p reports
@@ -0,0 +1,20 @@
+"""
+Builds the optional C core of the bitmask solver, next to the sources:
+
+    python setup.py build_ext --inplace
+
+Without it, or if it fails to build, the pure-Python solver is used.
+"""
+from setuptools import Extension, setup
+
+setup(
+    name="sudokusolver",
+    packages=["sudokusolver"],
+    ext_modules=[
+        Extension(
+            "sudokusolver._speedups",
+            sources=["sudokusolver/_speedups.c"],
+            optional=True,
+        )
+    ],
+)
@@ -0,0 +1,565 @@
+/*
+ * The propagation and the search of the bitmask solver, in C. The same algorithm as
+ * bitmask.py, step by step, so that both find the same solutions in the same order,
+ * with the same statistics.
+ *
+ * Bit n - 1 of a mask is set when the number n is used. The cells are numbered in
+ * row-major order, and the units are the rows, then the columns, then the squares,
+ * as in geometry.py.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdint.h>
+#include <string.h>
+
+#define MAX_BOX_SIZE 5
+#define MAX_SIZE (MAX_BOX_SIZE * MAX_BOX_SIZE)
+#define MAX_CELLS (MAX_SIZE * MAX_SIZE)
+#define MAX_UNITS (3 * MAX_SIZE)
+
+typedef struct {
+    int size;
+    int cell_count;
+    int unit_count;
+    /* The cells of each unit */
+    int units[MAX_UNITS][MAX_SIZE];
+    /* The row, column and square of each cell */
+    int units_of[MAX_CELLS][3];
+    /* The units which may be affected when a number is put in each cell, in order */
+    int affected_counts[MAX_CELLS];
+    int affected_units[MAX_CELLS][MAX_UNITS];
+} Geometry;
+
+/* Computed when first needed, by box size */
+static Geometry *geometries[MAX_BOX_SIZE + 1];
+
+typedef struct {
+    const Geometry *geometry;
+    uint32_t all_numbers;
+    uint8_t cells[MAX_CELLS];
+    uint32_t units[MAX_UNITS];
+    /* The cells filled in since the search started, to undo them when backtracking */
+    int placed[MAX_CELLS];
+    int placed_count;
+
+    Py_ssize_t limit;
+    int min_candidates;
+    PyObject *solutions;
+    /* Called with the number of nodes of this search so far at each node, not
+       the cumulative nodes of stats. NULL for no budget. */
+    PyObject *check;
+
+    long long nodes;
+    long long guesses;
+    long long backtracks;
+    long long propagated_cells;
+    long long max_depth;
+} Masks;
+
+static inline int
+bit_number(uint32_t bit)
+{
+#if defined(__GNUC__) || defined(__clang__)
+    return __builtin_ctz(bit) + 1;
+#else
+    int number = 1;
+    while (bit >>= 1) {
+        number++;
+    }
+    return number;
+#endif
+}
+
+static inline int
+bit_count(uint32_t mask)
+{
+#if defined(__GNUC__) || defined(__clang__)
+    return __builtin_popcount(mask);
+#else
+    int count = 0;
+    for (; mask; mask &= mask - 1) {
+        count++;
+    }
+    return count;
+#endif
+}
+
+static const Geometry *
+get_geometry(int box_size)
+{
+    if (box_size < 2 || box_size > MAX_BOX_SIZE) {
+        PyErr_Format(PyExc_ValueError, "Unsupported box size %d", box_size);
+        return NULL;
+    }
+    if (geometries[box_size] != NULL) {
+        return geometries[box_size];
+    }
+    Geometry *geometry = PyMem_Calloc(1, sizeof(Geometry));
+    if (geometry == NULL) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    int size = box_size * box_size;
+    geometry->size = size;
+    geometry->cell_count = size * size;
+    geometry->unit_count = 3 * size;
+    for (int unit = 0; unit < size; unit++) {
+        int row = unit / box_size * box_size;
+        int col = unit % box_size * box_size;
+        for (int position = 0; position < size; position++) {
+            geometry->units[unit][position] = unit * size + position;
+            geometry->units[size + unit][position] = position * size + unit;
+            geometry->units[2 * size + unit][position] =
+                (row + position / box_size) * size + col + position % box_size;
+        }
+    }
+    for (int index = 0; index < geometry->cell_count; index++) {
+        int row = index / size;
+        int col = index % size;
+        geometry->units_of[index][0] = row;
+        geometry->units_of[index][1] = size + col;
+        geometry->units_of[index][2] =
+            2 * size + row / box_size * box_size + col / box_size;
+    }
+    for (int index = 0; index < geometry->cell_count; index++) {
+        /* The units of the cell and of its peers, which are the cells of its units */
+        char affected[MAX_UNITS] = {0};
+        for (int k = 0; k < 3; k++) {
+            const int *cells = geometry->units[geometry->units_of[index][k]];
+            for (int position = 0; position < size; position++) {
+                for (int m = 0; m < 3; m++) {
+                    affected[geometry->units_of[cells[position]][m]] = 1;
+                }
+            }
+        }
+        int count = 0;
+        for (int unit = 0; unit < geometry->unit_count; unit++) {
+            if (affected[unit]) {
+                geometry->affected_units[index][count++] = unit;
+            }
+        }
+        geometry->affected_counts[index] = count;
+    }
+    geometries[box_size] = geometry;
+    return geometry;
+}
+
+static inline uint32_t
+candidates(const Masks *masks, int index)
+{
+    const int *units_of = masks->geometry->units_of[index];
+    return masks->all_numbers &
+           ~(masks->units[units_of[0]] | masks->units[units_of[1]] |
+             masks->units[units_of[2]]);
+}
+
+static inline void
+place(Masks *masks, int index, int number)
+{
+    const int *units_of = masks->geometry->units_of[index];
+    uint32_t bit = (uint32_t)1 << (number - 1);
+    masks->cells[index] = (uint8_t)number;
+    masks->units[units_of[0]] |= bit;
+    masks->units[units_of[1]] |= bit;
+    masks->units[units_of[2]] |= bit;
+    masks->placed[masks->placed_count++] = index;
+}
+
+static inline void
+remove_number(Masks *masks, int index)
+{
+    const int *units_of = masks->geometry->units_of[index];
+    uint32_t bit = ~((uint32_t)1 << (masks->cells[index] - 1));
+    masks->cells[index] = 0;
+    masks->units[units_of[0]] &= bit;
+    masks->units[units_of[1]] &= bit;
+    masks->units[units_of[2]] &= bit;
+}
+
+/*
+ * Put the numbers of the cells in the masks.
+ * Return 0 if the board has duplicates, -1 on error.
+ */
+static int
+load(Masks *masks, int box_size, const uint8_t *cells, Py_ssize_t cell_count)
+{
+    memset(masks, 0, sizeof(Masks));
+    masks->geometry = get_geometry(box_size);
+    if (masks->geometry == NULL) {
+        return -1;
+    }
+    const Geometry *geometry = masks->geometry;
+    if (cell_count != geometry->cell_count) {
+        PyErr_Format(PyExc_ValueError, "%zd cells instead of %d", cell_count,
+                     geometry->cell_count);
+        return -1;
+    }
+    masks->all_numbers = ((uint32_t)1 << geometry->size) - 1;
+    for (int index = 0; index < geometry->cell_count; index++) {
+        int number = cells[index];
+        if (!number) {
+            continue;
+        }
+        if (number > geometry->size) {
+            PyErr_Format(PyExc_ValueError, "Invalid number %d", number);
+            return -1;
+        }
+        if (!(candidates(masks, index) & ((uint32_t)1 << (number - 1)))) {
+            return 0;
+        }
+        place(masks, index, number);
+    }
+    masks->placed_count = 0;
+    return 1;
+}
+
+/*
+ * Fill in the numbers which are possible in only one cell of the unit.
+ * Return 0 if a missing number isn't possible in any of its cells.
+ */
+static int
+resolve_unit(Masks *masks, int unit)
+{
+    const Geometry *geometry = masks->geometry;
+    const int *unit_cells = geometry->units[unit];
+    uint32_t once = 0;
+    uint32_t twice = 0;
+    for (int position = 0; position < geometry->size; position++) {
+        int index = unit_cells[position];
+        if (!masks->cells[index]) {
+            uint32_t cell_candidates = candidates(masks, index);
+            twice |= once & cell_candidates;
+            once |= cell_candidates;
+        }
+    }
+    if ((masks->all_numbers & ~masks->units[unit]) & ~once) {
+        return 0;
+    }
+    uint32_t hidden_singles = once & ~twice;
+    while (hidden_singles) {
+        uint32_t bit = hidden_singles & (~hidden_singles + 1);
+        hidden_singles ^= bit;
+        for (int position = 0; position < geometry->size; position++) {
+            int index = unit_cells[position];
+            if (!masks->cells[index] && candidates(masks, index) & bit) {
+                place(masks, index, bit_number(bit));
+                break;
+            }
+        }
+    }
+    return 1;
+}
+
+/*
+ * Fill in the cells where only one number is possible, and the numbers possible in
+ * only one cell of a unit, starting with the units of the changed cell, or with all
+ * the units if changed is -1, then with the units affected by what was filled in.
+ * Return 0 if the board can't be solved.
+ */
+static int
+resolve_unambiguous_cells(Masks *masks, int changed)
+{
+    const Geometry *geometry = masks->geometry;
+    int units_to_examine[MAX_UNITS];
+    int count = 0;
+    char pending[MAX_UNITS] = {0};
+    if (changed < 0) {
+        for (int unit = 0; unit < geometry->unit_count; unit++) {
+            units_to_examine[count++] = unit;
+            pending[unit] = 1;
+        }
+    }
+    else {
+        for (int k = 0; k < 3; k++) {
+            int unit = geometry->units_of[changed][k];
+            units_to_examine[count++] = unit;
+            pending[unit] = 1;
+        }
+    }
+    while (count) {
+        int unit = units_to_examine[--count];
+        pending[unit] = 0;
+        int placed_count = masks->placed_count;
+        for (int position = 0; position < geometry->size; position++) {
+            int index = geometry->units[unit][position];
+            if (masks->cells[index]) {
+                continue;
+            }
+            uint32_t cell_candidates = candidates(masks, index);
+            if (!cell_candidates) {
+                return 0;
+            }
+            if (!(cell_candidates & (cell_candidates - 1))) {
+                place(masks, index, bit_number(cell_candidates));
+            }
+        }
+        if (!resolve_unit(masks, unit)) {
+            return 0;
+        }
+        for (int placed = placed_count; placed < masks->placed_count; placed++) {
+            int index = masks->placed[placed];
+            for (int k = 0; k < geometry->affected_counts[index]; k++) {
+                int affected_unit = geometry->affected_units[index][k];
+                if (!pending[affected_unit]) {
+                    pending[affected_unit] = 1;
+                    units_to_examine[count++] = affected_unit;
+                }
+            }
+        }
+    }
+    return 1;
+}
+
+/* Return the empty cell in which to guess a number, or -1 if the board is full */
+static int
+select_cell(const Masks *masks)
+{
+    const Geometry *geometry = masks->geometry;
+    if (!masks->min_candidates) {
+        for (int index = 0; index < geometry->cell_count; index++) {
+            if (!masks->cells[index]) {
+                return index;
+            }
+        }
+        return -1;
+    }
+    int best_index = -1;
+    int best_count = geometry->size + 1;
+    for (int index = 0; index < geometry->cell_count; index++) {
+        if (!masks->cells[index]) {
+            int count = bit_count(candidates(masks, index));
+            if (count < best_count) {
+                best_index = index;
+                best_count = count;
+                if (count <= 1) {
+                    break;
+                }
+            }
+        }
+    }
+    return best_index;
+}
+
+/*
+ * Return 1 if we found limit solutions, and the search should stop, 0 to go on, and
+ * -1 on error.
+ */
+static int
+search(Masks *masks, long long depth)
+{
+    masks->nodes++;
+    if (masks->check != NULL) {
+        PyObject *nodes = PyLong_FromLongLong(masks->nodes);
+        if (nodes == NULL) {
+            return -1;
+        }
+        PyObject *result = PyObject_CallOneArg(masks->check, nodes);
+        Py_DECREF(nodes);
+        if (result == NULL) {
+            return -1;
+        }
+        Py_DECREF(result);
+    }
+    int index = select_cell(masks);
+    if (index < 0) {
+        PyObject *solution = PyBytes_FromStringAndSize(
+            (const char *)masks->cells, masks->geometry->cell_count);
+        if (solution == NULL) {
+            return -1;
+        }
+        int appended = PyList_Append(masks->solutions, solution);
+        Py_DECREF(solution);
+        if (appended < 0) {
+            return -1;
+        }
+        return PyList_GET_SIZE(masks->solutions) >= masks->limit;
+    }
+
+    uint32_t cell_candidates = candidates(masks, index);
+    if (depth > masks->max_depth) {
+        masks->max_depth = depth;
+    }
+    while (cell_candidates) {
+        uint32_t bit = cell_candidates & (~cell_candidates + 1);
+        cell_candidates ^= bit;
+        int placed_count = masks->placed_count;
+        place(masks, index, bit_number(bit));
+        masks->guesses++;
+        int resolved = resolve_unambiguous_cells(masks, index);
+        masks->propagated_cells += masks->placed_count - placed_count - 1;
+        if (resolved) {
+            int found = search(masks, depth + 1);
+            if (found) {
+                return found;
+            }
+        }
+        masks->backtracks++;
+        for (int placed = placed_count; placed < masks->placed_count; placed++) {
+            remove_number(masks, masks->placed[placed]);
+        }
+        masks->placed_count = placed_count;
+    }
+    return 0;
+}
+
+/* Add a counter of the search to the attribute of the stats */
+static int
+add_stat(PyObject *stats, const char *name, long long value, int maximum)
+{
+    PyObject *current = PyObject_GetAttrString(stats, name);
+    if (current == NULL) {
+        return -1;
+    }
+    PyObject *number = PyLong_FromLongLong(value);
+    if (number == NULL) {
+        Py_DECREF(current);
+        return -1;
+    }
+    PyObject *total;
+    if (maximum) {
+        int greater = PyObject_RichCompareBool(number, current, Py_GT);
+        total = greater < 0 ? NULL : (greater ? number : current);
+        Py_XINCREF(total);
+    }
+    else {
+        total = PyNumber_Add(current, number);
+    }
+    Py_DECREF(current);
+    Py_DECREF(number);
+    if (total == NULL) {
+        return -1;
+    }
+    int result = PyObject_SetAttrString(stats, name, total);
+    Py_DECREF(total);
+    return result;
+}
+
+static int
+add_stats(PyObject *stats, const Masks *masks)
+{
+    if (add_stat(stats, "nodes", masks->nodes, 0) < 0 ||
+        add_stat(stats, "guesses", masks->guesses, 0) < 0 ||
+        add_stat(stats, "backtracks", masks->backtracks, 0) < 0 ||
+        add_stat(stats, "propagated_cells", masks->propagated_cells, 0) < 0 ||
+        add_stat(stats, "max_depth", masks->max_depth, 1) < 0) {
+        return -1;
+    }
+    return 0;
+}
+
+PyDoc_STRVAR(propagate_doc,
+             "propagate(cells, box_size)\n--\n\n"
+             "Fill in the cells of the bytearray where only one number is possible,\n"
+             "and the numbers possible in only one cell of a row, column or square.\n"
+             "Return None if the board has duplicates, otherwise whether it may\n"
+             "still be solved, and the number of cells filled in.");
+
+static PyObject *
+propagate(PyObject *module, PyObject *args)
+{
+    Py_buffer cells;
+    int box_size;
+    if (!PyArg_ParseTuple(args, "w*i:propagate", &cells, &box_size)) {
+        return NULL;
+    }
+    Masks *masks = PyMem_Malloc(sizeof(Masks));
+    if (masks == NULL) {
+        PyBuffer_Release(&cells);
+        return PyErr_NoMemory();
+    }
+    PyObject *result = NULL;
+    int loaded = load(masks, box_size, cells.buf, cells.len);
+    if (loaded == 0) {
+        Py_INCREF(Py_None);
+        result = Py_None;
+    }
+    else if (loaded > 0) {
+        int resolved = resolve_unambiguous_cells(masks, -1);
+        memcpy(cells.buf, masks->cells, masks->geometry->cell_count);
+        result = Py_BuildValue("Oi", resolved ? Py_True : Py_False,
+                               masks->placed_count);
+    }
+    PyMem_Free(masks);
+    PyBuffer_Release(&cells);
+    return result;
+}
+
+PyDoc_STRVAR(search_doc,
+             "search(cells, box_size, limit, min_candidates, check, stats)\n--\n\n"
+             "Search the solutions of the propagated cells, up to limit of them, and\n"
+             "return their cells. check, if not None, is called with the number of\n"
+             "nodes of this search at each node, not counting the nodes already in\n"
+             "stats. The counters of the search are added to stats, even if check\n"
+             "raises an exception.");
+
+static PyObject *
+search_solutions(PyObject *module, PyObject *args)
+{
+    Py_buffer cells;
+    int box_size;
+    Py_ssize_t limit;
+    int min_candidates;
+    PyObject *check;
+    PyObject *stats;
+    if (!PyArg_ParseTuple(args, "y*inpOO:search", &cells, &box_size, &limit,
+                          &min_candidates, &check, &stats)) {
+        return NULL;
+    }
+    Masks *masks = PyMem_Malloc(sizeof(Masks));
+    if (masks == NULL) {
+        PyBuffer_Release(&cells);
+        return PyErr_NoMemory();
+    }
+    PyObject *solutions = NULL;
+    int loaded = load(masks, box_size, cells.buf, cells.len);
+    PyBuffer_Release(&cells);
+    if (loaded == 0) {
+        PyErr_SetString(PyExc_ValueError, "The board has duplicates");
+    }
+    else if (loaded > 0) {
+        masks->limit = limit;
+        masks->min_candidates = min_candidates;
+        masks->check = check == Py_None ? NULL : check;
+        masks->solutions = PyList_New(0);
+        if (masks->solutions != NULL) {
+            solutions = masks->solutions;
+            if (search(masks, 1) < 0) {
+                Py_CLEAR(solutions);
+            }
+            /* Keep the exception of the search, if any, while adding the stats */
+            PyObject *type, *value, *traceback;
+            PyErr_Fetch(&type, &value, &traceback);
+            if (add_stats(stats, masks) < 0) {
+                Py_CLEAR(solutions);
+                Py_XDECREF(type);
+                Py_XDECREF(value);
+                Py_XDECREF(traceback);
+            }
+            else {
+                PyErr_Restore(type, value, traceback);
+            }
+        }
+    }
+    PyMem_Free(masks);
+    return solutions;
+}
+
+static PyMethodDef methods[] = {
+    {"propagate", propagate, METH_VARARGS, propagate_doc},
+    {"search", search_solutions, METH_VARARGS, search_doc},
+    {NULL, NULL, 0, NULL},
+};
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT,
+    "_speedups",
+    "The core of the bitmask solver, compiled",
+    -1,
+    methods,
+};
+
+PyMODINIT_FUNC
+PyInit__speedups(void)
+{
+    return PyModule_Create(&module);
+}
@@ -0,0 +1,380 @@
+"""
+Solve puzzles from asyncio code without blocking the event loop, in a pool of
+processes started when first needed
+"""
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import replace
+from functools import partial
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Deque,
+    Iterable,
+    Optional,
+    Union,
+)
+
+from sudokusolver import pipeline
+from sudokusolver.budget import Budget
+from sudokusolver.pipeline import Result
+from sudokusolver.solver import Algorithm, CellSelection
+
+# The cancellation flags of the slots, in the worker process
+_WORKER_FLAGS = None
+
+
+def _init_worker(flags):
+    """
+    Give the worker process the cancellation flags, shared with the parent
+    """
+    global _WORKER_FLAGS  # pylint: disable=global-statement
+    _WORKER_FLAGS = flags
+
+
+def _is_cancelled(slot: int) -> bool:
+    """
+    :return: True if the puzzle solved in the slot was cancelled
+    """
+    assert _WORKER_FLAGS is not None
+    return bool(_WORKER_FLAGS[slot])
+
+
+def _solve(
+    sdm: str,
+    slot: int,
+    algorithm: Algorithm,
+    cell_selection: CellSelection,
+    with_stats: bool,
+    budget: Optional[Budget],
+    count_limit: Optional[int],
+) -> Result:
+    """
+    :return: the result of the puzzle, solved in the worker process. The search
+    stops at its next node once the slot is cancelled.
+    """
+    budget = replace(budget or Budget(), cancelled=partial(_is_cancelled, slot))
+    return pipeline.solve_sdm(
+        sdm,
+        algorithm=algorithm,
+        cell_selection=cell_selection,
+        with_stats=with_stats,
+        budget=budget,
+        count_limit=count_limit,
+    )
+
+
+async def _iterate(
+    sdms: Union[Iterable[str], AsyncIterable[str]]
+) -> AsyncIterator[str]:
+    if isinstance(sdms, AsyncIterable):
+        async for sdm in sdms:
+            yield sdm
+    else:
+        for sdm in sdms:
+            yield sdm
+
+
+class AsyncSolver:
+    """
+    Solves puzzles in a pool of processes, with at most max_concurrency puzzles
+    submitted to the pool at once. Each puzzle has a slot, with a flag shared with
+    the processes, which stops its search when it is cancelled. A slot is only
+    reused once its process is done with it.
+    It must be used from one event loop at a time.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        start_method: Optional[str] = None,
+    ):
+        """
+        :param workers: the number of processes. None for the number of CPUs.
+        :param max_concurrency: the maximum number of puzzles submitted to the pool
+        at once. None for twice the number of processes, to keep them busy.
+        :param start_method: fork, forkserver or spawn. None for the platform
+        default.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or 2 * self.workers
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._flags = None
+        self._free_slots: Deque[int] = deque(range(self.max_concurrency))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            context = multiprocessing.get_context(self.start_method)
+            self._flags = context.RawArray("b", self.max_concurrency)
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._flags,),
+            )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """
+        :return: the semaphore counting the free slots, in the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(len(self._free_slots))
+        return self._semaphore
+
+    def _release(self, semaphore: asyncio.Semaphore, slot: int):
+        self._free_slots.append(slot)
+        if semaphore is self._semaphore:
+            semaphore.release()
+
+    def _on_done(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        semaphore: asyncio.Semaphore,
+        slot: int,
+        _future: Future,
+    ):
+        """
+        Called from the thread of the pool once the process is done with the slot
+        """
+        try:
+            loop.call_soon_threadsafe(self._release, semaphore, slot)
+        except RuntimeError:
+            # The event loop is closed
+            self._free_slots.append(slot)
+
+    async def solve(
+        self,
+        sdm: str,
+        algorithm: Algorithm = Algorithm.RECURSIVE,
+        cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+        with_stats: bool = False,
+        budget: Optional[Budget] = None,
+        count_limit: Optional[int] = None,
+    ) -> Result:
+        """
+        Same as pipeline.solve_sdm(), in a process of the pool, waiting for a free
+        slot first. Cancelling the coroutine stops the search in the process.
+        :return: the result of the puzzle
+        """
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        slot = self._free_slots.popleft()
+        try:
+            executor = self._get_executor()
+            assert self._flags is not None
+            self._flags[slot] = 0
+            future = executor.submit(
+                _solve,
+                sdm,
+                slot,
+                algorithm,
+                cell_selection,
+                with_stats,
+                budget,
+                count_limit,
+            )
+        except BaseException:
+            self._release(semaphore, slot)
+            raise
+        future.add_done_callback(
+            partial(self._on_done, asyncio.get_running_loop(), semaphore, slot)
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # If the puzzle is being solved, the search stops at its next node, and
+            # then the slot is released. Once the process is done, the slot may
+            # already be reused.
+            if not future.done():
+                self._flags[slot] = 1
+            raise
+
+    async def solve_many(
+        self,
+        sdms: Union[Iterable[str], AsyncIterable[str]],
+        algorithm: Algorithm = Algorithm.RECURSIVE,
+        cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+        with_stats: bool = False,
+        budget: Optional[Budget] = None,
+        count_limit: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        ordered: bool = False,
+    ) -> AsyncIterator[Result]:
+        """
+        Solve the puzzles, reading the next one from the input only when fewer than
+        concurrency of them are being solved, so that a slow consumer slows down the
+        reading. The puzzles still being solved are cancelled if the iteration
+        stops early.
+        :param concurrency: the maximum number of puzzles being solved at once.
+        None for max_concurrency.
+        :param ordered: True to return the results in the order of the input,
+        instead of as soon as they are available
+        :return: the results of the puzzles
+        """
+        limit = concurrency or self.max_concurrency
+        solve_one = partial(
+            self.solve,
+            algorithm=algorithm,
+            cell_selection=cell_selection,
+            with_stats=with_stats,
+            budget=budget,
+            count_limit=count_limit,
+        )
+        pending: Deque["asyncio.Task[Result]"] = deque()
+
+        async def next_result() -> Result:
+            if ordered:
+                task = pending[0]
+            else:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                task = next(task for task in pending if task in done)
+            result = await task
+            pending.remove(task)
+            return result
+
+        try:
+            async for sdm in _iterate(sdms):
+                pending.append(asyncio.ensure_future(solve_one(sdm)))
+                if len(pending) >= limit:
+                    yield await next_result()
+            while pending:
+                yield await next_result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _stop(self) -> Optional[ProcessPoolExecutor]:
+        """
+        Stop the searches in progress, and detach the pool
+        :return: the pool, to shut down, if it was started
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            assert self._flags is not None
+            for slot in range(self.max_concurrency):
+                self._flags[slot] = 1
+        return executor
+
+    def close(self):
+        """
+        Stop the searches in progress, and the processes, waiting for them. From a
+        coroutine, use aclose() instead, which doesn't block the event loop.
+        """
+        executor = self._stop()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    async def aclose(self):
+        """
+        Same as close(), waiting for the processes in a thread
+        """
+        executor = self._stop()
+        if executor is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, partial(executor.shutdown, cancel_futures=True)
+            )
+
+    def __enter__(self) -> "AsyncSolver":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    async def __aenter__(self) -> "AsyncSolver":
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+
+# The solver shared by the module functions
+_SHARED: Optional[AsyncSolver] = None
+
+
+def get_shared() -> AsyncSolver:
+    """
+    :return: the solver shared by the callers of this process, created when first
+    needed, with a process per CPU
+    """
+    global _SHARED  # pylint: disable=global-statement
+    if _SHARED is None:
+        _SHARED = AsyncSolver()
+    return _SHARED
+
+
+async def solve(
+    sdm: str,
+    algorithm: Algorithm = Algorithm.RECURSIVE,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    with_stats: bool = False,
+    budget: Optional[Budget] = None,
+    count_limit: Optional[int] = None,
+) -> Result:
+    """
+    Same as AsyncSolver.solve(), with the shared solver
+    """
+    return await get_shared().solve(
+        sdm, algorithm, cell_selection, with_stats, budget, count_limit
+    )
+
+
+async def solve_many(
+    sdms: Union[Iterable[str], AsyncIterable[str]],
+    algorithm: Algorithm = Algorithm.RECURSIVE,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    with_stats: bool = False,
+    budget: Optional[Budget] = None,
+    count_limit: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    ordered: bool = False,
+) -> AsyncIterator[Result]:
+    """
+    Same as AsyncSolver.solve_many(), with the shared solver
+    """
+    results = get_shared().solve_many(
+        sdms,
+        algorithm,
+        cell_selection,
+        with_stats,
+        budget,
+        count_limit,
+        concurrency,
+        ordered,
+    )
+    try:
+        async for result in results:
+            yield result
+    finally:
+        await results.aclose()
+
+
+def shutdown():
+    """
+    Close the shared solver, if it was created
+    """
+    global _SHARED  # pylint: disable=global-statement
+    if _SHARED is not None:
+        _SHARED.close()
+        _SHARED = None
+
+
+async def ashutdown():
+    """
+    Same as shutdown(), without blocking the event loop
+    """
+    global _SHARED  # pylint: disable=global-statement
+    if _SHARED is not None:
+        solver, _SHARED = _SHARED, None
+        await solver.aclose()
@@ -0,0 +1,176 @@
+"""
+A Sudoku solver which processes many boards at once as NumPy arrays.
+
+The boards are stored as an (N, 81) array of numbers, 0 meaning an empty cell.
+The cells where only one number is possible, and the numbers which are possible in
+only one cell of a row, column or square, are filled in for all the boards at once.
+The boards which still need guessing afterwards are solved one at a time.
+"""
+import time
+from itertools import islice
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from sudokusolver import solver
+from sudokusolver.board import Board
+from sudokusolver.budget import Budget, BudgetExceeded
+from sudokusolver.geometry import PEERS, UNITS
+from sudokusolver.solver import Algorithm, CellSelection, State
+from sudokusolver.stats import SolveStats
+
+# Bit n - 1 of a mask is set when the number n is possible
+_ALL_NUMBERS = 0x1FF
+_BIT_OF_NUMBER = np.array([0] + [1 << number for number in range(9)], dtype=np.uint16)
+_BIT_COUNT = np.array(
+    [bin(mask).count("1") for mask in range(_ALL_NUMBERS + 1)], dtype=np.uint8
+)
+# The number for the masks with only one bit set
+_NUMBER_OF_BIT = np.array(
+    [mask.bit_length() for mask in range(_ALL_NUMBERS + 1)], dtype=np.uint8
+)
+
+_UNITS = np.array(UNITS)
+_PEERS = np.array(PEERS)
+
+
+def _to_array(sdms: List[str]) -> np.ndarray:
+    """
+    :return: the boards as an (N, 81) array
+    """
+    for sdm in sdms:
+        if len(sdm) != 81 or not sdm.isdigit():
+            raise ValueError("Invalid sdm input")
+    data = np.frombuffer("".join(sdms).encode("ascii"), dtype=np.uint8)
+    return (data - ord("0")).reshape(len(sdms), 81)
+
+
+def _to_sdms(grid: np.ndarray) -> List[str]:
+    """
+    :return: the boards of the (N, 81) array in sdm format
+    """
+    text = (grid + ord("0")).astype(np.uint8).tobytes().decode("ascii")
+    return [text[i : i + 81] for i in range(0, len(text), 81)]
+
+
+def _propagate(grid: np.ndarray) -> np.ndarray:
+    """
+    Fill in the empty cells where only one number is possible, and the numbers
+    which are possible in only one cell of a row, column or square, in all the boards
+    of the (N, 81) array, until nothing changes.
+    :return: an array of N booleans, True for the boards which have duplicates or an
+    empty cell where no number is possible. These boards were left as they were when
+    the problem was found.
+    """
+    broken = np.zeros(len(grid), dtype=bool)
+    active = np.arange(len(grid))
+    while len(active):
+        boards = grid[active]
+        bits = _BIT_OF_NUMBER[boards]
+        used = np.bitwise_or.reduce(bits[:, _PEERS], axis=2)
+        empty = boards == 0
+        candidates = np.where(empty, ~used & _ALL_NUMBERS, 0)
+
+        is_broken = ((bits & used) != 0).any(axis=1) | (empty & (candidates == 0)).any(
+            axis=1
+        )
+        broken[active[is_broken]] = True
+
+        # Cells where only one number is possible
+        updated = boards.copy()
+        naked_singles = empty & (_BIT_COUNT[candidates] == 1)
+        updated[naked_singles] = _NUMBER_OF_BIT[candidates[naked_singles]]
+
+        # Numbers which are possible in only one cell of a row, column or square
+        unit_candidates = candidates[:, _UNITS]
+        for number in range(1, 10):
+            has_number = (unit_candidates >> (number - 1)) & 1
+            board_indexes, unit_indexes = np.nonzero(has_number.sum(axis=2) == 1)
+            positions = has_number[board_indexes, unit_indexes].argmax(axis=1)
+            updated[board_indexes, _UNITS[unit_indexes, positions]] = number
+
+        has_changed = (updated != boards).any(axis=1) & ~is_broken
+        grid[active[has_changed]] = updated[has_changed]
+        active = active[has_changed]
+    return broken
+
+
+def _solve_batch(
+    sdms: List[str],
+    algorithm: Algorithm,
+    cell_selection: CellSelection,
+    stats: List[SolveStats],
+    budget: Optional[Budget],
+) -> List[Board]:
+    """
+    Solve the boards, and fill the statistics of each of them. The time spent on the
+    whole batch is shared evenly between its boards.
+    The boards whose budget runs out are returned as they were given, and counted in
+    the timeouts of their statistics.
+    """
+    start = time.perf_counter()
+    grid = _to_array(sdms)
+    propagate_start = time.perf_counter()
+    empty_counts = (grid == 0).sum(axis=1)
+    broken = _propagate(grid)
+    propagated_counts = empty_counts - (grid == 0).sum(axis=1)
+    propagate_end = time.perf_counter()
+    for board_stats, propagated_count in zip(stats, propagated_counts):
+        board_stats.parse_seconds += (propagate_start - start) / len(sdms)
+        board_stats.propagate_seconds += (propagate_end - propagate_start) / len(sdms)
+        board_stats.propagated_cells += int(propagated_count)
+
+    solutions = []
+    for sdm, propagated_sdm, is_broken, board_stats in zip(
+        sdms, _to_sdms(grid), broken, stats
+    ):
+        # Let the scalar solver figure out what's wrong with the original board of
+        # the broken ones
+        board = Board(sdm if is_broken else propagated_sdm)
+        if is_broken or "0" in propagated_sdm:
+            try:
+                board = solver.solve(
+                    board,
+                    algorithm=algorithm,
+                    cell_selection=cell_selection,
+                    stats=board_stats,
+                    budget=budget,
+                )
+            except BudgetExceeded:
+                pass
+        if is_broken or solver.get_state(board) == State.VALID:
+            solutions.append(board)
+        else:
+            solutions.append(Board(sdm))
+    return solutions
+
+
+def solve_many(
+    sdms: Iterable[str],
+    algorithm: Algorithm = Algorithm.BITMASK,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    batch_size: int = 10000,
+    stats: Optional[List[SolveStats]] = None,
+    budget: Optional[Budget] = None,
+) -> List[Board]:
+    """
+    Solve many boards, batch_size boards at a time.
+    :param algorithm: the algorithm used for the boards which need guessing
+    :param cell_selection: the cell selection strategy used for the boards which
+    need guessing
+    :param stats: if given, the statistics of each board are appended to it
+    :param budget: if given, what the solver may spend on each board which needs
+    guessing
+    :return: the boards in their solved state, in the same order as the sdms.
+    The boards which we weren't able to solve are returned as they were given.
+    """
+    iterator = iter(sdms)
+    solutions: List[Board] = []
+    while batch := list(islice(iterator, batch_size)):
+        batch_stats = [SolveStats() for _ in batch]
+        solutions.extend(
+            _solve_batch(batch, algorithm, cell_selection, batch_stats, budget)
+        )
+        if stats is not None:
+            stats.extend(batch_stats)
+    return solutions
@@ -0,0 +1,343 @@
+"""
+A Sudoku board solver which keeps track of the numbers used in each row, column and
+square as masks of size bits: 9 bits for a 9x9 board, up to 25 bits for a 25x25 board.
+
+The propagation and the search run in the C extension _speedups if it was built,
+see setup.py, unless the SUDOKUSOLVER_PURE_PYTHON environment variable is set.
+Both find the same solutions, with the same statistics.
+"""
+import os
+import time
+from typing import List, Optional
+
+from sudokusolver.board import Board
+from sudokusolver.budget import UNLIMITED, Countdown
+from sudokusolver.geometry import STANDARD, Geometry
+from sudokusolver.stats import SolveStats
+
+if os.environ.get("SUDOKUSOLVER_PURE_PYTHON"):
+    _speedups = None
+else:
+    try:
+        from sudokusolver import _speedups
+    except ImportError:
+        _speedups = None
+
+
+class _Masks:
+    """
+    The numbers in the cells of a board, along with masks of the numbers used in
+    each row, column and square. 0 means an empty cell.
+    Bit n - 1 of a mask is set when the number n is used.
+    """
+
+    __slots__ = (
+        "geometry",
+        "cells",
+        "units",
+        "all_numbers",
+        "row_unit",
+        "col_unit",
+        "square_unit",
+    )
+
+    def __init__(self, geometry: Geometry):
+        self.geometry = geometry
+        self.cells: List[int] = geometry.cell_count * [0]
+        self.units: List[int] = len(geometry.units) * [0]
+        self.all_numbers = (1 << geometry.size) - 1
+        self.row_unit = geometry.row_unit
+        self.col_unit = geometry.col_unit
+        self.square_unit = geometry.square_unit
+
+    def candidates(self, index: int) -> int:
+        """
+        :return: the mask of the numbers which can be placed in the given cell
+        """
+        units = self.units
+        return self.all_numbers & ~(
+            units[self.row_unit[index]]
+            | units[self.col_unit[index]]
+            | units[self.square_unit[index]]
+        )
+
+    def place(self, index: int, number: int):
+        """
+        Put the number in the given empty cell
+        """
+        bit = 1 << (number - 1)
+        units = self.units
+        self.cells[index] = number
+        units[self.row_unit[index]] |= bit
+        units[self.col_unit[index]] |= bit
+        units[self.square_unit[index]] |= bit
+
+    def remove(self, index: int):
+        """
+        Empty the given cell
+        """
+        bit = ~(1 << (self.cells[index] - 1))
+        units = self.units
+        self.cells[index] = 0
+        units[self.row_unit[index]] &= bit
+        units[self.col_unit[index]] &= bit
+        units[self.square_unit[index]] &= bit
+
+
+def _load(board: Board) -> Optional[_Masks]:
+    """
+    :return: the masks for the board, or None if the board has duplicates
+    """
+    masks = _Masks(board.geometry)
+    for index, number in enumerate(board.cells):
+        if not number:
+            continue
+        if not masks.candidates(index) & (1 << (number - 1)):
+            return None
+        masks.place(index, number)
+    return masks
+
+
+def _resolve_unit(masks: _Masks, unit: int, placed: List[int]) -> bool:
+    """
+    Fill in the numbers which are possible in only one cell of the row, column or
+    square, adding their positions to placed.
+    :return: False if a missing number isn't possible in any of its cells.
+    """
+    cells = masks.cells
+    unit_cells = masks.geometry.units[unit]
+    once = 0
+    twice = 0
+    for index in unit_cells:
+        if not cells[index]:
+            candidates = masks.candidates(index)
+            twice |= once & candidates
+            once |= candidates
+    if (masks.all_numbers & ~masks.units[unit]) & ~once:
+        return False
+    hidden_singles = once & ~twice
+    while hidden_singles:
+        bit = hidden_singles & -hidden_singles
+        hidden_singles ^= bit
+        for index in unit_cells:
+            if not cells[index] and masks.candidates(index) & bit:
+                masks.place(index, bit.bit_length())
+                placed.append(index)
+                break
+    return True
+
+
+def _resolve_unambiguous_cells(
+    masks: _Masks, placed: List[int], changed: Optional[int] = None
+) -> bool:
+    """
+    Fill in the empty cells where only one number is possible, and the numbers which
+    are possible in only one cell of a row, column or square, adding their positions
+    to placed.
+    Then repeat for the rows, columns and squares affected by what we filled in.
+    If a changed cell is given, only its row, column and square are examined at
+    first. Otherwise, the whole board is examined.
+    :return: False if the board can't be solved.
+    """
+    cells = masks.cells
+    geometry = masks.geometry
+    units = geometry.units
+    affected_units = geometry.affected_units
+    if changed is None:
+        units_to_examine = list(range(len(units)))
+    else:
+        units_to_examine = list(geometry.units_of[changed])
+    pending = set(units_to_examine)
+    while units_to_examine:
+        unit = units_to_examine.pop()
+        pending.discard(unit)
+        placed_count = len(placed)
+        for index in units[unit]:
+            if cells[index]:
+                continue
+            candidates = masks.candidates(index)
+            if not candidates:
+                return False
+            if not candidates & (candidates - 1):
+                masks.place(index, candidates.bit_length())
+                placed.append(index)
+        if not _resolve_unit(masks, unit, placed):
+            return False
+        for index in placed[placed_count:]:
+            for affected_unit in affected_units[index]:
+                if affected_unit not in pending:
+                    pending.add(affected_unit)
+                    units_to_examine.append(affected_unit)
+    return True
+
+
+def _find_first_empty_cell(masks: _Masks) -> Optional[int]:
+    for index, cell in enumerate(masks.cells):
+        if not cell:
+            return index
+    return None
+
+
+def _find_cell_with_fewest_candidates(masks: _Masks) -> Optional[int]:
+    """
+    :return: the empty cell with the fewest candidates. If several cells have the
+    same number of candidates, the first one in row-major order is returned.
+    """
+    best_index = None
+    best_count = masks.geometry.size + 1
+    for index, cell in enumerate(masks.cells):
+        if not cell:
+            count = masks.candidates(index).bit_count()
+            if count < best_count:
+                best_index = index
+                best_count = count
+                if count <= 1:
+                    break
+    return best_index
+
+
+def _select_cell(masks: _Masks, min_candidates: bool) -> Optional[int]:
+    """
+    :return: the empty cell in which to guess a number, or None if the board is full
+    """
+    if min_candidates:
+        return _find_cell_with_fewest_candidates(masks)
+    return _find_first_empty_cell(masks)
+
+
+def _search(
+    masks: _Masks,
+    min_candidates: bool,
+    solutions: List[bytes],
+    limit: int,
+    stats: SolveStats,
+    countdown: Countdown,
+    start_nodes: int,
+    depth: int,
+) -> bool:
+    """
+    Fill in the empty cells of the masks, backtracking when a guess leads to a
+    dead end, and appending the cells of the solved boards to solutions.
+    :param start_nodes: the number of nodes of the stats before the search, which
+    aren't checked against the countdown
+    :return: True if we found limit solutions, and the search should stop.
+    """
+    stats.nodes += 1
+    countdown.check(stats.nodes - start_nodes)
+    index = _select_cell(masks, min_candidates)
+    if index is None:
+        solutions.append(bytes(masks.cells))
+        return len(solutions) >= limit
+
+    candidates = masks.candidates(index)
+    stats.max_depth = max(stats.max_depth, depth)
+    while candidates:
+        bit = candidates & -candidates
+        candidates ^= bit
+        masks.place(index, bit.bit_length())
+        stats.guesses += 1
+        placed = [index]
+        resolved = _resolve_unambiguous_cells(masks, placed, index)
+        stats.propagated_cells += len(placed) - 1
+        if resolved and _search(
+            masks,
+            min_candidates,
+            solutions,
+            limit,
+            stats,
+            countdown,
+            start_nodes,
+            depth + 1,
+        ):
+            return True
+        stats.backtracks += 1
+        for placed_index in placed:
+            masks.remove(placed_index)
+    return False
+
+
+def find_solutions(
+    board: Board,
+    limit: int,
+    min_candidates: bool = False,
+    stats: Optional[SolveStats] = None,
+    countdown: Countdown = UNLIMITED,
+) -> List[Board]:
+    """
+    :param min_candidates: if True, guess in the empty cell with the fewest candidates
+    instead of the first empty cell. Always True for the boards larger than 9x9,
+    on which guessing in the first empty cell isn't tractable.
+    :param stats: if given, what the solver does is added to it
+    :param countdown: checked at each node of the search
+    :return: the solutions of the board, stopping at limit solutions
+    """
+    stats = stats if stats is not None else SolveStats()
+    if board.geometry.size > STANDARD.size:
+        min_candidates = True
+    if _speedups is not None:
+        return _find_solutions_compiled(board, limit, min_candidates, stats, countdown)
+    start = time.perf_counter()
+    masks = _load(board)
+    if masks is None:
+        return []
+    placed: List[int] = []
+    propagated = _resolve_unambiguous_cells(masks, placed)
+    stats.propagated_cells += len(placed)
+    search_start = time.perf_counter()
+    stats.propagate_seconds += search_start - start
+    if not propagated:
+        return []
+    solutions: List[bytes] = []
+    try:
+        _search(
+            masks, min_candidates, solutions, limit, stats, countdown, stats.nodes, 1
+        )
+    finally:
+        stats.search_seconds += time.perf_counter() - search_start
+    return [Board.from_cells(cells) for cells in solutions]
+
+
+def _find_solutions_compiled(
+    board: Board,
+    limit: int,
+    min_candidates: bool,
+    stats: SolveStats,
+    countdown: Countdown,
+) -> List[Board]:
+    """
+    Same as find_solutions(), with the C extension
+    """
+    start = time.perf_counter()
+    cells = bytearray(board.cells)
+    box_size = board.geometry.box_size
+    propagated = _speedups.propagate(cells, box_size)
+    search_start = time.perf_counter()
+    stats.propagate_seconds += search_start - start
+    if propagated is None:
+        return []
+    resolved, placed_count = propagated
+    stats.propagated_cells += placed_count
+    if not resolved:
+        return []
+    check = None if countdown is UNLIMITED else countdown.check
+    try:
+        solutions = _speedups.search(
+            bytes(cells), box_size, limit, min_candidates, check, stats
+        )
+    finally:
+        stats.search_seconds += time.perf_counter() - search_start
+    return [Board.from_cells(cells) for cells in solutions]
+
+
+def solve(
+    board: Board,
+    min_candidates: bool = False,
+    stats: Optional[SolveStats] = None,
+    countdown: Countdown = UNLIMITED,
+) -> Board:
+    """
+    :return: the board in its solved state, or the given board if we weren't able
+    to solve it. See find_solutions() for the parameters.
+    """
+    solutions = find_solutions(board, 1, min_candidates, stats, countdown)
+    return solutions[0] if solutions else board
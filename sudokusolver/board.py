@@ -1,49 +1,262 @@
 """
 Represents a Sudoku board
 """
-from itertools import product
-from typing import Iterable, List, Optional
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sudokusolver.geometry import Geometry, get_geometry
+
+# The symbol of each number in sdm format, 0 meaning an empty cell. The boards larger
+# than 9x9 use letters for the numbers from 10.
+SYMBOLS = "0123456789ABCDEFGHIJKLMNOP"
+_SYMBOL_BYTES = SYMBOLS.encode("ascii")
+# Translation tables between the sdm characters and the numbers of the cells
+_TO_NUMBERS = bytes.maketrans(_SYMBOL_BYTES, bytes(range(len(SYMBOLS))))
+_TO_SYMBOLS = bytes.maketrans(bytes(range(len(SYMBOLS))), _SYMBOL_BYTES)
+
+# The box size of the supported boards, by number of cells: from 4x4 to 25x25
+BOX_SIZES = {box_size**4: box_size for box_size in range(2, 6)}
+
+
+def geometry_of(cell_count: int) -> Geometry:
+    """
+    :return: the geometry of the boards with the given number of cells
+    :raises ValueError: if no supported board has this number of cells
+    """
+    box_size = BOX_SIZES.get(cell_count)
+    if box_size is None:
+        raise ValueError(f"No board has {cell_count} cells")
+    return get_geometry(box_size)
+
+
+class _IndexedView(Sequence[int]):
+    """
+    The numbers of some cells of a board, read from the board without copying them
+    """
+
+    __slots__ = ("cells", "indexes")
+
+    def __init__(self, cells: bytearray, indexes: Tuple[int, ...]):
+        self.cells = cells
+        self.indexes = indexes
+
+    def __getitem__(self, position):
+        return self.cells[self.indexes[position]]
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    def __iter__(self) -> Iterator[int]:
+        cells = self.cells
+        return (cells[index] for index in self.indexes)
+
+
+class _DataRow:
+    """
+    A row of the board, as strings, or None for the empty cells
+    """
+
+    __slots__ = ("board", "cells", "offset", "size")
+
+    def __init__(self, board: "Board", row: int):
+        self.board = board
+        self.cells = board.cells
+        self.size = board.geometry.size
+        self.offset = row * self.size
+
+    def __getitem__(self, col: int) -> Optional[str]:
+        number = self.cells[self.offset + col]
+        return SYMBOLS[number] if number else None
+
+    def __setitem__(self, col: int, value: Optional[str]):
+        self.board.set_cell(self.offset + col, SYMBOLS.index(value) if value else 0)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        return (self[col] for col in range(self.size))
 
 
 class Board:
     """
-    Represents a Sudoku board
+    Represents a Sudoku board.
+
+    The numbers of the cells are stored in row-major order in a flat buffer,
+    0 meaning an empty cell. The buffer can be read directly, but must only be
+    changed with set_cell(), which keeps track of the duplicates and the empty cells.
+
+    The board is 9x9, or from 4x4 to 25x25 for other box sizes, given by its geometry.
     """
 
+    __slots__ = (
+        "geometry",
+        "cells",
+        "iteration_count",
+        "unit_counts",
+        "duplicate_count",
+        "empty_count",
+    )
+
     def __init__(self, sdm: str):
+        """
+        :param sdm: the board in sdm format, with one symbol per cell, from SYMBOLS
+        """
         self.iteration_count = 0
-        if len(sdm) != 81:
+        box_size = BOX_SIZES.get(len(sdm))
+        if box_size is None:
             raise ValueError("Invalid sdm input")
-        self.data: List[List[Optional[str]]] = [9 * [None] for _ in range(9)]
-        for row, col in product(range(9), range(9)):
-            input_number = sdm[row * 9 + col]
-            if 1 <= int(input_number) <= 9:
-                self.data[row][col] = input_number
-            else:
-                self.data[row][col] = None
+        self.geometry = get_geometry(box_size)
+        try:
+            cells = bytearray(sdm, "ascii")
+        except UnicodeEncodeError as error:
+            raise ValueError("Invalid sdm input") from error
+        if cells.translate(None, _SYMBOL_BYTES[: self.geometry.value_count]):
+            raise ValueError("Invalid sdm input")
+        self.cells = cells.translate(_TO_NUMBERS)
+        self._count()
+
+    @classmethod
+    def from_cells(cls, cells: Iterable[int]) -> "Board":
+        """
+        :return: a board with the given numbers, in row-major order, 0 meaning an
+        empty cell
+        """
+        board = cls.__new__(cls)
+        board.iteration_count = 0
+        board.cells = bytearray(cells)
+        board.geometry = geometry_of(len(board.cells))
+        if max(board.cells) >= board.geometry.value_count:
+            raise ValueError(f"Invalid number {max(board.cells)}")
+        board._count()  # pylint: disable=protected-access
+        return board
+
+    def _count(self):
+        # The number of times each number is used in each unit:
+        # unit * value_count + number
+        geometry = self.geometry
+        self.unit_counts = bytearray(len(geometry.units) * geometry.value_count)
+        # The number of extra occurrences of numbers in units
+        self.duplicate_count = 0
+        cells = self.cells
+        self.cells = bytearray(len(cells))
+        self.empty_count = len(cells)
+        for index, number in enumerate(cells):
+            self.set_cell(index, number)
+
+    def copy(self) -> "Board":
+        """
+        :return: a copy of the board, which can be modified without affecting this one
+        """
+        board = Board.__new__(Board)
+        board.geometry = self.geometry
+        board.cells = bytearray(self.cells)
+        board.iteration_count = self.iteration_count
+        board.unit_counts = bytearray(self.unit_counts)
+        board.duplicate_count = self.duplicate_count
+        board.empty_count = self.empty_count
+        return board
+
+    def set_cell(self, index: int, number: int):
+        """
+        Put the number in the cell at the given position, or empty the cell if the
+        number is 0
+        """
+        previous_number = self.cells[index]
+        if previous_number == number:
+            return
+        unit_counts = self.unit_counts
+        geometry = self.geometry
+        units_of = geometry.units_of[index]
+        value_count = geometry.value_count
+        if previous_number:
+            for unit in units_of:
+                key = unit * value_count + previous_number
+                unit_counts[key] -= 1
+                if unit_counts[key]:
+                    self.duplicate_count -= 1
+            self.empty_count += 1
+        if number:
+            for unit in units_of:
+                key = unit * value_count + number
+                if unit_counts[key]:
+                    self.duplicate_count += 1
+                unit_counts[key] += 1
+            self.empty_count -= 1
+        self.cells[index] = number
+
+    def possible_numbers(self, index: int) -> List[int]:
+        """
+        :return: the numbers which aren't used in the row, column and square of the
+        cell at the given position
+        """
+        unit_counts = self.unit_counts
+        geometry = self.geometry
+        row, col, square = (
+            unit * geometry.value_count for unit in geometry.units_of[index]
+        )
+        return [
+            number
+            for number in range(1, geometry.value_count)
+            if not (
+                unit_counts[row + number]
+                or unit_counts[col + number]
+                or unit_counts[square + number]
+            )
+        ]
+
+    def __deepcopy__(self, memo) -> "Board":
+        return self.copy()
+
+    @property
+    def data(self) -> List[_DataRow]:
+        """
+        :return: the rows of the board, whose cells are strings, or None for the empty
+        cells. Setting a cell of a row updates the board.
+        """
+        return [_DataRow(self, row) for row in range(self.geometry.size)]
+
+    def row_view(self, row: int) -> memoryview:
+        """
+        :return: the numbers of the row at the given position, without copying them
+        """
+        size = self.geometry.size
+        return memoryview(self.cells)[row * size : row * size + size]
+
+    def col_view(self, col: int) -> memoryview:
+        """
+        :return: the numbers of the column at the given position, without copying them
+        """
+        return memoryview(self.cells)[col :: self.geometry.size]
+
+    def square_view(self, row: int, col: int) -> Sequence[int]:
+        """
+        :return: the numbers of the square containing the given position, without
+        copying them
+        """
+        box_size = self.geometry.box_size
+        square = (row // box_size) * box_size + col // box_size
+        return _IndexedView(self.cells, self.geometry.squares[square])
 
     def get_row(self, position: int) -> Iterable[str]:
         """
         :return: the values of the row at the given position
         """
-        return self.data[position]
+        return list(self.data[position])
 
     def get_col(self, position: int) -> Iterable[str]:
         """
         :return: the values of the column at the given position
         """
-        return [row[position] for row in self.data]
+        return [
+            SYMBOLS[number] if number else None for number in self.col_view(position)
+        ]
 
     def get_square(self, row: int, col: int) -> Iterable[str]:
         """
         :return: the values of the square at the given position
         """
-        square_begin_row = row - row % 3
-        square_begin_col = col - col % 3
         return [
-            self.data[square_begin_row + r][square_begin_col + c]
-            for r in range(3)
-            for c in range(3)
+            SYMBOLS[number] if number else None for number in self.square_view(row, col)
         ]
 
     def to_ss(self) -> str:
@@ -63,14 +276,27 @@ class Board:
         975|128|.63
 
         """
-        result = ""
-        for row, col in product(range(9), range(9)):
-            cell = self.data[row][col]
-            result += cell if cell else "."
-            if col in [2, 5]:
-                result += "|"
-            elif col == 8:
-                result += "\n"
-                if row in [2, 5]:
-                    result += "------------\n"
-        return result
+        return format_ss(self.to_sdm())
+
+    def to_sdm(self) -> str:
+        """
+        :return: the sudoku formatted in the sdm format, with 0 for the empty cells
+        """
+        return self.cells.translate(_TO_SYMBOLS).decode("ascii")
+
+
+def format_ss(sdm: str) -> str:
+    """
+    :return: the sudoku given in the sdm format, formatted in the ss format
+    """
+    geometry = geometry_of(len(sdm))
+    size = geometry.size
+    box_size = geometry.box_size
+    lines = []
+    for row in range(size):
+        if row and not row % box_size:
+            lines.append("-" * (size + box_size) + "\n")
+        line = sdm[row * size : row * size + size].replace("0", ".")
+        boxes = [line[col : col + box_size] for col in range(0, size, box_size)]
+        lines.append("|".join(boxes) + "\n")
+    return "".join(lines)
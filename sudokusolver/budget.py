@@ -0,0 +1,74 @@
+"""
+Limits on the time and the number of search nodes spent solving a puzzle
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised when the budget of a puzzle runs out before it is solved
+    """
+
+
+class Cancelled(BudgetExceeded):
+    """
+    Raised when the solving of a puzzle is cancelled before it is solved
+    """
+
+
+@dataclass(frozen=True)
+class Budget:
+    """
+    How much a solver may spend on each puzzle. None for no limit.
+    """
+
+    # In seconds
+    timeout: Optional[float] = None
+    max_nodes: Optional[int] = None
+    # Returns True once the solving should stop, checked at each node
+    cancelled: Optional[Callable[[], bool]] = None
+
+    def start(self) -> "Countdown":
+        """
+        :return: the countdown of a puzzle whose solving starts now
+        """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        return Countdown(deadline, self.max_nodes, self.cancelled)
+
+
+class Countdown:
+    """
+    What is left of the budget of a puzzle, checked by the solvers at each node of
+    their search
+    """
+
+    __slots__ = ("deadline", "max_nodes", "cancelled")
+
+    def __init__(
+        self,
+        deadline: Optional[float] = None,
+        max_nodes: Optional[int] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ):
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.cancelled = cancelled
+
+    def check(self, nodes: int):
+        """
+        :raises BudgetExceeded: if the search went past the deadline or the maximum
+        number of nodes
+        :raises Cancelled: if the search was cancelled
+        """
+        if self.cancelled is not None and self.cancelled():
+            raise Cancelled("Cancelled")
+        if self.max_nodes is not None and nodes > self.max_nodes:
+            raise BudgetExceeded(f"More than {self.max_nodes} nodes")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded("Deadline passed")
+
+
+# The countdown of the puzzles without a budget
+UNLIMITED = Countdown()
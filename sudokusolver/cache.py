@@ -0,0 +1,285 @@
+"""
+A cache of solutions, keyed by the canonical form of the puzzles.
+
+Puzzles which only differ by a relabeling of the digits, a permutation of the rows
+within a band, of the columns within a stack, of the bands or of the stacks, or a
+transposition, have the same canonical form, and share the same cache entry.
+"""
+import sqlite3
+from collections import OrderedDict
+from itertools import chain, groupby, islice, permutations, product
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sudokusolver import solver
+from sudokusolver.board import Board
+from sudokusolver.budget import Budget
+from sudokusolver.geometry import STANDARD
+from sudokusolver.solver import Algorithm, CellSelection, State
+from sudokusolver.stats import SolveStats
+
+# The cell positions of the board, and of the transposed board
+_ORIENTATIONS = [
+    tuple(range(81)),
+    tuple(col * 9 + row for row in range(9) for col in range(9)),
+]
+
+# The maximum number of orders of the rows, and of the columns, tried when several
+# rows or columns can't be told apart. Beyond that, equivalent puzzles may get
+# different canonical forms, which only costs some cache misses.
+_MAX_LINE_ORDERS = 8
+
+
+class Transform(NamedTuple):
+    """
+    How to go from a puzzle to its canonical form, and back
+    """
+
+    # The position in the puzzle of each cell of the canonical form
+    positions: Tuple[int, ...]
+    # The digit in the puzzle of each digit of the canonical form, "0" first
+    digits: str
+
+    def apply(self, sdm: str) -> str:
+        """
+        :return: the sdm, which has the same layout as the puzzle, in canonical form
+        """
+        text = "".join(sdm[position] for position in self.positions)
+        return text.translate(str.maketrans(self.digits, "0123456789"))
+
+    def revert(self, canonical_sdm: str) -> str:
+        """
+        :return: the sdm in canonical form, in the layout of the puzzle
+        """
+        cells = 81 * [""]
+        for position, digit in zip(self.positions, canonical_sdm):
+            cells[position] = digit
+        return "".join(cells).translate(str.maketrans("0123456789", self.digits))
+
+
+def _tied_orders(
+    items: Sequence[int], key: Callable[[int], object]
+) -> Iterator[Tuple[int, ...]]:
+    """
+    :return: the items sorted by key, in every order of the items with the same key
+    """
+    runs = [list(run) for _, run in groupby(sorted(items, key=key), key=key)]
+    for parts in product(*(permutations(run) for run in runs)):
+        yield tuple(chain.from_iterable(parts))
+
+
+def _line_orders(keys: List[List[Tuple[int, int]]]) -> List[Tuple[int, ...]]:
+    """
+    :return: the orders of the 9 rows or columns, keeping them within their band or
+    stack, sorted by their keys and the keys of their bands or stacks
+    """
+    line_orders = [
+        list(_tied_orders(range(group * 3, group * 3 + 3), keys.__getitem__))
+        for group in range(3)
+    ]
+    orders = (
+        tuple(chain.from_iterable(parts))
+        for group_order in _tied_orders(
+            range(3), lambda group: sorted(keys[group * 3 : group * 3 + 3])
+        )
+        for parts in product(*(line_orders[group] for group in group_order))
+    )
+    return list(islice(orders, _MAX_LINE_ORDERS))
+
+
+def _relabel(text: str) -> Tuple[str, str]:
+    """
+    :return: the text with the digits numbered in order of first appearance, and the
+    original digit of each new one
+    """
+    digits = "0" + "".join(dict.fromkeys(text.replace("0", "")))
+    digits += "".join(digit for digit in "123456789" if digit not in digits)
+    return text.translate(str.maketrans(digits, "0123456789")), digits
+
+
+def canonicalize(sdm: str) -> Tuple[str, Transform]:
+    """
+    :return: the canonical form of the puzzle, and how to go from the puzzle to it
+    """
+    best_text: Optional[str] = None
+    best_transform: Optional[Transform] = None
+    digit_counts = {digit: sdm.count(digit) for digit in "123456789"}
+    digit_counts["0"] = 0
+    for orientation in _ORIENTATIONS:
+        # How often each digit of each cell is used in the puzzle, 0 for the empty
+        # cells
+        uses = [digit_counts[sdm[position]] for position in orientation]
+        row_counts = [
+            sum(1 for use in uses[row * 9 : row * 9 + 9] if use) for row in range(9)
+        ]
+        col_counts = [sum(1 for use in uses[col::9] if use) for col in range(9)]
+        # Properties of the rows and columns which don't change with the
+        # permutations of the other rows and columns, or of the digits
+        row_keys = [
+            sorted(
+                (col_counts[col], uses[row * 9 + col])
+                for col in range(9)
+                if uses[row * 9 + col]
+            )
+            for row in range(9)
+        ]
+        col_keys = [
+            sorted(
+                (row_counts[row], uses[row * 9 + col])
+                for row in range(9)
+                if uses[row * 9 + col]
+            )
+            for col in range(9)
+        ]
+        col_orders = _line_orders(col_keys)
+        for row_order in _line_orders(row_keys):
+            for col_order in col_orders:
+                positions = tuple(
+                    orientation[row * 9 + col] for row in row_order for col in col_order
+                )
+                text, digits = _relabel(
+                    "".join(sdm[position] for position in positions)
+                )
+                if best_text is None or text < best_text:
+                    best_text, best_transform = text, Transform(positions, digits)
+    assert best_text is not None and best_transform is not None
+    return best_text, best_transform
+
+
+class SolutionCache:
+    """
+    Solutions of puzzles in canonical form, with the most recently used ones kept
+    in memory, and optionally all of them in a sqlite database, which persists
+    across runs.
+    """
+
+    def __init__(self, max_size: int = 10000, path: Optional[str] = None):
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._solutions: "OrderedDict[str, str]" = OrderedDict()
+        # Opened when first needed, so that it isn't shared with forked processes
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            assert self.path is not None
+            # Each statement is committed at once, and several processes may write
+            # to the database at the same time.
+            self._connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS solutions"
+                " (puzzle TEXT PRIMARY KEY, solution TEXT NOT NULL)"
+            )
+        return self._connection
+
+    def _remember(self, canonical_sdm: str, canonical_solution: str):
+        if self.max_size <= 0:
+            return
+        self._solutions[canonical_sdm] = canonical_solution
+        self._solutions.move_to_end(canonical_sdm)
+        while len(self._solutions) > self.max_size:
+            self._solutions.popitem(last=False)
+
+    def _lookup(self, canonical_sdm: str) -> Optional[str]:
+        solution = self._solutions.get(canonical_sdm)
+        if solution is not None:
+            self._solutions.move_to_end(canonical_sdm)
+            return solution
+        if self.path is None:
+            return None
+        row = (
+            self._get_connection()
+            .execute(
+                "SELECT solution FROM solutions WHERE puzzle = ?", (canonical_sdm,)
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        self._remember(canonical_sdm, row[0])
+        return row[0]
+
+    def _store(self, canonical_sdm: str, canonical_solution: str):
+        self._remember(canonical_sdm, canonical_solution)
+        if self.path is not None:
+            self._get_connection().execute(
+                "INSERT OR REPLACE INTO solutions VALUES (?, ?)",
+                (canonical_sdm, canonical_solution),
+            )
+
+    def get(self, sdm: str) -> Optional[str]:
+        """
+        :return: the cached solution of the puzzle, in sdm format, or None. The
+        puzzles of boards other than 9x9 are never cached.
+        """
+        if len(sdm) != 81:
+            self.misses += 1
+            return None
+        canonical_sdm, transform = canonicalize(sdm)
+        solution = self._lookup(canonical_sdm)
+        if solution is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return transform.revert(solution)
+
+    def put(self, sdm: str, solution: str):
+        """
+        Cache the solution of the puzzle, both in sdm format
+        """
+        if len(sdm) != 81:
+            return
+        canonical_sdm, transform = canonicalize(sdm)
+        self._store(canonical_sdm, transform.apply(solution))
+
+    def solve(
+        self,
+        board: Board,
+        algorithm: Algorithm = Algorithm.RECURSIVE,
+        cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+        stats: Optional[SolveStats] = None,
+        budget: Optional[Budget] = None,
+    ) -> Board:
+        """
+        Same as solver.solve(), but returns the cached solution if there is one,
+        and caches the solutions it finds
+        """
+        if board.geometry is not STANDARD:
+            self.misses += 1
+            return solver.solve(
+                board,
+                algorithm=algorithm,
+                cell_selection=cell_selection,
+                stats=stats,
+                budget=budget,
+            )
+        canonical_sdm, transform = canonicalize(board.to_sdm())
+        solution = self._lookup(canonical_sdm)
+        if solution is not None:
+            self.hits += 1
+            return Board(transform.revert(solution))
+        self.misses += 1
+        solved = solver.solve(
+            board,
+            algorithm=algorithm,
+            cell_selection=cell_selection,
+            stats=stats,
+            budget=budget,
+        )
+        # Only the solutions are cached, the puzzles we couldn't solve are tried again
+        if solver.get_state(solved) == State.VALID:
+            self._store(canonical_sdm, transform.apply(solved.to_sdm()))
+        return solved
+
+    def close(self):
+        """
+        Close the database, if it was opened
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
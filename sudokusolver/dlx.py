@@ -0,0 +1,285 @@
+"""
+A Sudoku board solver which solves the exact cover problem of the board with
+Knuth's Dancing Links implementation of Algorithm X
+"""
+import time
+from itertools import product
+from typing import List, Optional
+
+from sudokusolver.board import Board
+from sudokusolver.budget import UNLIMITED, Countdown
+from sudokusolver.geometry import UNITS_OF
+from sudokusolver.stats import SolveStats
+
+# There is one column for each constraint:
+# each cell has a number, and each row, column and square has each number once.
+# The 81 cell columns come first, then 9 columns for each of the 27 units.
+_UNIT_COLUMNS = 81
+_COLUMN_COUNT = 324
+
+# There is one row for each number which can be put in each cell:
+# row index * 9 + number - 1.
+_ROW_COUNT = 729
+
+
+def _constraint_columns(index: int, number: int) -> List[int]:
+    """
+    :return: the columns satisfied by putting the number in the cell at the given
+    position. The columns are 1-based, as node 0 is the root.
+    """
+    return [1 + index] + [
+        1 + _UNIT_COLUMNS + unit * 9 + number - 1 for unit in UNITS_OF[index]
+    ]
+
+
+class _DancingLinks:
+    """
+    The toroidal doubly-linked lists of the exact cover matrix, stored in arrays.
+    Node 0 is the root, nodes 1 to 324 are the column headers, and each of the 729
+    rows has 4 nodes after that.
+    """
+
+    __slots__ = ("left", "right", "up", "down", "column", "row", "size")
+
+    def __init__(self):
+        node_count = 1 + _COLUMN_COUNT + 4 * _ROW_COUNT
+        self.left: List[int] = list(range(-1, node_count - 1))
+        self.right: List[int] = list(range(1, node_count + 1))
+        self.up: List[int] = list(range(node_count))
+        self.down: List[int] = list(range(node_count))
+        self.column: List[int] = list(range(node_count))
+        self.row: List[int] = node_count * [-1]
+        self.size: List[int] = (1 + _COLUMN_COUNT) * [0]
+
+        # Link the root and the column headers in a circular list
+        self.left[0] = _COLUMN_COUNT
+        self.right[_COLUMN_COUNT] = 0
+
+        node = 1 + _COLUMN_COUNT
+        for index, number in product(range(81), range(1, 10)):
+            first = node
+            for column in _constraint_columns(index, number):
+                self.column[node] = column
+                self.row[node] = index * 9 + number - 1
+                # Append the node at the bottom of the column
+                self.up[node] = self.up[column]
+                self.down[node] = column
+                self.down[self.up[column]] = node
+                self.up[column] = node
+                self.size[column] += 1
+                node += 1
+            # Link the 4 nodes of the row in a circular list
+            self.left[first] = node - 1
+            self.right[node - 1] = first
+
+    def copy(self) -> "_DancingLinks":
+        """
+        :return: a copy of the links, which can be modified without affecting these
+        """
+        links = _DancingLinks.__new__(_DancingLinks)
+        for name in _DancingLinks.__slots__:
+            setattr(links, name, list(getattr(self, name)))
+        return links
+
+    def cover(self, column: int):
+        """
+        Remove the column from the header list, and its rows from the other columns
+        """
+        left, right, up, down, size = (
+            self.left,
+            self.right,
+            self.up,
+            self.down,
+            self.size,
+        )
+        right[left[column]] = right[column]
+        left[right[column]] = left[column]
+        i = down[column]
+        while i != column:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[self.column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, column: int):
+        """
+        Undo cover(column)
+        """
+        left, right, up, down, size = (
+            self.left,
+            self.right,
+            self.up,
+            self.down,
+            self.size,
+        )
+        i = up[column]
+        while i != column:
+            j = left[i]
+            while j != i:
+                size[self.column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[column]] = column
+        left[right[column]] = column
+
+    def select(self, node: int):
+        """
+        Cover the columns of the other nodes in the row of the given node
+        """
+        j = self.right[node]
+        while j != node:
+            self.cover(self.column[j])
+            j = self.right[j]
+
+    def deselect(self, node: int):
+        """
+        Undo select(node)
+        """
+        j = self.left[node]
+        while j != node:
+            self.uncover(self.column[j])
+            j = self.left[j]
+
+    def find_smallest_column(self) -> int:
+        """
+        :return: the uncovered column with the fewest rows, or 0 if all the columns
+        are covered
+        """
+        right, size = self.right, self.size
+        best_column = 0
+        best_size = _ROW_COUNT + 1
+        column = right[0]
+        while column:
+            if size[column] < best_size:
+                best_column = column
+                best_size = size[column]
+                if best_size <= 1:
+                    break
+            column = right[column]
+        return best_column
+
+    def search(
+        self,
+        solution: List[int],
+        solutions: List[List[int]],
+        limit: int,
+        stats: SolveStats,
+        countdown: Countdown,
+        start_nodes: int,
+        depth: int,
+    ) -> bool:
+        """
+        Select rows until all the columns are covered, appending the selected rows
+        to the solution. Each time all the columns are covered, a copy of the
+        solution is appended to solutions.
+        :param start_nodes: the number of nodes of the stats before the search, which
+        aren't checked against the countdown
+        :return: True if we found limit solutions, and the search should stop.
+        """
+        stats.nodes += 1
+        countdown.check(stats.nodes - start_nodes)
+        column = self.find_smallest_column()
+        if not column:
+            solutions.append(list(solution))
+            return len(solutions) >= limit
+        if not self.size[column]:
+            return False
+
+        stats.max_depth = max(stats.max_depth, depth)
+        self.cover(column)
+        node = self.down[column]
+        while node != column:
+            solution.append(self.row[node])
+            self.select(node)
+            stats.guesses += 1
+            if self.search(
+                solution, solutions, limit, stats, countdown, start_nodes, depth + 1
+            ):
+                return True
+            stats.backtracks += 1
+            self.deselect(node)
+            solution.pop()
+            node = self.down[node]
+        self.uncover(column)
+        return False
+
+
+_TEMPLATE: Optional[_DancingLinks] = None
+
+
+def _get_template() -> _DancingLinks:
+    """
+    :return: the links of the empty board, built the first time they're needed
+    """
+    global _TEMPLATE  # pylint: disable=global-statement
+    if _TEMPLATE is None:
+        _TEMPLATE = _DancingLinks()
+    return _TEMPLATE
+
+
+def find_solutions(
+    board: Board,
+    limit: int,
+    stats: Optional[SolveStats] = None,
+    countdown: Countdown = UNLIMITED,
+) -> List[Board]:
+    """
+    :param stats: if given, what the solver does is added to it
+    :param countdown: checked at each node of the search
+    :return: the solutions of the board, stopping at limit solutions
+    """
+    stats = stats if stats is not None else SolveStats()
+    start = time.perf_counter()
+    links = _get_template().copy()
+    solution: List[int] = []
+    covered = set()
+    for index, number in enumerate(board.cells):
+        if not number:
+            continue
+        columns = _constraint_columns(index, number)
+        if covered.intersection(columns):
+            # The board has duplicates
+            return []
+        covered.update(columns)
+        # The first node of the row is the one in the cell column
+        node = 1 + _COLUMN_COUNT + 4 * (index * 9 + number - 1)
+        links.cover(links.column[node])
+        links.select(node)
+        solution.append(links.row[node])
+
+    # There is no propagation besides covering the columns of the given numbers
+    search_start = time.perf_counter()
+    stats.propagate_seconds += search_start - start
+    solutions: List[List[int]] = []
+    try:
+        links.search(solution, solutions, limit, stats, countdown, stats.nodes, 1)
+    finally:
+        stats.search_seconds += time.perf_counter() - search_start
+    return [_to_board(rows) for rows in solutions]
+
+
+def _to_board(rows: List[int]) -> Board:
+    """
+    :return: the board with the numbers of the selected rows
+    """
+    cells = 81 * [0]
+    for row in rows:
+        index, number = divmod(row, 9)
+        cells[index] = number + 1
+    return Board.from_cells(cells)
+
+
+def solve(
+    board: Board, stats: Optional[SolveStats] = None, countdown: Countdown = UNLIMITED
+) -> Board:
+    """
+    :return: the board in its solved state, or the given board if we weren't able
+    to solve it. See find_solutions() for the parameters.
+    """
+    solutions = find_solutions(board, 1, stats, countdown)
+    return solutions[0] if solutions else board
@@ -0,0 +1,211 @@
+"""
+Generate sudoku puzzles with a unique solution, graded by the effort the solver
+needs to prove that their solution is unique
+"""
+import multiprocessing
+import random
+from enum import Enum
+from functools import partial
+from typing import Iterator, List, NamedTuple, Optional
+
+from sudokusolver import solver
+from sudokusolver.board import Board
+from sudokusolver.solver import Algorithm, CellSelection
+from sudokusolver.stats import SolveStats
+
+# How the puzzles are checked and graded. Guessing in the cell with the fewest
+# candidates makes the number of guesses depend less on the order of the cells.
+_ALGORITHM = Algorithm.BITMASK
+_CELL_SELECTION = CellSelection.MIN_CANDIDATES
+
+
+class Difficulty(str, Enum):
+    """
+    How hard a puzzle is
+    """
+
+    # Solved by filling in the cells where only one number is possible, and the
+    # numbers possible in only one cell of a row, column or square
+    EASY = "easy"
+    MEDIUM = "medium"
+    HARD = "hard"
+    DIABOLICAL = "diabolical"
+
+    def __str__(self):
+        return self.value
+
+
+# The maximum number of guesses of each difficulty, the last one having no maximum
+_MAX_GUESSES = {
+    Difficulty.EASY: 0,
+    Difficulty.MEDIUM: 4,
+    Difficulty.HARD: 12,
+}
+_DIFFICULTIES = list(Difficulty)
+
+
+class GeneratedPuzzle(NamedTuple):
+    """
+    A generated puzzle, and its solution, in sdm format
+    """
+
+    sdm: str
+    solution: str
+    difficulty: Difficulty
+
+
+def grade(stats: SolveStats) -> Difficulty:
+    """
+    :param stats: what the solver did to find the solutions of a puzzle with a unique
+    solution, up to a limit of 2, with the bitmask algorithm and the min_candidates
+    cell selection
+    :return: the difficulty of the puzzle
+    """
+    for difficulty, max_guesses in _MAX_GUESSES.items():
+        if stats.guesses <= max_guesses:
+            return difficulty
+    return Difficulty.DIABOLICAL
+
+
+def _check(board: Board) -> Optional[Difficulty]:
+    """
+    :return: the difficulty of the puzzle, or None if it doesn't have a unique
+    solution
+    """
+    stats = SolveStats()
+    solutions = solver.find_solutions(
+        board,
+        2,
+        algorithm=_ALGORITHM,
+        cell_selection=_CELL_SELECTION,
+        stats=stats,
+    )
+    if len(solutions) != 1:
+        return None
+    return grade(stats)
+
+
+def generate_grid(rng: random.Random) -> Board:
+    """
+    :return: a random solved board
+    """
+    cells = 81 * [0]
+    # The squares on the diagonal don't share rows or columns, so any numbers in them
+    # can be completed to a solved board
+    for square in range(3):
+        for position, number in enumerate(rng.sample(range(1, 10), 9)):
+            row, col = divmod(position, 3)
+            cells[(square * 3 + row) * 9 + square * 3 + col] = number
+    return solver.solve(Board.from_cells(cells), algorithm=_ALGORITHM)
+
+
+def _remove_clues(
+    puzzle: Board, rng: random.Random, hardest: Difficulty, symmetric: bool
+) -> Difficulty:
+    """
+    Remove the clues of the solved board one at a time, in a random order, keeping
+    only the removals after which the puzzle still has a unique solution and is at
+    most as hard as hardest
+    :return: the difficulty of the puzzle
+    """
+    difficulty = Difficulty.EASY
+    indexes = list(range(81 // 2 + 1) if symmetric else range(81))
+    rng.shuffle(indexes)
+    for index in indexes:
+        # With symmetric, the clues are removed by pairs, symmetric around the center
+        removed = sorted({index, 80 - index}) if symmetric else [index]
+        numbers = [puzzle.cells[removed_index] for removed_index in removed]
+        for removed_index in removed:
+            puzzle.set_cell(removed_index, 0)
+        # If the removed numbers are the only ones possible in their cells, the
+        # solver fills them in before anything else, so neither the solutions nor
+        # the difficulty change
+        if all(
+            puzzle.possible_numbers(removed_index) == [number]
+            for removed_index, number in zip(removed, numbers)
+        ):
+            continue
+        checked = _check(puzzle)
+        if checked is not None and _DIFFICULTIES.index(checked) <= _DIFFICULTIES.index(
+            hardest
+        ):
+            difficulty = checked
+        else:
+            for removed_index, number in zip(removed, numbers):
+                puzzle.set_cell(removed_index, number)
+    return difficulty
+
+
+def generate_puzzle(
+    rng: random.Random,
+    difficulty: Optional[Difficulty] = None,
+    symmetric: bool = False,
+) -> GeneratedPuzzle:
+    """
+    :param rng: where the randomness comes from, for the generation to be
+    reproducible
+    :param difficulty: the difficulty of the puzzle. None for any difficulty.
+    :param symmetric: True for clues which are symmetric around the center of the
+    board
+    :return: a puzzle with a unique solution. Its clues are removed until no more
+    can be removed without making the puzzle ambiguous or harder than the
+    difficulty. Puzzles which end up easier than the difficulty are discarded.
+    """
+    hardest = difficulty or Difficulty.DIABOLICAL
+    while True:
+        solution = generate_grid(rng)
+        puzzle = solution.copy()
+        found = _remove_clues(puzzle, rng, hardest, symmetric)
+        if difficulty is None or found == difficulty:
+            return GeneratedPuzzle(puzzle.to_sdm(), solution.to_sdm(), found)
+
+
+def _generate_chunk(
+    indexes: List[int],
+    seed: int,
+    difficulty: Optional[Difficulty],
+    symmetric: bool,
+) -> List[GeneratedPuzzle]:
+    """
+    :return: the puzzles with the given indexes. Each one has its own random
+    generator, seeded from the seed and its index, so that it doesn't depend on the
+    process which generates it.
+    """
+    return [
+        generate_puzzle(random.Random(f"{seed}:{index}"), difficulty, symmetric)
+        for index in indexes
+    ]
+
+
+def generate(
+    count: int,
+    difficulty: Optional[Difficulty] = None,
+    seed: Optional[int] = None,
+    symmetric: bool = False,
+    workers: Optional[int] = 1,
+    chunksize: int = 4,
+) -> Iterator[GeneratedPuzzle]:
+    """
+    Generate puzzles, in a pool of processes if there are several workers.
+    :param seed: the same seed generates the same puzzles, in the same order, for
+    any number of workers. None for a random seed.
+    :param workers: the number of processes. None for the number of CPUs.
+    :param chunksize: the number of puzzles a process generates at once
+    :return: the puzzles, as soon as they are generated, in order
+    """
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    chunks = (
+        list(range(start, min(start + chunksize, count)))
+        for start in range(0, count, chunksize)
+    )
+    generate_chunk = partial(
+        _generate_chunk, seed=seed, difficulty=difficulty, symmetric=symmetric
+    )
+    if workers == 1:
+        for chunk in chunks:
+            yield from generate_chunk(chunk)
+        return
+    with multiprocessing.Pool(processes=workers) as pool:
+        for puzzles in pool.imap(generate_chunk, chunks):
+            yield from puzzles
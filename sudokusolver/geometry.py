@@ -0,0 +1,101 @@
+"""
+The rows, columns and squares of a Sudoku board, computed once at import
+"""
+from functools import lru_cache
+from itertools import product
+from typing import List, Tuple
+
+
+class Geometry:
+    """
+    The positions of the cells of each row, column and square of a board whose squares
+    have box_size x box_size cells. The cells are numbered in row-major order.
+
+    The rows, columns and squares are called units. Units 0 to size - 1 are the rows,
+    size to 2 * size - 1 the columns, and 2 * size to 3 * size - 1 the squares.
+    """
+
+    def __init__(self, box_size: int):
+        size = box_size * box_size
+        cells = range(size * size)
+        self.box_size = box_size
+        self.size = size
+        self.cell_count = size * size
+        # The number of values of a cell: the numbers 1 to size, and 0 for empty
+        self.value_count = size + 1
+
+        self.rows: List[Tuple[int, ...]] = [
+            tuple(row * size + col for col in range(size)) for row in range(size)
+        ]
+        self.cols: List[Tuple[int, ...]] = [
+            tuple(row * size + col for row in range(size)) for col in range(size)
+        ]
+        self.squares: List[Tuple[int, ...]] = [
+            tuple(
+                (row + r) * size + col + c
+                for r in range(box_size)
+                for c in range(box_size)
+            )
+            for row, col in product(range(0, size, box_size), range(0, size, box_size))
+        ]
+        self.units: List[Tuple[int, ...]] = self.rows + self.cols + self.squares
+
+        # The unit of the row, column and square of each cell
+        self.row_unit: List[int] = [index // size for index in cells]
+        self.col_unit: List[int] = [size + index % size for index in cells]
+        self.square_unit: List[int] = [
+            2 * size + (index // size // box_size) * box_size + index % size // box_size
+            for index in cells
+        ]
+        self.units_of: List[Tuple[int, int, int]] = list(
+            zip(self.row_unit, self.col_unit, self.square_unit)
+        )
+
+        # The cells sharing a row, column or square with each cell
+        self.peers: List[Tuple[int, ...]] = [
+            tuple(
+                sorted(
+                    {peer for unit in self.units_of[index] for peer in self.units[unit]}
+                    - {index}
+                )
+            )
+            for index in cells
+        ]
+
+        # The units which may be affected when a number is put in each cell:
+        # the ones containing the cell or any of its peers
+        self.affected_units: List[Tuple[int, ...]] = [
+            tuple(
+                sorted(
+                    {
+                        unit
+                        for peer in self.peers[index] + (index,)
+                        for unit in self.units_of[peer]
+                    }
+                )
+            )
+            for index in cells
+        ]
+
+
+@lru_cache(maxsize=None)
+def get_geometry(box_size: int) -> Geometry:
+    """
+    :return: the geometry of the boards whose squares have box_size x box_size cells
+    """
+    return Geometry(box_size)
+
+
+STANDARD = get_geometry(3)
+
+# The tables of the standard 9x9 board, used in the innermost loops of the solvers
+ROWS = STANDARD.rows
+COLS = STANDARD.cols
+SQUARES = STANDARD.squares
+UNITS = STANDARD.units
+ROW_UNIT = STANDARD.row_unit
+COL_UNIT = STANDARD.col_unit
+SQUARE_UNIT = STANDARD.square_unit
+UNITS_OF = STANDARD.units_of
+PEERS = STANDARD.peers
+AFFECTED_UNITS = STANDARD.affected_units
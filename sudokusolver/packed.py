@@ -0,0 +1,258 @@
+"""
+A compact binary format for large numbers of puzzles, which can be memory-mapped and
+shared between processes by index ranges.
+
+The file is little-endian:
+- a header: the magic bytes SDMB, the format version (2 bytes), flags (2 bytes) and
+  the number of puzzles (8 bytes)
+- the puzzles, 41 bytes each: one cell per half byte, in row-major order, the first
+  cell of a byte in its high half, and the last half byte 0
+- if the solutions flag is set, the solutions in the same order and format. The
+  puzzles we couldn't solve are stored as they are.
+"""
+import mmap
+import struct
+from dataclasses import dataclass
+from itertools import islice
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"SDMB"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHQ")
+HEADER_SIZE = _HEADER.size
+RECORD_SIZE = 41
+# Only the puzzles of 9x9 boards can be packed
+CELL_COUNT = 81
+_FLAG_SOLUTIONS = 1
+
+_BATCH_SIZE = 10000
+
+
+def pack(sdms: Sequence[str]) -> bytes:
+    """
+    :param sdms: puzzles in sdm format, with 0 for the empty cells
+    :return: the records of the puzzles
+    :raises ValueError: if a puzzle isn't of a 9x9 board
+    """
+    for sdm in sdms:
+        if len(sdm) != CELL_COUNT:
+            raise ValueError(f"Only 9x9 puzzles can be packed, not {sdm!r}")
+    cells = np.zeros((len(sdms), 82), dtype=np.uint8)
+    cells[:, :81] = np.frombuffer(
+        "".join(sdms).encode("ascii"), dtype=np.uint8
+    ).reshape(len(sdms), 81) - ord("0")
+    return ((cells[:, 0::2] << 4) | cells[:, 1::2]).tobytes()
+
+
+def unpack(records: np.ndarray) -> List[str]:
+    """
+    :param records: an (N, 41) array of records
+    :return: the puzzles of the records in sdm format
+    :raises ValueError: if a cell isn't a number from 0 to 9
+    """
+    cells = np.empty((len(records), 82), dtype=np.uint8)
+    cells[:, 0::2] = records >> 4
+    cells[:, 1::2] = records & 0xF
+    cells = cells[:, :81]
+    if (cells > 9).any():
+        raise ValueError("Invalid packed puzzle")
+    text = (cells + ord("0")).tobytes().decode("ascii")
+    return [text[i : i + 81] for i in range(0, len(text), 81)]
+
+
+def is_packed(file: BinaryIO) -> bool:
+    """
+    :param file: a buffered file, which isn't read
+    :return: True if the file starts like a packed file
+    """
+    return file.peek(len(MAGIC))[: len(MAGIC)] == MAGIC
+
+
+class PackedWriter:
+    """
+    Writes a packed file: all the puzzles, then optionally all their solutions.
+    The file must be seekable, as the header is written again as the puzzles are
+    added.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.count = 0
+        self.solution_count: Optional[int] = None
+        self._write_header()
+
+    def _write_header(self):
+        flags = 0 if self.solution_count is None else _FLAG_SOLUTIONS
+        position = self.file.tell()
+        self.file.seek(0)
+        self.file.write(_HEADER.pack(MAGIC, VERSION, flags, self.count))
+        if position:
+            self.file.seek(position)
+        self.file.flush()
+
+    def _write_records(self, sdms: Iterable[str]) -> int:
+        written = 0
+        iterator = iter(sdms)
+        while batch := list(islice(iterator, _BATCH_SIZE)):
+            self.file.write(pack(batch))
+            written += len(batch)
+        return written
+
+    def write_puzzles(self, sdms: Iterable[str]):
+        """
+        Add the puzzles, in sdm format with 0 for the empty cells, and update the
+        header, so that the file can be read
+        """
+        if self.solution_count is not None:
+            raise ValueError("The puzzles must be written before the solutions")
+        self.count += self._write_records(sdms)
+        self._write_header()
+
+    def write_solutions(self, solutions: Iterable[str]):
+        """
+        Add the solutions of all the puzzles, in the same order
+        """
+        if self.solution_count is not None:
+            raise ValueError("The solutions were already written")
+        self.solution_count = self._write_records(solutions)
+        if self.solution_count != self.count:
+            raise ValueError(
+                f"{self.solution_count} solutions for {self.count} puzzles"
+            )
+        self._write_header()
+
+
+def write(
+    file: BinaryIO, sdms: Iterable[str], solutions: Optional[Iterable[str]] = None
+) -> int:
+    """
+    Write a packed file, with the solutions if they are given
+    :return: the number of puzzles
+    """
+    writer = PackedWriter(file)
+    writer.write_puzzles(sdms)
+    if solutions is not None:
+        writer.write_solutions(solutions)
+    return writer.count
+
+
+class PackedReader:
+    """
+    Reads the puzzles of a packed file, which is memory-mapped, so that the processes
+    reading it share its pages
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            header = file.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+                raise ValueError(f"{path} isn't a packed file")
+            _, version, flags, self.count = _HEADER.unpack(header)
+            if version != VERSION:
+                raise ValueError(f"{path} has the unsupported version {version}")
+            self.has_solutions = bool(flags & _FLAG_SOLUTIONS)
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        sections = 2 if self.has_solutions else 1
+        if len(self._mmap) < HEADER_SIZE + sections * self.count * RECORD_SIZE:
+            self.close()
+            raise ValueError(f"{path} is truncated")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _read(self, section: int, start: int, stop: Optional[int]) -> List[str]:
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop:
+            return []
+        offset = HEADER_SIZE + (section * self.count + start) * RECORD_SIZE
+        records = np.frombuffer(
+            self._mmap,
+            dtype=np.uint8,
+            count=(stop - start) * RECORD_SIZE,
+            offset=offset,
+        ).reshape(stop - start, RECORD_SIZE)
+        return unpack(records)
+
+    def puzzles(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """
+        :return: the puzzles with indexes from start to stop, excluded, in sdm format
+        """
+        return self._read(0, start, stop)
+
+    def solutions(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """
+        :return: the solutions of the puzzles with indexes from start to stop,
+        excluded, in sdm format
+        """
+        if not self.has_solutions:
+            raise ValueError(f"{self.path} has no solutions")
+        return self._read(1, start, stop)
+
+    def close(self):
+        """
+        Unmap the file
+        """
+        self._mmap.close()
+
+    def __enter__(self) -> "PackedReader":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# The readers opened by this process, by path
+_READERS: Dict[str, PackedReader] = {}
+
+
+def open_shared(path: str) -> PackedReader:
+    """
+    :return: a reader of the file which stays open for the lifetime of the process,
+    and is shared by its callers
+    """
+    reader = _READERS.get(path)
+    if reader is None:
+        reader = _READERS[path] = PackedReader(path)
+    return reader
+
+
+@dataclass(frozen=True)
+class PackedRange:
+    """
+    The puzzles of a packed file with indexes from start to stop, excluded. Cheap to
+    send to another process, which reads the puzzles from the file itself.
+    """
+
+    path: str
+    start: int
+    stop: int
+
+    @classmethod
+    def of_file(cls, path: str) -> "PackedRange":
+        """
+        :return: the range of all the puzzles of the file
+        """
+        return cls(path, 0, len(open_shared(path)))
+
+    def __len__(self) -> int:
+        return max(0, self.stop - self.start)
+
+    def split(self, size: int) -> Iterator["PackedRange"]:
+        """
+        :return: consecutive ranges of at most size puzzles, covering this range
+        """
+        for start in range(self.start, self.stop, size):
+            yield PackedRange(self.path, start, min(start + size, self.stop))
+
+    def read(self) -> List[str]:
+        """
+        :return: the puzzles of the range in sdm format
+        """
+        return open_shared(self.path).puzzles(self.start, self.stop)
+
+    def __iter__(self) -> Iterator[str]:
+        for part in self.split(_BATCH_SIZE):
+            yield from part.read()
@@ -0,0 +1,157 @@
+"""
+Read many sudoku puzzles in sdm format at once, reporting the malformed lines
+instead of stopping at them
+"""
+from typing import BinaryIO, Callable, Collection, Iterator, List, NamedTuple, Optional
+
+from sudokusolver.board import BOX_SIZES, SYMBOLS
+
+# The characters which mean an empty cell, besides 0
+_BLANKS = "._"
+# Translation tables which turn the empty cells into 0
+_TO_ZEROS = bytes.maketrans(_BLANKS.encode("ascii"), b"0" * len(_BLANKS))
+_TEXT_TO_ZEROS = str.maketrans(_BLANKS, "0" * len(_BLANKS))
+_BLANK_TOKENS = {"0", *_BLANKS}
+# The blanks first, as the symbols allowed depend on the size of the board
+_ALL_SYMBOLS = _BLANKS + SYMBOLS
+_DIGITS = b"0123456789"
+_CHUNK_SIZE = 1 << 20
+
+
+class SdmError(NamedTuple):
+    """
+    A line which isn't a puzzle in sdm format
+    """
+
+    # Starting from 1
+    line_number: int
+    line: str
+    reason: str
+
+    def __str__(self):
+        return f"Line {self.line_number}: {self.reason}: {self.line!r}"
+
+
+ErrorHandler = Callable[[SdmError], None]
+
+
+def _check_size(cell_count: int) -> int:
+    """
+    :return: the number of values of a board with this number of cells
+    :raises ValueError: if no board has this number of cells
+    """
+    box_size = BOX_SIZES.get(cell_count)
+    if box_size is None:
+        sizes = ", ".join(str(count) for count in BOX_SIZES)
+        raise ValueError(f"{cell_count} cells instead of one of {sizes}")
+    return box_size**2 + 1
+
+
+def _parse_numbers(tokens: List[str]) -> str:
+    """
+    :return: the cells given as numbers, in sdm format
+    """
+    value_count = _check_size(len(tokens))
+    invalid = [
+        token
+        for token in tokens
+        if token not in _BLANK_TOKENS
+        and not (token.isdigit() and int(token) < value_count)
+    ]
+    if invalid:
+        raise ValueError(f"invalid numbers {' '.join(dict.fromkeys(invalid))!r}")
+    return "".join(
+        "0" if token in _BLANK_TOKENS else SYMBOLS[int(token)] for token in tokens
+    )
+
+
+def parse_sdm(text: str) -> str:
+    """
+    Parse a puzzle of a 9x9 board, or of a board from 4x4 to 25x25. It is written
+    either with one symbol per cell, from 1 to 9 then from A to P, or as numbers
+    separated by whitespace or commas. 0, . and _ mean an empty cell.
+    :return: the puzzle in sdm format, with 0 for the empty cells
+    :raises ValueError: if the text isn't a puzzle
+    """
+    tokens = text.replace(",", " ").split()
+    if len(tokens) != 1:
+        return _parse_numbers(tokens)
+    line = tokens[0]
+    allowed = _ALL_SYMBOLS[: _check_size(len(line)) + len(_BLANKS)]
+    invalid = "".join(
+        dict.fromkeys(symbol for symbol in line if symbol.upper() not in allowed)
+    )
+    if invalid:
+        raise ValueError(f"invalid characters {invalid!r}")
+    return line.upper().translate(_TEXT_TO_ZEROS)
+
+
+def parse_sdms(
+    data: bytes,
+    first_line_number: int = 1,
+    on_error: Optional[ErrorHandler] = None,
+    cell_counts: Optional[Collection[int]] = None,
+) -> List[str]:
+    """
+    Parse the lines of the data, which may end with \\n or \\r\\n, and be surrounded
+    with whitespace. See parse_sdm() for the format of a line. The blank lines are
+    skipped.
+    :param first_line_number: the line number of the first line of the data, for the
+    errors
+    :param on_error: called with each line which isn't a puzzle in sdm format.
+    None to skip them silently.
+    :param cell_counts: if given, the puzzles with another number of cells are
+    errors too
+    :return: the puzzles in sdm format, with 0 for the empty cells
+    """
+    data = data.translate(_TO_ZEROS).replace(b"\r\n", b"\n")
+    # The usual case, which doesn't need looking at each line in Python: only
+    # digits and \n
+    if not data.translate(None, _DIGITS + b"\n"):
+        sdms = data.decode("ascii").split()
+        if (cell_counts is None or 81 in cell_counts) and all(
+            len(sdm) == 81 for sdm in sdms
+        ):
+            return sdms
+    sdms = []
+    for line_number, line in enumerate(data.split(b"\n"), start=first_line_number):
+        text = line.decode("utf-8", "replace").strip()
+        if not text:
+            continue
+        try:
+            sdm = parse_sdm(text)
+            if cell_counts is not None and len(sdm) not in cell_counts:
+                counts = ", ".join(str(count) for count in cell_counts)
+                raise ValueError(f"{len(sdm)} cells instead of {counts}")
+            sdms.append(sdm)
+        except ValueError as error:
+            if on_error:
+                on_error(SdmError(line_number, text, str(error)))
+    return sdms
+
+
+def read_sdms(
+    file: BinaryIO,
+    on_error: Optional[ErrorHandler] = None,
+    chunk_size=_CHUNK_SIZE,
+    cell_counts: Optional[Collection[int]] = None,
+) -> Iterator[str]:
+    """
+    Read the puzzles of the file, as much as is available at once, up to chunk_size
+    bytes, so that the puzzles of a pipe are solved as soon as they are written.
+    See parse_sdms() for the format and the parameters.
+    :return: the puzzles in sdm format, with 0 for the empty cells
+    """
+    read = getattr(file, "read1", file.read)
+    line_number = 1
+    remainder = b""
+    while chunk := read(chunk_size):
+        data = remainder + chunk
+        # Keep the last line for the next chunk, until it is complete
+        end = data.rfind(b"\n") + 1
+        data, remainder = data[:end], data[end:]
+        if data:
+            yield from parse_sdms(data, line_number, on_error, cell_counts)
+            line_number += data.count(b"\n")
+    if remainder:
+        yield from parse_sdms(remainder, line_number, on_error, cell_counts)
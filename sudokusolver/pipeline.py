@@ -0,0 +1,415 @@
+"""
+Solve streams of sudoku puzzles in sdm format, one at a time, in batches, or in a pool
+of processes
+"""
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from itertools import islice
+from multiprocessing import util
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from sudokusolver import batch, solver
+from sudokusolver.board import Board
+from sudokusolver.budget import Budget, BudgetExceeded
+from sudokusolver.cache import SolutionCache
+from sudokusolver.packed import PackedRange
+from sudokusolver.solver import Algorithm, CellSelection, State
+from sudokusolver.stats import SolveStats
+
+
+class Result(NamedTuple):
+    """
+    The outcome of solving a puzzle, small enough to be cheap to send between
+    processes
+    """
+
+    sdm: str
+    solution: str
+    state: State
+    # What the solver did, if it was asked to
+    stats: Optional[SolveStats] = None
+    # The number of solutions found, up to the limit, if they were counted
+    solution_count: Optional[int] = None
+
+
+def solve_sdm(
+    sdm: str,
+    algorithm: Algorithm = Algorithm.RECURSIVE,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    cache: Optional[SolutionCache] = None,
+    with_stats: bool = False,
+    budget: Optional[Budget] = None,
+    count_limit: Optional[int] = None,
+) -> Result:
+    """
+    :param with_stats: True to return what the solver did in the result
+    :param budget: what the solver may spend on the puzzle
+    :param count_limit: if given, count the solutions of the puzzle up to this limit,
+    without the cache. The solution is then the first one found.
+    :return: the result of solving the puzzle, or of looking it up in the cache.
+    If the budget ran out, the solution is the puzzle, in the TIMED_OUT state.
+    """
+    stats = SolveStats()
+    start = time.perf_counter()
+    board = Board(sdm)
+    stats.parse_seconds = time.perf_counter() - start
+    if count_limit is not None:
+        return _count_solutions(
+            board,
+            algorithm,
+            cell_selection,
+            stats if with_stats else None,
+            budget,
+            count_limit,
+        )
+    solve = cache.solve if cache else solver.solve
+    try:
+        solution = solve(
+            board,
+            algorithm=algorithm,
+            cell_selection=cell_selection,
+            stats=stats,
+            budget=budget,
+        )
+    except BudgetExceeded:
+        return Result(sdm, sdm, State.TIMED_OUT, stats if with_stats else None)
+    return Result(
+        sdm,
+        solution.to_sdm(),
+        solver.get_state(solution),
+        stats if with_stats else None,
+    )
+
+
+def _count_solutions(
+    board: Board,
+    algorithm: Algorithm,
+    cell_selection: CellSelection,
+    stats: Optional[SolveStats],
+    budget: Optional[Budget],
+    limit: int,
+) -> Result:
+    """
+    :return: the result of counting the solutions of the puzzle
+    """
+    sdm = board.to_sdm()
+    try:
+        solutions = solver.find_solutions(
+            board,
+            limit,
+            algorithm=algorithm,
+            cell_selection=cell_selection,
+            stats=stats,
+            budget=budget,
+        )
+    except BudgetExceeded:
+        return Result(sdm, sdm, State.TIMED_OUT, stats)
+    if not solutions:
+        return Result(sdm, sdm, solver.get_state(board), stats, 0)
+    return Result(sdm, solutions[0].to_sdm(), State.VALID, stats, len(solutions))
+
+
+def solve_sequential(
+    sdms: Iterable[str],
+    algorithm: Algorithm = Algorithm.RECURSIVE,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    cache: Optional[SolutionCache] = None,
+    with_stats: bool = False,
+    budget: Optional[Budget] = None,
+    count_limit: Optional[int] = None,
+) -> Iterator[Result]:
+    """
+    :return: the results of the puzzles, solved one at a time
+    """
+    for sdm in sdms:
+        yield solve_sdm(
+            sdm,
+            algorithm=algorithm,
+            cell_selection=cell_selection,
+            cache=cache,
+            with_stats=with_stats,
+            budget=budget,
+            count_limit=count_limit,
+        )
+
+
+def solve_batches(
+    sdms: Iterable[str],
+    algorithm: Algorithm = Algorithm.BITMASK,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    batch_size: int = 10000,
+    cache: Optional[SolutionCache] = None,
+    with_stats: bool = False,
+    budget: Optional[Budget] = None,
+) -> Iterator[Result]:
+    """
+    :return: the results of the puzzles, solved with the batch solver, reading one
+    batch at a time. The puzzles found in the cache aren't solved again. The batch
+    solver only solves 9x9 boards, the other ones are solved one at a time.
+    """
+    iterator = iter(sdms)
+    while sdm_batch := list(islice(iterator, batch_size)):
+        cached = [cache.get(sdm) if cache else None for sdm in sdm_batch]
+        missing = [
+            sdm
+            for sdm, solution in zip(sdm_batch, cached)
+            if solution is None and len(sdm) == 81
+        ]
+        stats: List[SolveStats] = []
+        # In reverse order, to pop them in order
+        solutions = batch.solve_many(
+            missing,
+            algorithm=algorithm,
+            cell_selection=cell_selection,
+            stats=stats,
+            budget=budget,
+        )[::-1]
+        stats.reverse()
+        for sdm, cached_solution in zip(sdm_batch, cached):
+            if len(sdm) != 81:
+                yield solve_sdm(
+                    sdm,
+                    algorithm=algorithm,
+                    cell_selection=cell_selection,
+                    with_stats=with_stats,
+                    budget=budget,
+                )
+                continue
+            if cached_solution is not None:
+                yield Result(
+                    sdm,
+                    cached_solution,
+                    State.VALID,
+                    SolveStats() if with_stats else None,
+                )
+                continue
+            solution = solutions.pop()
+            board_stats = stats.pop()
+            if board_stats.timeouts:
+                state = State.TIMED_OUT
+            else:
+                state = solver.get_state(solution)
+            if cache and state == State.VALID:
+                cache.put(sdm, solution.to_sdm())
+            yield Result(
+                sdm, solution.to_sdm(), state, board_stats if with_stats else None
+            )
+
+
+@dataclass
+class PoolOptions:
+    """
+    How to solve puzzles in a pool of processes
+    """
+
+    # The number of processes. None for the number of CPUs.
+    workers: Optional[int] = None
+    # The number of puzzles sent to a process at once.
+    # None to adapt it to the observed time to solve a puzzle.
+    chunksize: Optional[int] = None
+    # fork, forkserver or spawn. None for the platform default.
+    start_method: Optional[str] = None
+    # The number of chunks a process solves before it is replaced.
+    # None for processes which live as long as the pool.
+    maxtasksperchild: Optional[int] = None
+    # True to return the results in the order of the input, instead of as soon as
+    # they are available.
+    ordered: bool = False
+    # The maximum number of puzzles read from the input and not returned yet.
+    max_in_flight: int = 1024
+
+
+# With adaptive chunks, each chunk should take about this long to solve: long enough
+# for the cost of sending it to a process to be negligible, and short enough to keep
+# all the processes busy until the end.
+_TARGET_CHUNK_SECONDS = 0.05
+
+# Until the first chunk is timed, the puzzles in flight are split in this many
+# chunks per process, so that they aren't sent one at a time
+_INITIAL_CHUNKS_PER_WORKER = 4
+
+# How often the pool's task handler thread checks whether it should stop, while it
+# waits for results to be returned
+_STOP_CHECK_SECONDS = 0.1
+
+# Higher than the priority of the pool's own finalizer, which waits for the task
+# handler thread, so that the thread is stopped first at exit
+_STOP_EXIT_PRIORITY = 16
+
+
+class _ChunkSizer:
+    """
+    Chooses how many puzzles to send to a process at once
+    """
+
+    def __init__(self, chunksize: Optional[int], max_size: int, workers: int):
+        self.adaptive = chunksize is None
+        self.max_size = max_size
+        if chunksize is None:
+            chunksize = max(1, max_size // (_INITIAL_CHUNKS_PER_WORKER * workers))
+        self.size = min(chunksize, max_size)
+        self.seconds_per_puzzle: Optional[float] = None
+
+    def update(self, puzzle_count: int, seconds: float):
+        """
+        Adapt the chunk size to the time it took to solve a chunk
+        """
+        if not self.adaptive:
+            return
+        observed = seconds / puzzle_count
+        if self.seconds_per_puzzle is None:
+            self.seconds_per_puzzle = observed
+        else:
+            # Exponential moving average, to smooth out the outliers
+            self.seconds_per_puzzle = 0.8 * self.seconds_per_puzzle + 0.2 * observed
+        size = int(_TARGET_CHUNK_SECONDS / max(self.seconds_per_puzzle, 1e-6))
+        self.size = max(1, min(size, self.max_size))
+
+
+# The cache of the worker process, if the puzzles are cached
+_WORKER_CACHE: Optional[SolutionCache] = None
+
+
+def _init_worker(cache_max_size: int, cache_path: Optional[str]):
+    """
+    Give the worker process its own cache, sharing the database of the parent's one
+    """
+    global _WORKER_CACHE  # pylint: disable=global-statement
+    _WORKER_CACHE = SolutionCache(max_size=cache_max_size, path=cache_path)
+
+
+def _solve_chunk(
+    chunk: Union[List[str], PackedRange],
+    algorithm: Algorithm,
+    cell_selection: CellSelection,
+    with_stats: bool,
+    budget: Optional[Budget],
+    count_limit: Optional[int],
+) -> Tuple[List[Result], float, int, int]:
+    """
+    :return: the results of the puzzles, the time it took to solve them, and the
+    number of cache hits and misses
+    """
+    start = time.perf_counter()
+    sdms = chunk.read() if isinstance(chunk, PackedRange) else chunk
+    cache = _WORKER_CACHE
+    hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+    results = [
+        solve_sdm(
+            sdm, algorithm, cell_selection, cache, with_stats, budget, count_limit
+        )
+        for sdm in sdms
+    ]
+    if cache:
+        hits, misses = cache.hits - hits, cache.misses - misses
+    return results, time.perf_counter() - start, hits, misses
+
+
+def solve_parallel(
+    sdms: Iterable[str],
+    algorithm: Algorithm = Algorithm.RECURSIVE,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    options: Optional[PoolOptions] = None,
+    cache: Optional[SolutionCache] = None,
+    with_stats: bool = False,
+    budget: Optional[Budget] = None,
+    count_limit: Optional[int] = None,
+) -> Iterator[Result]:
+    """
+    Solve the puzzles in a pool of processes.
+    At most options.max_in_flight puzzles are read from the input before their
+    result is returned, so that the input can be read lazily.
+    If the puzzles are a range of a packed file, only the ranges of the chunks are
+    sent to the processes, which read the puzzles from the file themselves.
+    If a cache is given, each process has its own in-memory cache of the same size,
+    and they share its database. The hits and misses of the processes are added to
+    the given cache.
+    :return: the results of the puzzles, as soon as they are available, or in the
+    order of the input if options.ordered is True.
+    """
+    options = options or PoolOptions()
+    max_in_flight = options.max_in_flight
+    sizer = _ChunkSizer(
+        options.chunksize,
+        max_size=max_in_flight,
+        workers=options.workers or os.cpu_count() or 1,
+    )
+    in_flight = threading.Semaphore(max_in_flight)
+    stopped = threading.Event()
+
+    def acquire() -> bool:
+        # Called from the pool's task handler thread. Returns False once the results
+        # aren't read anymore.
+        while not in_flight.acquire(  # pylint: disable=consider-using-with
+            timeout=_STOP_CHECK_SECONDS
+        ):
+            if stopped.is_set():
+                return False
+        return not stopped.is_set()
+
+    def ranges(packed_range: PackedRange) -> Iterator[PackedRange]:
+        # Called from the pool's task handler thread
+        start = packed_range.start
+        while start < packed_range.stop:
+            stop = min(start + sizer.size, packed_range.stop)
+            for _ in range(stop - start):
+                if not acquire():
+                    return
+            yield PackedRange(packed_range.path, start, stop)
+            start = stop
+
+    def chunks() -> Iterator[List[str]]:
+        # Called from the pool's task handler thread
+        iterator = iter(sdms)
+        while True:
+            chunk = []
+            size = sizer.size
+            for sdm in iterator:
+                if not acquire():
+                    return
+                chunk.append(sdm)
+                if len(chunk) >= size:
+                    break
+            if not chunk:
+                return
+            yield chunk
+
+    solve_chunk = partial(
+        _solve_chunk,
+        algorithm=algorithm,
+        cell_selection=cell_selection,
+        with_stats=with_stats,
+        budget=budget,
+        count_limit=count_limit,
+    )
+    context = multiprocessing.get_context(options.start_method)
+    with context.Pool(
+        processes=options.workers,
+        maxtasksperchild=options.maxtasksperchild,
+        initializer=_init_worker if cache else None,
+        initargs=(cache.max_size, cache.path) if cache else (),
+    ) as pool:
+        # If the caller stops reading the results without closing this generator,
+        # for example because it raised, the pool is terminated at exit, which waits
+        # for the task handler thread: stop it first
+        stop = util.Finalize(pool, stopped.set, exitpriority=_STOP_EXIT_PRIORITY)
+        imap = pool.imap if options.ordered else pool.imap_unordered
+        tasks = ranges(sdms) if isinstance(sdms, PackedRange) else chunks()
+        try:
+            for results, seconds, hits, misses in imap(solve_chunk, tasks):
+                sizer.update(len(results), seconds)
+                if cache:
+                    cache.hits += hits
+                    cache.misses += misses
+                for result in results:
+                    in_flight.release()
+                    yield result
+        finally:
+            # Unblock the task handler thread, in case we stopped early
+            stop()
+            for _ in range(max_in_flight):
+                in_flight.release()
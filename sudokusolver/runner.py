@@ -2,37 +2,311 @@
 Read the user input from the command line, solve tne input, and output the solutions to standard out
 """
 import argparse
+import json
+import math
 import multiprocessing
+import os
+import sys
+from contextlib import closing
 from enum import Enum
+from typing import BinaryIO, Iterable, Iterator, List, Optional, TextIO
 
-from sudokusolver import solver
-from sudokusolver.board import Board
-from sudokusolver.solver import Algorithm
+from sudokusolver import generator, packed, parsing, pipeline, shared
+from sudokusolver.board import format_ss
+from sudokusolver.budget import Budget
+from sudokusolver.cache import SolutionCache
+from sudokusolver.generator import Difficulty
+from sudokusolver.packed import PackedRange
+from sudokusolver.parsing import SdmError
+from sudokusolver.pipeline import PoolOptions, Result
+from sudokusolver.server import ServerOptions, SolveServer
+from sudokusolver.solver import Algorithm, CellSelection, State
+from sudokusolver.stats import SolveStats
 
 
 def run():
     """
-    Run the solver on the sudoku puzzles input by the user on the command line
+    Run the solver on the sudoku puzzles input by the user on the command line, or
+    the generator with the generate subcommand, the converter with the convert
+    subcommand, or the HTTP server with the serve subcommand
     """
+    if sys.argv[1:2] == ["generate"]:
+        _run_generate(_parse_generate_args(sys.argv[2:]))
+        return
+    if sys.argv[1:2] == ["convert"]:
+        _run_convert(_parse_convert_args(sys.argv[2:]))
+        return
+    if sys.argv[1:2] == ["serve"]:
+        _run_serve(_parse_serve_args(sys.argv[2:]))
+        return
     options = _parse_args()
-    sdms = []
-    if options.sdm:
-        sdms.append(options.sdm)
-    else:
-        with options.file as file:
-            sdms = [line.rstrip() for line in file]
+    try:
+        try:
+            if options.sdm:
+                _run(options, [options.sdm], options.output)
+            else:
+                with options.file as file:
+                    _run(options, _read_file(file), options.output)
+        finally:
+            if options.output is sys.stdout:
+                options.output.flush()
+            else:
+                options.output.close()
+    except BrokenPipeError:
+        _exit_on_broken_pipe()
 
+
+def _run_generate(options: argparse.Namespace):
+    puzzles = generator.generate(
+        options.count,
+        difficulty=options.difficulty,
+        seed=options.seed,
+        symmetric=options.symmetric,
+        workers=options.workers,
+    )
+    try:
+        try:
+            for puzzle in puzzles:
+                options.output.write(f"{puzzle.sdm}\n")
+        finally:
+            if options.output is sys.stdout:
+                options.output.flush()
+            else:
+                options.output.close()
+    except BrokenPipeError:
+        _exit_on_broken_pipe()
+
+
+def _exit_on_broken_pipe():
+    """
+    Exit quietly when the output was closed before everything was written to it, as
+    when piped to head. The processes were already stopped by closing the results.
+    """
+    # Standard output is flushed again at exit, which would fail in the same way
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.exit(1)
+
+
+def _run_convert(options: argparse.Namespace):
+    with open(options.input, "rb") as file:
+        if not packed.is_packed(file):
+            with open(options.output, "w+b") as output:
+                writer = packed.PackedWriter(output)
+                writer.write_puzzles(
+                    parsing.read_sdms(
+                        file,
+                        on_error=_report_error,
+                        cell_counts=(packed.CELL_COUNT,),
+                    )
+                )
+                if options.solve:
+                    results = pipeline.solve_parallel(
+                        PackedRange(options.output, 0, writer.count),
+                        algorithm=options.algorithm,
+                        options=PoolOptions(workers=options.workers, ordered=True),
+                    )
+                    writer.write_solutions(result.solution for result in results)
+            return
+    with packed.PackedReader(options.input) as reader:
+        if options.solutions and not reader.has_solutions:
+            sys.exit(f"{options.input} has no solutions")
+        read = reader.solutions if options.solutions else reader.puzzles
+        with open(options.output, "w", encoding="ascii") as output:
+            for start in range(0, len(reader), _CONVERT_BATCH_SIZE):
+                sdms = read(start, start + _CONVERT_BATCH_SIZE)
+                output.writelines(f"{sdm}\n" for sdm in sdms)
+
+
+_CONVERT_BATCH_SIZE = 10000
+
+
+def _run_serve(options: argparse.Namespace):
+    budget = None
+    if options.timeout or options.max_nodes:
+        budget = Budget(timeout=options.timeout, max_nodes=options.max_nodes)
+    server = SolveServer(
+        (options.host, options.port),
+        ServerOptions(
+            algorithm=options.algorithm,
+            cell_selection=options.cell_selection,
+            budget=budget,
+            workers=options.workers,
+            batch_window=options.batch_window,
+            max_batch_size=options.max_batch_size,
+        ),
+        log_requests=options.log_requests,
+    )
+    host, port = server.server_address[:2]
+    print(f"Serving on http://{host}:{port}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _read_file(file: BinaryIO) -> Iterable[str]:
+    """
+    :return: the puzzles of the file, in sdm or packed format
+    """
+    if not packed.is_packed(file):
+        return parsing.read_sdms(file, on_error=_report_error)
+    if file is sys.stdin.buffer:
+        sys.exit("A packed file can't be read from standard input")
+    return PackedRange.of_file(file.name)
+
+
+def _report_error(error: SdmError):
+    """
+    Write the line which isn't a puzzle to standard error, and go on with the others
+    """
+    print(error, file=sys.stderr)
+
+
+def _run(options: argparse.Namespace, sdms: Iterable[str], output: TextIO):
+    cache = None
+    if options.cache_size or options.cache_file:
+        cache = SolutionCache(max_size=options.cache_size, path=options.cache_file)
+    try:
+        # Closed even if the results can't all be written, for example if the output
+        # was closed, so that the processes are stopped right away
+        with closing(_solve(options, sdms, cache)) as solved:
+            results = _report_timeouts(solved)
+            if options.stats:
+                results = _report_stats(results, summary=options.file is not None)
+            _write_results(results, output, counted=options.count is not None)
+    finally:
+        if cache:
+            cache.close()
+            print(
+                f"Cache: {cache.hits} hits, {cache.misses} misses",
+                file=sys.stderr,
+            )
+
+
+def _solve(
+    options: argparse.Namespace, sdms: Iterable[str], cache: Optional[SolutionCache]
+) -> Iterator[Result]:
+    budget = None
+    if options.timeout or options.max_nodes:
+        budget = Budget(timeout=options.timeout, max_nodes=options.max_nodes)
     if options.mode == _Mode.PARALLEL:
-        with multiprocessing.Pool() as pool:
-            pool.starmap(_solve, [(sdm, options.algorithm) for sdm in sdms])
-    else:
-        for sdm in sdms:
-            _solve(sdm, options.algorithm)
+        return pipeline.solve_parallel(
+            sdms,
+            algorithm=options.algorithm,
+            cell_selection=options.cell_selection,
+            options=PoolOptions(
+                workers=options.workers,
+                chunksize=options.chunksize,
+                start_method=options.start_method,
+                maxtasksperchild=options.maxtasksperchild,
+                ordered=options.ordered,
+                max_in_flight=options.max_in_flight,
+            ),
+            cache=cache,
+            with_stats=options.stats,
+            budget=budget,
+            count_limit=options.count,
+        )
+    if options.mode == _Mode.SHARED:
+        return shared.solve_shared(
+            sdms,
+            algorithm=options.algorithm,
+            cell_selection=options.cell_selection,
+            options=PoolOptions(
+                workers=options.workers,
+                chunksize=options.chunksize,
+                start_method=options.start_method,
+            ),
+            budget=budget,
+        )
+    if options.mode == _Mode.BATCH:
+        return pipeline.solve_batches(
+            sdms,
+            algorithm=options.algorithm,
+            cell_selection=options.cell_selection,
+            cache=cache,
+            with_stats=options.stats,
+            budget=budget,
+        )
+    return pipeline.solve_sequential(
+        sdms,
+        algorithm=options.algorithm,
+        cell_selection=options.cell_selection,
+        cache=cache,
+        with_stats=options.stats,
+        budget=budget,
+        count_limit=options.count,
+    )
+
+
+def _report_timeouts(results: Iterable[Result]) -> Iterator[Result]:
+    """
+    Write the puzzles whose budget ran out to standard error
+    """
+    for result in results:
+        if result.state == State.TIMED_OUT:
+            print(f"Timed out: {result.sdm}", file=sys.stderr)
+        yield result
+
+
+def _report_stats(results: Iterable[Result], summary: bool) -> Iterator[Result]:
+    """
+    Write the statistics of each result to standard error as a JSON line, and if
+    summary is True, the statistics of all the results at the end
+    """
+    total = SolveStats()
+    count = 0
+    for result in results:
+        stats = result.stats or SolveStats()
+        print(
+            json.dumps({"sdm": result.sdm, "state": result.state, **stats.to_dict()}),
+            file=sys.stderr,
+        )
+        total.add(stats)
+        count += 1
+        yield result
+    if summary:
+        print(
+            f"{count} puzzles: {total.nodes} nodes, {total.guesses} guesses,"
+            f" {total.backtracks} backtracks, {total.propagated_cells} propagated"
+            f" cells, max depth {total.max_depth}, {total.timeouts} timeouts\n"
+            f"Time: parse {total.parse_seconds:.3f}s,"
+            f" propagate {total.propagate_seconds:.3f}s,"
+            f" search {total.search_seconds:.3f}s,"
+            f" validate {total.validate_seconds:.3f}s",
+            file=sys.stderr,
+        )
+
+
+def _write_results(results: Iterable[Result], output: TextIO, counted: bool = False):
+    """
+    Write the results, in large chunks rather than one at a time
+    :param counted: True if the solutions of the puzzles were counted
+    """
+    chunk = []
+    chunk_length = 0
+    for result in results:
+        text = _format_count(result) if counted else _format_result(result)
+        chunk.append(text)
+        chunk_length += len(text)
+        if chunk_length >= _OUTPUT_CHUNK_LENGTH:
+            output.write("".join(chunk))
+            chunk.clear()
+            chunk_length = 0
+    output.write("".join(chunk))
+
+
+_OUTPUT_CHUNK_LENGTH = 1 << 16
 
 
 class _Mode(Enum):
     PARALLEL = "parallel"
     SEQUENTIAL = "sequential"
+    BATCH = "batch"
+    SHARED = "shared"
 
     def __str__(self):
         return self.value
@@ -43,12 +317,16 @@ def _parse_args():
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument(
         "--sdm",
-        help="Sudoku puzzle in sdm format",
+        type=_sdm,
+        help="Sudoku puzzle in sdm format, or as numbers separated by whitespace or"
+        " commas, for a board from 4x4 to 25x25",
     )
     group.add_argument(
         "--file",
-        type=argparse.FileType("r"),
-        help="File containing sudoku puzzles in sdm format",
+        type=argparse.FileType("rb"),
+        help="File containing sudoku puzzles in sdm format, one per line, or in packed"
+        " format. In sdm format, 0, . and _ mean an empty cell, and the lines which"
+        " aren't puzzles are reported to standard error, and skipped",
     )
     parser.add_argument(
         "--mode",
@@ -66,11 +344,310 @@ def _parse_args():
         help="Default %(default)s",
         nargs="?",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--cell-selection",
+        choices=list(CellSelection),
+        type=CellSelection,
+        default=CellSelection.FIRST_EMPTY,
+        help="How to choose the cell in which to guess a number. Default %(default)s",
+        nargs="?",
+    )
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default="-",
+        help="File to write the solutions to. Default standard output",
+    )
+    parser.add_argument(
+        "--ordered",
+        action="store_true",
+        help="In parallel mode, output the solutions in the order of the input,"
+        " instead of as soon as they are available",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=_chunksize,
+        default=None,
+        help="In parallel and shared modes, the number of puzzles sent to a process"
+        " at once, or auto to adapt it to the time it takes to solve the puzzles in"
+        " parallel mode, and to split the puzzles evenly in shared mode. Default auto",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=_positive_int,
+        default=1024,
+        help="In parallel mode, the maximum number of puzzles read from the input"
+        " and not output yet. Default %(default)s",
+    )
+    parser.add_argument(
+        "--workers",
+        type=_positive_int,
+        default=None,
+        help="In parallel and shared modes, the number of processes. Default the"
+        " number of CPUs",
+    )
+    parser.add_argument(
+        "--start-method",
+        choices=multiprocessing.get_all_start_methods(),
+        default=None,
+        help="In parallel and shared modes, how to start the processes. Default the"
+        " platform default",
+    )
+    parser.add_argument(
+        "--maxtasksperchild",
+        type=_positive_int,
+        default=None,
+        help="In parallel mode, the number of chunks a process solves before it is"
+        " replaced. Default unlimited",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=_positive_float,
+        default=None,
+        help="The number of seconds the search may spend on each puzzle, before"
+        " giving up on it. Default unlimited",
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=_positive_int,
+        default=None,
+        help="The number of search nodes the search may expand for each puzzle,"
+        " before giving up on it. Default unlimited",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Write the statistics of each puzzle to standard error as JSON lines,"
+        " followed by a summary for a file",
+    )
+    parser.add_argument(
+        "--count",
+        type=_positive_int,
+        nargs="?",
+        const=2,
+        default=None,
+        metavar="LIMIT",
+        help="Instead of the solutions, output each puzzle followed by its number of"
+        " solutions, counting up to LIMIT. Default LIMIT 2, to tell the puzzles with"
+        " a unique solution apart. Not in batch mode",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=_non_negative_int,
+        default=0,
+        help="The number of solutions kept in memory, to answer the puzzles which are"
+        " the same up to symmetry without solving them again. In parallel mode, for"
+        " each process. Default 0, no cache",
+    )
+    parser.add_argument(
+        "--cache-file",
+        default=None,
+        help="Sqlite database where the solutions are cached across runs",
+    )
+    options = parser.parse_args()
+    if options.count and options.mode in (_Mode.BATCH, _Mode.SHARED):
+        parser.error(f"--count is not supported in {options.mode} mode")
+    if options.mode == _Mode.SHARED and (
+        options.stats or options.cache_size or options.cache_file
+    ):
+        parser.error("--stats and the cache are not supported in shared mode")
+    return options
 
 
-def _solve(sdm: str, algorithm: Algorithm):
-    board = Board(sdm)
-    solution = solver.solve(board, algorithm=algorithm)
-    print(sdm)
-    print(solution.to_ss())
+def _parse_generate_args(args: List[str]):
+    parser = argparse.ArgumentParser(
+        prog="sudokusolver generate",
+        description="Generate puzzles with a unique solution, in sdm format",
+    )
+    parser.add_argument(
+        "--count",
+        type=_positive_int,
+        default=1,
+        help="The number of puzzles to generate. Default %(default)s",
+    )
+    parser.add_argument(
+        "--difficulty",
+        choices=list(Difficulty),
+        type=Difficulty,
+        default=None,
+        help="Default any difficulty",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="The same seed generates the same puzzles. Default random",
+    )
+    parser.add_argument(
+        "--symmetric",
+        action="store_true",
+        help="Generate puzzles whose clues are symmetric around the center",
+    )
+    parser.add_argument(
+        "--workers",
+        type=_positive_int,
+        default=None,
+        help="The number of processes. Default the number of CPUs",
+    )
+    parser.add_argument(
+        "--output",
+        type=argparse.FileType("w"),
+        default="-",
+        help="File to write the puzzles to. Default standard output",
+    )
+    return parser.parse_args(args)
+
+
+def _parse_convert_args(args: List[str]):
+    parser = argparse.ArgumentParser(
+        prog="sudokusolver convert",
+        description="Convert puzzles from sdm format to packed format, or from packed"
+        " format to sdm format",
+    )
+    parser.add_argument("input", help="File in sdm or packed format")
+    parser.add_argument("output", help="File to write in the other format")
+    parser.add_argument(
+        "--solve",
+        action="store_true",
+        help="To packed format, solve the puzzles, and add their solutions to the"
+        " file",
+    )
+    parser.add_argument(
+        "--solutions",
+        action="store_true",
+        help="From packed format, write the solutions instead of the puzzles",
+    )
+    parser.add_argument(
+        "--algorithm",
+        choices=list(Algorithm),
+        type=Algorithm,
+        default=Algorithm.BITMASK,
+        help="With --solve. Default %(default)s",
+    )
+    parser.add_argument(
+        "--workers",
+        type=_positive_int,
+        default=None,
+        help="With --solve, the number of processes. Default the number of CPUs",
+    )
+    return parser.parse_args(args)
+
+
+def _parse_serve_args(args: List[str]):
+    parser = argparse.ArgumentParser(
+        prog="sudokusolver serve",
+        description="Solve the puzzles posted in JSON to /solve, in worker processes"
+        " which stay up between requests",
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="Default %(default)s, local requests only"
+    )
+    parser.add_argument(
+        "--port",
+        type=_non_negative_int,
+        default=8000,
+        help="0 for any free port. Default %(default)s",
+    )
+    parser.add_argument(
+        "--algorithm",
+        choices=list(Algorithm),
+        type=Algorithm,
+        default=Algorithm.BITMASK,
+        help="Default %(default)s",
+    )
+    parser.add_argument(
+        "--cell-selection",
+        choices=list(CellSelection),
+        type=CellSelection,
+        default=CellSelection.FIRST_EMPTY,
+        help="Default %(default)s",
+    )
+    parser.add_argument(
+        "--workers",
+        type=_positive_int,
+        default=None,
+        help="The number of processes. Default the number of CPUs",
+    )
+    parser.add_argument(
+        "--batch-window",
+        type=_positive_float,
+        default=0.002,
+        help="The number of seconds a puzzle waits for the puzzles of other requests,"
+        " to be solved in the same batch. Default %(default)s",
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=_positive_int,
+        default=1000,
+        help="The number of puzzles after which a batch is solved without waiting."
+        " Default %(default)s",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=_positive_float,
+        default=None,
+        help="The number of seconds the search may spend on each puzzle. Default"
+        " unlimited",
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=_positive_int,
+        default=None,
+        help="The number of search nodes the search may expand for each puzzle."
+        " Default unlimited",
+    )
+    parser.add_argument(
+        "--log-requests",
+        action="store_true",
+        help="Log each request to standard error",
+    )
+    return parser.parse_args(args)
+
+
+def _sdm(value: str) -> str:
+    try:
+        return parsing.parse_sdm(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"{value!r}: {error}") from error
+
+
+def _chunksize(value: str) -> Optional[int]:
+    if value == "auto":
+        return None
+    return _positive_int(value)
+
+
+def _non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a non-negative integer")
+    return number
+
+
+def _positive_float(value: str) -> float:
+    number = float(value)
+    if not math.isfinite(number) or number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive number")
+    return number
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def _format_result(result: Result) -> str:
+    """
+    :return: the sdm, followed by the solution in ss format
+    """
+    return f"{result.sdm}\n{format_ss(result.solution)}\n"
+
+
+def _format_count(result: Result) -> str:
+    """
+    :return: the sdm, followed by its number of solutions, or ? if its budget ran out
+    """
+    count = "?" if result.solution_count is None else result.solution_count
+    return f"{result.sdm} {count}\n"
@@ -0,0 +1,302 @@
+"""
+A long-running HTTP server solving the puzzles posted to it in JSON, in worker
+processes started once, with the puzzles of concurrent requests gathered into batches.
+
+POST /solve takes {"sdm": "..."} or {"sdms": ["...", ...]}, and optionally
+"stats": true, and returns {"result": {...}} or {"results": [{...}, ...]}, with each
+result's sdm, solution and state, and its stats if they were asked for. The response
+also has the number of seconds the request took, and the number of puzzles of the
+batch its puzzles were solved in.
+GET /health returns {"status": "ok"}.
+"""
+import json
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sudokusolver import parsing, pipeline
+from sudokusolver.budget import Budget
+from sudokusolver.pipeline import Result
+from sudokusolver.solver import Algorithm, CellSelection
+
+_MAX_BODY_SIZE = 16 << 20
+
+
+@dataclass
+class ServerOptions:
+    """
+    How the server solves the puzzles
+    """
+
+    algorithm: Algorithm = Algorithm.BITMASK
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY
+    # What the solver may spend on each puzzle. None for no limit.
+    budget: Optional[Budget] = None
+    # The number of processes. None for the number of CPUs.
+    workers: Optional[int] = None
+    # How long the first puzzle of a batch waits for the puzzles of other requests,
+    # in seconds
+    batch_window: float = 0.002
+    # The number of puzzles after which a batch is solved without waiting
+    max_batch_size: int = 1000
+
+
+class _Request(NamedTuple):
+    """
+    The puzzles of a request, and the future of their results and of the size of
+    the batch they were solved in
+    """
+
+    sdms: List[str]
+    future: "Future[Tuple[List[Result], int]]"
+
+
+class _Batcher:
+    """
+    Gathers the puzzles of concurrent requests into batches, and solves each batch
+    in the pool, spread over its processes, while the next batch is gathered
+    """
+
+    def __init__(self, pool, options: ServerOptions, workers: int):
+        self.pool = pool
+        self.options = options
+        self.workers = workers
+        self._requests: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._solve = partial(
+            pipeline.solve_sdm,
+            algorithm=options.algorithm,
+            cell_selection=options.cell_selection,
+            with_stats=True,
+            budget=options.budget,
+        )
+        self._thread = threading.Thread(target=self._run, name="batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, sdms: List[str]) -> "Future[Tuple[List[Result], int]]":
+        """
+        :return: the future of the results of the puzzles, and of the number of
+        puzzles of the batch they were solved in
+        """
+        future: "Future[Tuple[List[Result], int]]" = Future()
+        self._requests.put(_Request(sdms, future))
+        return future
+
+    def close(self):
+        """
+        Stop gathering batches, once the requests already submitted are sent to the
+        pool
+        """
+        self._requests.put(None)
+        self._thread.join()
+
+    def _gather(self) -> Optional[List[_Request]]:
+        """
+        :return: the requests of the next batch, None once closed
+        """
+        first = self._requests.get()
+        if first is None:
+            return None
+        requests = [first]
+        size = len(first.sdms)
+        deadline = time.monotonic() + self.options.batch_window
+        while size < self.options.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                request = (
+                    self._requests.get(timeout=timeout)
+                    if timeout > 0
+                    else self._requests.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                # Close after this batch
+                self._requests.put(None)
+                break
+            requests.append(request)
+            size += len(request.sdms)
+        return requests
+
+    def _run(self):
+        while (requests := self._gather()) is not None:
+            sdms = [sdm for request in requests for sdm in request.sdms]
+            self.pool.map_async(
+                self._solve,
+                sdms,
+                chunksize=max(1, -(-len(sdms) // self.workers)),
+                callback=partial(self._distribute, requests),
+                error_callback=partial(self._fail, requests),
+            )
+
+    @staticmethod
+    def _distribute(requests: List[_Request], results: List[Result]):
+        start = 0
+        for request in requests:
+            stop = start + len(request.sdms)
+            request.future.set_result((results[start:stop], len(results)))
+            start = stop
+
+    @staticmethod
+    def _fail(requests: List[_Request], error: BaseException):
+        for request in requests:
+            request.future.set_exception(error)
+
+
+def _parse_body(body: bytes) -> Tuple[List[str], bool, bool]:
+    """
+    :return: the puzzles of the request, in sdm format, whether it posted a single
+    puzzle, and whether it asked for the stats
+    :raises ValueError: if the request isn't valid
+    """
+    request = json.loads(body)
+    if not isinstance(request, dict):
+        raise ValueError("The request must be a JSON object")
+    if "sdm" in request:
+        texts, single = [request["sdm"]], True
+    elif "sdms" in request and isinstance(request["sdms"], list):
+        texts, single = request["sdms"], False
+    else:
+        raise ValueError('The request must have an "sdm" or a list of "sdms"')
+    sdms = []
+    for index, text in enumerate(texts):
+        if not isinstance(text, str):
+            raise ValueError(f"Puzzle {index}: not a string")
+        try:
+            sdms.append(parsing.parse_sdm(text))
+        except ValueError as error:
+            raise ValueError(f"Puzzle {index}: {error}") from error
+    return sdms, single, bool(request.get("stats"))
+
+
+def _result_dict(result: Result, with_stats: bool) -> Dict[str, Any]:
+    fields: Dict[str, Any] = {
+        "sdm": result.sdm,
+        "solution": result.solution,
+        "state": result.state,
+    }
+    if with_stats and result.stats is not None:
+        fields["stats"] = result.stats.to_dict()
+    return fields
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "SolveServer"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answer the health checks
+        """
+        if self.path == "/health":
+            self._send(HTTPStatus.OK, {"status": "ok"})
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"No {self.path}"})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Solve the posted puzzles
+        """
+        start = time.perf_counter()
+        length = self._get_length()
+        if length is None:
+            return
+        try:
+            sdms, single, with_stats = _parse_body(self.rfile.read(length))
+        except ValueError as error:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": str(error)})
+            return
+        try:
+            results, batch_size = self.server.batcher.submit(sdms).result()
+        except Exception as error:  # pylint: disable=broad-except
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(error)})
+            return
+        response: Dict[str, Any] = {}
+        if single:
+            response["result"] = _result_dict(results[0], with_stats)
+        else:
+            response["results"] = [
+                _result_dict(result, with_stats) for result in results
+            ]
+        response["batch_size"] = batch_size
+        response["seconds"] = time.perf_counter() - start
+        self._send(HTTPStatus.OK, response)
+
+    def _get_length(self) -> Optional[int]:
+        """
+        :return: the length of the body of the request, or None if an error was sent
+        instead
+        """
+        if self.path != "/solve":
+            error = HTTPStatus.NOT_FOUND, f"No {self.path}"
+        elif "Content-Length" not in self.headers:
+            error = HTTPStatus.LENGTH_REQUIRED, "No Content-Length"
+        else:
+            text = self.headers["Content-Length"].strip()
+            if not (text.isascii() and text.isdigit()):
+                error = HTTPStatus.BAD_REQUEST, f"Invalid Content-Length {text!r}"
+            elif int(text) > _MAX_BODY_SIZE:
+                error = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Too large"
+            else:
+                return int(text)
+        # The body isn't read, so the connection can't be reused
+        self.close_connection = True
+        self._send(error[0], {"error": error[1]})
+        return None
+
+    def _send(self, status: HTTPStatus, response: Dict[str, Any]):
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.log_requests:
+            super().log_message(format, *args)
+
+
+class SolveServer(ThreadingHTTPServer):
+    """
+    Serves the requests in threads, which wait for the results of their puzzles
+    from the worker processes
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        options: Optional[ServerOptions] = None,
+        log_requests: bool = False,
+    ):
+        self.options = options or ServerOptions()
+        self.log_requests = log_requests
+        super().__init__(address, _Handler, bind_and_activate=False)
+        workers = self.options.workers or multiprocessing.cpu_count()
+        try:
+            # Bound before the processes are started, so that nothing is left
+            # running if the address is in use
+            self.server_bind()
+            self.server_activate()
+            # Started now, so that the first requests don't wait for the processes
+            self.pool = multiprocessing.Pool(  # pylint: disable=consider-using-with
+                processes=workers
+            )
+        except BaseException:
+            super().server_close()
+            raise
+        self.batcher = _Batcher(self.pool, self.options, workers)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        self.pool.close()
+        self.pool.join()
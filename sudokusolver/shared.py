@@ -0,0 +1,210 @@
+"""
+Solve puzzles in a pool of processes through shared memory, so that only index
+ranges are sent to the processes, and only a few numbers are sent back.
+
+The puzzles of each block of the input are copied to a shared input buffer of
+fixed-width records, one byte per cell in sdm format. The processes solve the records
+of the ranges they are given, and write the solutions in the same format at the same
+offsets of a shared output buffer, along with the state of each puzzle in a shared
+buffer of one byte per puzzle.
+"""
+import multiprocessing
+import os
+import sys
+from functools import partial
+from itertools import groupby, islice
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sudokusolver import pipeline
+from sudokusolver.budget import Budget
+from sudokusolver.pipeline import PoolOptions, Result
+from sudokusolver.solver import Algorithm, CellSelection, State
+from sudokusolver.stats import SolveStats
+
+_STATES = list(State)
+
+# The number of chunks per process in each block, to keep all the processes busy
+# until the end of the block
+_CHUNKS_PER_WORKER = 4
+
+# The maximum number of puzzles of the chunks whose size isn't given, so that the
+# first results are returned soon after the block is started
+_MAX_CHUNK_SIZE = 1000
+
+
+class _Buffers(NamedTuple):
+    """
+    The names of the shared buffers of a block of puzzles
+    """
+
+    puzzles: str
+    solutions: str
+    states: str
+    # The number of cells of each puzzle
+    record_size: int
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    :return: the shared memory created by the parent process, which is the only one to
+    unlink it
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(  # pylint: disable=unexpected-keyword-arg
+            name=name, track=False
+        )
+    # Before Python 3.13, attaching registers the memory with the resource tracker
+    # again. As the tracker is the parent's one, see solve_shared(), the memory stays
+    # registered once, until the parent unlinks it.
+    return shared_memory.SharedMemory(name=name)
+
+
+# The shared memory attached by the worker process, by name. Only the buffers of the
+# current block are kept attached.
+_ATTACHED: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _get_attached(buffers: _Buffers) -> List[shared_memory.SharedMemory]:
+    names = [buffers.puzzles, buffers.solutions, buffers.states]
+    for name in list(_ATTACHED):
+        if name not in names:
+            _ATTACHED.pop(name).close()
+    for name in names:
+        if name not in _ATTACHED:
+            _ATTACHED[name] = _attach(name)
+    return [_ATTACHED[name] for name in names]
+
+
+def _solve_range(
+    bounds: Tuple[int, int],
+    buffers: _Buffers,
+    algorithm: Algorithm,
+    cell_selection: CellSelection,
+    budget: Optional[Budget],
+) -> SolveStats:
+    """
+    Solve the puzzles with indexes from start to stop, excluded, writing their
+    solutions and states in the shared buffers
+    :return: the stats of the puzzles
+    """
+    puzzles, solutions, states = _get_attached(buffers)
+    size = buffers.record_size
+    stats = SolveStats()
+    start, stop = bounds
+    for index in range(start, stop):
+        offset = index * size
+        sdm = bytes(puzzles.buf[offset : offset + size]).decode("ascii")
+        result = pipeline.solve_sdm(
+            sdm,
+            algorithm=algorithm,
+            cell_selection=cell_selection,
+            with_stats=True,
+            budget=budget,
+        )
+        solutions.buf[offset : offset + size] = result.solution.encode("ascii")
+        states.buf[index] = _STATES.index(result.state)
+        if result.stats:
+            stats.add(result.stats)
+    return stats
+
+
+def _create(size: int) -> shared_memory.SharedMemory:
+    # Shared memory can't be empty
+    return shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+
+def _solve_block(
+    pool,
+    sdms: List[str],
+    chunksize: Optional[int],
+    workers: int,
+    solve_range: partial,
+    stats: Optional[SolveStats],
+) -> Iterator[Result]:
+    """
+    :return: the results of the puzzles, which all have the same size, in order, as
+    soon as the chunk they are in is solved
+    """
+    record_size = len(sdms[0])
+    memories = [
+        _create(len(sdms) * record_size),
+        _create(len(sdms) * record_size),
+        _create(len(sdms)),
+    ]
+    puzzles, solutions, states = memories
+    try:
+        puzzles.buf[: len(sdms) * record_size] = "".join(sdms).encode("ascii")
+        buffers = _Buffers(puzzles.name, solutions.name, states.name, record_size)
+        size = chunksize or max(
+            1,
+            min(
+                -(-len(sdms) // (workers * _CHUNKS_PER_WORKER)),
+                _MAX_CHUNK_SIZE,
+            ),
+        )
+        ranges = [
+            (start, min(start + size, len(sdms))) for start in range(0, len(sdms), size)
+        ]
+        chunks = pool.imap(partial(solve_range, buffers=buffers), ranges)
+        for (start, stop), range_stats in zip(ranges, chunks):
+            if stats is not None:
+                stats.add(range_stats)
+            text = bytes(
+                solutions.buf[start * record_size : stop * record_size]
+            ).decode("ascii")
+            state_codes = bytes(states.buf[start:stop])
+            for index in range(stop - start):
+                offset = index * record_size
+                yield Result(
+                    sdms[start + index],
+                    text[offset : offset + record_size],
+                    _STATES[state_codes[index]],
+                )
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+
+def solve_shared(
+    sdms: Iterable[str],
+    algorithm: Algorithm = Algorithm.RECURSIVE,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    options: Optional[PoolOptions] = None,
+    budget: Optional[Budget] = None,
+    stats: Optional[SolveStats] = None,
+    block_size: int = 100000,
+) -> Iterator[Result]:
+    """
+    Solve the puzzles in a pool of processes, through shared memory, reading the
+    input one block at a time.
+    Of the options, only the number of workers, the chunk size and the start method
+    are used. The results are always in the order of the input.
+    :param stats: if given, the stats of all the puzzles are added to it. The results
+    don't have the stats of each puzzle.
+    :param block_size: the maximum number of puzzles in the shared buffers at once
+    :return: the results of the puzzles, in order
+    """
+    options = options or PoolOptions()
+    workers = options.workers or os.cpu_count() or 1
+    solve_range = partial(
+        _solve_range,
+        algorithm=algorithm,
+        cell_selection=cell_selection,
+        budget=budget,
+    )
+    iterator = iter(sdms)
+    if os.name == "posix":
+        # Started before the processes, so that they share it with this one, whatever
+        # the start method, instead of starting their own one, which would unlink the
+        # shared memory they attached when they exit
+        resource_tracker.ensure_running()
+    context = multiprocessing.get_context(options.start_method)
+    with context.Pool(processes=workers) as pool:
+        while block := list(islice(iterator, block_size)):
+            # Each buffer has records of a single size
+            for _, group in groupby(block, key=len):
+                yield from _solve_block(
+                    pool, list(group), options.chunksize, workers, solve_range, stats
+                )
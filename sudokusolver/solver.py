@@ -1,13 +1,17 @@
 """
 A Sudoku board solver
 """
-from copy import deepcopy
+import time
 from dataclasses import dataclass
 from enum import Enum
 from itertools import product
-from typing import Iterable, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
+from sudokusolver import bitmask, dlx
 from sudokusolver.board import Board
+from sudokusolver.budget import UNLIMITED, Budget, BudgetExceeded, Countdown
+from sudokusolver.geometry import PEERS, STANDARD, UNITS, UNITS_OF
+from sudokusolver.stats import SolveStats
 
 
 class Algorithm(str, Enum):
@@ -17,6 +21,21 @@ class Algorithm(str, Enum):
 
     RECURSIVE = "recursive"
     ITERATIVE = "iterative"
+    BITMASK = "bitmask"
+    IN_PLACE = "in_place"
+    DANCING_LINKS = "dancing_links"
+
+    def __str__(self):
+        return self.value
+
+
+class CellSelection(str, Enum):
+    """
+    How to choose the empty cell in which to guess a number
+    """
+
+    FIRST_EMPTY = "first_empty"
+    MIN_CANDIDATES = "min_candidates"
 
     def __str__(self):
         return self.value
@@ -24,13 +43,18 @@ class Algorithm(str, Enum):
 
 class State(str, Enum):
     """
-    The state of a Board
+    The state of a Board, or of the result of solving a puzzle. get_state() only
+    returns the states of a board: solve() raises BudgetExceeded when the budget runs
+    out, which pipeline.solve_sdm(), and the command line, aio and server built on it,
+    turn into a result in the TIMED_OUT state.
     """
 
     VALID = "valid"
     HAS_DUPLICATES = "has_duplicates"
     INCOMPLETE = "incomplete"
     UNKNOWN = "unknown"
+    # The budget ran out before the puzzle was solved. Only in the results.
+    TIMED_OUT = "timed_out"
 
 
 @dataclass
@@ -44,156 +68,522 @@ class Cell:
 
 
 full_group = {"1", "2", "3", "4", "5", "6", "7", "8", "9"}
+_ALL_NUMBERS = frozenset(range(1, 10))
 
-
-def _remove_none(data: set) -> set:
-    return {item for item in data if item is not None}
-
-
-def _get_state(items: Iterable[str]) -> State:
-    non_none_items = [item for item in items if item is not None]
-    if len(set(non_none_items)) != len(non_none_items):
-        return State.HAS_DUPLICATES
-    if len(non_none_items) != len(items):
-        return State.INCOMPLETE
-    if set(non_none_items) == full_group:
-        return State.VALID
-    return State.UNKNOWN
+# The cells of the board, in row-major order
+_CELLS = [Cell(row, col) for row, col in product(range(9), range(9))]
 
 
 def get_state(board: Board) -> State:
     """
-    :return: the state of the board
+    :return: the state of the board, from the counts the board keeps up to date:
+    VALID, HAS_DUPLICATES or INCOMPLETE
     """
-    # check the rows and columns
-    for i in range(9):
-        state_row = _get_state(board.get_row(i))
-        if state_row != State.VALID:
-            return state_row
-
-        state_col = _get_state(board.get_col(i))
-        if state_col != State.VALID:
-            return state_col
-
-    # check the squares
-    for i, j in product(range(0, 9, 3), range(0, 9, 3)):
-        state_square = _get_state(board.get_square(i, j))
-        if state_square != State.VALID:
-            return state_square
+    if board.duplicate_count:
+        return State.HAS_DUPLICATES
+    if board.empty_count:
+        return State.INCOMPLETE
     return State.VALID
 
 
-def _get_possible_numbers_for_cell(board: Board, cell: Cell) -> List[str]:
+def _get_possible_numbers_for_cell(board: Board, cell: Cell) -> List[int]:
     """
     :return: the possible numbers for the cell
     based on the numbers in the other cells of its row, column, and square
     """
-    numbers_in_row = set(board.get_row(cell.row))
-    numbers_in_col = set(board.get_col(cell.col))
-    numbers_in_square = set(board.get_square(cell.row, cell.col))
-    used_numbers = _remove_none(
-        numbers_in_row.union(numbers_in_col).union(numbers_in_square)
-    )
-    return sorted(full_group.difference(used_numbers))
+    return board.possible_numbers(cell.row * 9 + cell.col)
 
 
-def _resolve_unambiguous_cells_one_pass(board: Board) -> bool:
+def _has_peer_without_possible_numbers(board: Board, cell: Cell) -> bool:
     """
-    Traverses the board once, filling in any empty cells for which only
-    one value is possible.
-    :return: True if the board changed.
+    :return: True if an empty cell sharing a row, column or square with the cell has
+    no possible number left, so that the number just put in the cell is wrong
     """
-    has_changed = False
-    for row_index, col_index in product(range(9), range(9)):
-        if not board.data[row_index][col_index]:
-            possible_numbers = _get_possible_numbers_for_cell(
-                board, Cell(row_index, col_index)
-            )
-            if len(possible_numbers) == 1:
-                board.data[row_index][col_index] = possible_numbers[0]
-                has_changed = True
-    return has_changed
+    cells = board.cells
+    for peer in PEERS[cell.row * 9 + cell.col]:
+        if not cells[peer] and not board.possible_numbers(peer):
+            return True
+    return False
 
 
-def _resolve_unambiguous_cells(board):
+class _Propagation:
     """
-    In all the empty cells, look for cases where only one number is possible.
-    Fill in all these cases.
-    Then repeat.
-    Stop when a pass over the board didn't change anything.
+    Fills in the empty cells where only one number is possible, and the numbers
+    which are possible in only one cell of a row, column or square.
+
+    Only the cells and the rows, columns and squares which are affected by a filled
+    cell are examined again, until there is nothing left to examine.
     """
-    should_try_again = True
-    while should_try_again:
-        should_try_again = _resolve_unambiguous_cells_one_pass(board)
+
+    def __init__(self, board: Board, trail: Optional[List[Cell]]):
+        self.cells = board.cells
+        self.board = board
+        self.trail = trail
+        # The possible numbers of the empty cells which were examined so far
+        self.possible_numbers: Dict[int, Set[int]] = {}
+        self.cells_to_examine: List[int] = []
+        self.units_to_examine: List[int] = []
+        self.pending_cells: Set[int] = set()
+        self.pending_units: Set[int] = set()
+
+    def is_empty(self, index: int) -> bool:
+        """
+        :return: True if the cell at the given position is empty
+        """
+        return not self.cells[index]
+
+    def get_possible_numbers(self, index: int) -> Set[int]:
+        """
+        :return: the possible numbers for the empty cell at the given position
+        """
+        numbers = self.possible_numbers.get(index)
+        if numbers is None:
+            numbers = set(_get_possible_numbers_for_cell(self.board, _CELLS[index]))
+            self.possible_numbers[index] = numbers
+        return numbers
+
+    def examine_cell(self, index: int):
+        """
+        Add the cell to the cells to examine, if it isn't already there
+        """
+        if index not in self.pending_cells:
+            self.pending_cells.add(index)
+            self.cells_to_examine.append(index)
+
+    def examine_unit(self, unit: int):
+        """
+        Add the row, column or square to the ones to examine, if it isn't
+        already there
+        """
+        if unit not in self.pending_units:
+            self.pending_units.add(unit)
+            self.units_to_examine.append(unit)
+
+    def examine_peers(self, index: int, number: Optional[int] = None):
+        """
+        Examine the empty cells sharing a row, column or square with the given cell,
+        along with their rows, columns and squares.
+        If a number is given, only the cells where it was possible are affected.
+        """
+        for unit in UNITS_OF[index]:
+            self.examine_unit(unit)
+        for peer in PEERS[index]:
+            if not self.is_empty(peer):
+                continue
+            numbers = self.possible_numbers.get(peer)
+            if numbers is not None:
+                if number not in numbers:
+                    continue
+                numbers.discard(number)
+            self.examine_cell(peer)
+            for peer_unit in UNITS_OF[peer]:
+                self.examine_unit(peer_unit)
+
+    def fill(self, index: int, number: int):
+        """
+        Put the number in the empty cell at the given position
+        """
+        self.board.set_cell(index, number)
+        self.possible_numbers.pop(index, None)
+        if self.trail is not None:
+            self.trail.append(_CELLS[index])
+        self.examine_peers(index, number)
+
+    def resolve_unit(self, unit: int) -> bool:
+        """
+        Fill in the numbers which are possible in only one cell of the row,
+        column or square.
+        :return: False if a missing number isn't possible in any of its cells.
+        """
+        unit_cells = UNITS[unit]
+        used_numbers = {self.cells[index] for index in unit_cells}
+        for number in _ALL_NUMBERS.difference(used_numbers):
+            places = [
+                index
+                for index in unit_cells
+                if self.is_empty(index) and number in self.get_possible_numbers(index)
+            ]
+            if not places:
+                return False
+            if len(places) == 1:
+                self.fill(places[0], number)
+        return True
+
+    def run(self) -> bool:
+        """
+        Examine the cells, rows, columns and squares until there is nothing left to
+        examine.
+        :return: False if we found a cell or a missing number with no possible place.
+        """
+        while self.cells_to_examine or self.units_to_examine:
+            if self.cells_to_examine:
+                index = self.cells_to_examine.pop()
+                self.pending_cells.discard(index)
+                if not self.is_empty(index):
+                    continue
+                numbers = self.get_possible_numbers(index)
+                if not numbers:
+                    return False
+                if len(numbers) == 1:
+                    self.fill(index, next(iter(numbers)))
+            else:
+                unit = self.units_to_examine.pop()
+                self.pending_units.discard(unit)
+                if not self.resolve_unit(unit):
+                    return False
+        return True
+
+
+def _resolve_unambiguous_cells(
+    board: Board,
+    trail: Optional[List[Cell]] = None,
+    changed_cell: Optional[Cell] = None,
+) -> bool:
+    """
+    Fill in the empty cells where only one number is possible, and the numbers which
+    are possible in only one cell of a row, column or square.
+    Then repeat for the cells affected by what we filled in.
+    If a changed cell is given, only the cells affected by it are examined at first.
+    Otherwise, the whole board is examined.
+    If a trail is given, the filled cells are appended to it.
+    :return: False if the board can't be solved.
+    """
+    propagation = _Propagation(board, trail)
+    if changed_cell is None:
+        for index in range(81):
+            propagation.examine_cell(index)
+        for unit in range(27):
+            propagation.examine_unit(unit)
+    else:
+        propagation.examine_peers(changed_cell.row * 9 + changed_cell.col)
+    return propagation.run()
+
+
+def _undo(board: Board, trail: List[Cell], length: int):
+    """
+    Empty the cells which were appended to the trail after it had the given length
+    """
+    while len(trail) > length:
+        cell = trail.pop()
+        board.set_cell(cell.row * 9 + cell.col, 0)
 
 
 def _find_first_empty_cell(board: Board) -> Optional[Cell]:
-    for row, col in product(range(9), range(9)):
-        if board.data[row][col] is None:
-            return Cell(row, col)
-    return None
+    index = board.cells.find(0)
+    if index < 0:
+        return None
+    return _CELLS[index]
 
 
-def solve(board: Board, algorithm: Algorithm = Algorithm.RECURSIVE) -> Board:
+def _find_cell_with_fewest_possible_numbers(board: Board) -> Optional[Cell]:
+    """
+    :return: the empty cell with the fewest possible numbers. If several cells have
+    the same number of possible numbers, the first one in row-major order is returned.
+    """
+    best_cell = None
+    best_count = 10
+    for index, number in enumerate(board.cells):
+        if not number:
+            cell = _CELLS[index]
+            count = len(_get_possible_numbers_for_cell(board, cell))
+            if count < best_count:
+                best_cell = cell
+                best_count = count
+                if count <= 1:
+                    break
+    return best_cell
+
+
+def _select_cell(board: Board, cell_selection: CellSelection) -> Optional[Cell]:
+    """
+    :return: the empty cell in which to guess a number, or None if the board is full
     """
+    if cell_selection == CellSelection.MIN_CANDIDATES:
+        return _find_cell_with_fewest_possible_numbers(board)
+    return _find_first_empty_cell(board)
+
+
+def solve(
+    board: Board,
+    algorithm: Algorithm = Algorithm.RECURSIVE,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    stats: Optional[SolveStats] = None,
+    budget: Optional[Budget] = None,
+) -> Board:
+    """
+    The boards other than 9x9 are always solved with the bitmask algorithm. The
+    search of a large board with many empty cells can take a very long time: give it
+    a budget.
+    :param stats: if given, what the solver does is added to it
+    :param budget: if given, the time and the number of nodes the search may use
     :return: the board in its solved state, or in an incomplete or invalid state if we
     weren't able to solve it.
+    :raises BudgetExceeded: if the budget ran out before we were done
+    """
+    stats = stats if stats is not None else SolveStats()
+    start_nodes = stats.nodes
+    solutions = find_solutions(board, 1, algorithm, cell_selection, stats, budget)
+
+    start = time.perf_counter()
+    is_valid = bool(solutions) and get_state(solutions[0]) == State.VALID
+    stats.validate_seconds += time.perf_counter() - start
+    if not is_valid:
+        # We couldn't find a solution. Return the original board.
+        return board
+    solution = solutions[0]
+    solution.iteration_count = stats.nodes - start_nodes
+    return solution
+
+
+def count_solutions(
+    board: Board,
+    limit: int = 2,
+    algorithm: Algorithm = Algorithm.RECURSIVE,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    stats: Optional[SolveStats] = None,
+    budget: Optional[Budget] = None,
+) -> int:
     """
-    if algorithm == Algorithm.RECURSIVE:
-        return _solve_recursive(board)
-    return _solve_iterative(board)
+    :return: the number of solutions of the board, counting up to the limit. With the
+    default limit, 1 means that the board has a unique solution.
+    :raises BudgetExceeded: if the budget ran out before we were done
+    """
+    return len(find_solutions(board, limit, algorithm, cell_selection, stats, budget))
 
 
-def _solve_recursive(board: Board) -> Board:
-    cell = _find_first_empty_cell(board)
-    if not cell:
-        return board
+def find_solutions(
+    board: Board,
+    limit: int,
+    algorithm: Algorithm = Algorithm.RECURSIVE,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+    stats: Optional[SolveStats] = None,
+    budget: Optional[Budget] = None,
+) -> List[Board]:
+    """
+    Search the board with the given algorithm, until all its solutions are found, or
+    the limit is reached. The boards other than 9x9 are always searched with the
+    bitmask algorithm, the only one which supports them.
+    :return: the solutions of the board, at most limit of them
+    :raises BudgetExceeded: if the budget ran out before we were done
+    """
+    stats = stats if stats is not None else SolveStats()
+    countdown = budget.start() if budget else UNLIMITED
+    try:
+        if algorithm == Algorithm.BITMASK or board.geometry is not STANDARD:
+            return bitmask.find_solutions(
+                board,
+                limit,
+                min_candidates=cell_selection == CellSelection.MIN_CANDIDATES,
+                stats=stats,
+                countdown=countdown,
+            )
+        if algorithm == Algorithm.DANCING_LINKS:
+            # Dancing links always chooses the constraint with the fewest candidates
+            return dlx.find_solutions(board, limit, stats=stats, countdown=countdown)
+        search = _Search(cell_selection, stats, countdown, limit)
+        _search_with_board(board, algorithm, search)
+        return search.solutions
+    except BudgetExceeded:
+        stats.timeouts += 1
+        raise
+
+
+class _Search:
+    """
+    What the board-based searches need besides the board, and the solutions they
+    found
+    """
 
-    possible_numbers = _get_possible_numbers_for_cell(board, cell)
-    if not possible_numbers:
-        return board
+    __slots__ = (
+        "cell_selection",
+        "stats",
+        "countdown",
+        "limit",
+        "solutions",
+        "start_nodes",
+    )
+
+    def __init__(
+        self,
+        cell_selection: CellSelection,
+        stats: SolveStats,
+        countdown: Countdown,
+        limit: int,
+    ):
+        self.cell_selection = cell_selection
+        self.stats = stats
+        self.countdown = countdown
+        self.limit = limit
+        self.solutions: List[Board] = []
+        # The stats may be shared with other searches: the countdown is checked
+        # against the nodes of this one only
+        self.start_nodes = stats.nodes
+
+    def add_solution(self, board: Board) -> bool:
+        """
+        :return: True if we found enough solutions, and the search should stop
+        """
+        self.solutions.append(board)
+        return len(self.solutions) >= self.limit
+
+
+def _search_with_board(board: Board, algorithm: Algorithm, search: _Search):
+    stats = search.stats
+    if board.duplicate_count:
+        return
+    start = time.perf_counter()
+    board_copy = board.copy()
+    propagated = _propagate(board_copy, stats)
+    search_start = time.perf_counter()
+    stats.propagate_seconds += search_start - start
+    if not propagated:
+        return
+
+    try:
+        if algorithm == Algorithm.RECURSIVE:
+            _search_recursive(board_copy, search, 1)
+        elif algorithm == Algorithm.IN_PLACE:
+            _search_in_place(board_copy, [], search, 1)
+        else:
+            _search_iterative(board_copy, search)
+    finally:
+        stats.search_seconds += time.perf_counter() - search_start
+
+
+def _propagate(
+    board: Board,
+    stats: SolveStats,
+    trail: Optional[List[Cell]] = None,
+    changed_cell: Optional[Cell] = None,
+) -> bool:
+    """
+    Same as _resolve_unambiguous_cells(), counting the filled cells in the statistics
+    """
+    empty_count = board.empty_count
+    resolved = _resolve_unambiguous_cells(board, trail, changed_cell)
+    stats.propagated_cells += empty_count - board.empty_count
+    return resolved
+
+
+def _guess(board: Board, cell: Cell, number: int, stats: SolveStats, depth: int):
+    """
+    Put the number in the empty cell
+    """
+    board.set_cell(cell.row * 9 + cell.col, number)
+    stats.guesses += 1
+    stats.max_depth = max(stats.max_depth, depth)
 
-    for number in possible_numbers:
-        board_copy = deepcopy(board)
-        board_copy.data[cell.row][cell.col] = number
-        _resolve_unambiguous_cells(board_copy)
+
+def _search_recursive(board: Board, search: _Search, depth: int) -> bool:
+    """
+    Guess the numbers of the empty cells, on copies of the board.
+    :return: True if we found enough solutions, and the search should stop
+    """
+    stats = search.stats
+    stats.nodes += 1
+    search.countdown.check(stats.nodes - search.start_nodes)
+    cell = _select_cell(board, search.cell_selection)
+    if not cell:
+        return get_state(board) == State.VALID and search.add_solution(board)
+
+    for number in _get_possible_numbers_for_cell(board, cell):
+        board_copy = board.copy()
+        _guess(board_copy, cell, number, stats, depth)
+        if _has_peer_without_possible_numbers(board_copy, cell) or not _propagate(
+            board_copy, stats, changed_cell=cell
+        ):
+            stats.backtracks += 1
+            continue
         state = get_state(board_copy)
         if state == State.VALID:
-            return board_copy
-        if state == State.INCOMPLETE:
-            board_copy = solve(board_copy)
-        if get_state(board_copy) == State.VALID:
-            return board_copy
-        # else INVALID state.
+            if search.add_solution(board_copy):
+                return True
+        elif state == State.INCOMPLETE and _search_recursive(
+            board_copy, search, depth + 1
+        ):
+            return True
+        # else INVALID state, or we need more solutions.
         # Maybe we'll have better luck with the next possible number
+        stats.backtracks += 1
 
-    return board
+    return False
 
 
-def _solve_iterative(board: Board) -> Board:
-    boards_stack: List[Board] = [board]
+def _search_iterative(board: Board, search: _Search):
+    """
+    Guess the numbers of the empty cells, on copies of the board, keeping the boards
+    to continue from on a stack
+    """
+    stats = search.stats
+    # The boards to continue from, with the number of guesses made on them
+    boards_stack: List[Tuple[Board, int]] = [(board, 0)]
     while boards_stack:
-        board_to_test = boards_stack.pop()
+        board_to_test, depth = boards_stack.pop()
 
-        cell = _find_first_empty_cell(board_to_test)
+        stats.nodes += 1
+        search.countdown.check(stats.nodes - search.start_nodes)
+        cell = _select_cell(board_to_test, search.cell_selection)
         if not cell:
+            if get_state(board_to_test) == State.VALID and search.add_solution(
+                board_to_test
+            ):
+                return
             continue
 
-        possible_numbers = _get_possible_numbers_for_cell(board_to_test, cell)
-        if not possible_numbers:
-            continue
-
-        for number in possible_numbers:
-            board_copy = deepcopy(board_to_test)
-            board_copy.data[cell.row][cell.col] = number
-            _resolve_unambiguous_cells(board_copy)
+        for number in _get_possible_numbers_for_cell(board_to_test, cell):
+            board_copy = board_to_test.copy()
+            _guess(board_copy, cell, number, stats, depth + 1)
+            if _has_peer_without_possible_numbers(board_copy, cell) or not _propagate(
+                board_copy, stats, changed_cell=cell
+            ):
+                stats.backtracks += 1
+                continue
             state = get_state(board_copy)
             if state == State.VALID:
-                return board_copy
-            if state == State.INCOMPLETE:
-                boards_stack.append(board_copy)
-            # else INVALID state.
-            # Maybe we'll have better luck with the next possible number
-
-    # If we get here, this means we couldn't find a solution. Return the original board.
-    return board
+                if search.add_solution(board_copy):
+                    return
+            elif state == State.INCOMPLETE:
+                boards_stack.append((board_copy, depth + 1))
+            else:
+                # INVALID state.
+                # Maybe we'll have better luck with the next possible number
+                stats.backtracks += 1
+
+
+def _search_in_place(
+    board: Board, trail: List[Cell], search: _Search, depth: int
+) -> bool:
+    """
+    Fill in the empty cells of the board, without copying it.
+    Every filled cell is recorded on the trail, so that a guess which leads to an
+    invalid state can be undone. The solutions are copied.
+    :return: True if we found enough solutions, and the search should stop
+    """
+    stats = search.stats
+    stats.nodes += 1
+    search.countdown.check(stats.nodes - search.start_nodes)
+    cell = _select_cell(board, search.cell_selection)
+    if not cell:
+        return get_state(board) == State.VALID and search.add_solution(board.copy())
+
+    for number in _get_possible_numbers_for_cell(board, cell):
+        trail_length = len(trail)
+        _guess(board, cell, number, stats, depth)
+        trail.append(cell)
+        if not _has_peer_without_possible_numbers(board, cell) and _propagate(
+            board, stats, trail, changed_cell=cell
+        ):
+            state = get_state(board)
+            if state == State.VALID:
+                if search.add_solution(board.copy()):
+                    return True
+            elif state == State.INCOMPLETE and _search_in_place(
+                board, trail, search, depth + 1
+            ):
+                return True
+        # else INVALID state, or we need more solutions.
+        # Undo this guess, and maybe we'll have better luck with the next possible number
+        stats.backtracks += 1
+        _undo(board, trail, trail_length)
+
+    return False
@@ -0,0 +1,52 @@
+"""
+Statistics about the solving of puzzles
+"""
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Union
+
+
+@dataclass
+class SolveStats:
+    """
+    What the solver did to solve a puzzle, or several puzzles when added together
+    """
+
+    # The number of times the search chose where to guess next
+    nodes: int = 0
+    # The number of numbers guessed
+    guesses: int = 0
+    # The number of guesses which led to a dead end and were undone
+    backtracks: int = 0
+    # The number of cells filled in because only one number was possible, or a
+    # number was possible in only one cell of a row, column or square
+    propagated_cells: int = 0
+    # The maximum number of guesses made on top of each other
+    max_depth: int = 0
+    # The number of puzzles whose budget ran out before they were solved
+    timeouts: int = 0
+
+    # The time spent in each phase, in seconds
+    parse_seconds: float = 0.0
+    propagate_seconds: float = 0.0
+    search_seconds: float = 0.0
+    validate_seconds: float = 0.0
+
+    def add(self, other: "SolveStats"):
+        """
+        Add the statistics of other puzzles to these
+        """
+        for field in fields(self):
+            if field.name == "max_depth":
+                self.max_depth = max(self.max_depth, other.max_depth)
+            else:
+                setattr(
+                    self,
+                    field.name,
+                    getattr(self, field.name) + getattr(other, field.name),
+                )
+
+    def to_dict(self) -> Dict[str, Union[int, float]]:
+        """
+        :return: the statistics by name
+        """
+        return asdict(self)
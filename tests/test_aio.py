@@ -0,0 +1,130 @@
+"""
+Unit tests for the asyncio API
+"""
+import asyncio
+import time
+from pathlib import Path
+from typing import AsyncIterator, List
+
+from sudokusolver import aio
+from sudokusolver.aio import AsyncSolver
+from sudokusolver.solver import Algorithm, State
+
+_SDMS = (
+    (Path(__file__).parent.parent / "benchmarks" / "corpora" / "tests.sdm")
+    .read_text()
+    .split()
+)
+
+
+def test_solve():
+    """
+    Check that the event loop keeps running while a puzzle is solved
+    """
+
+    async def solve():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.ensure_future(tick())
+        result = await aio.solve(_SDMS[0], algorithm=Algorithm.BITMASK)
+        ticker.cancel()
+        return result, ticks
+
+    try:
+        result, ticks = asyncio.run(solve())
+    finally:
+        aio.shutdown()
+    assert result.sdm == _SDMS[0]
+    assert result.state == State.VALID
+    assert ticks > 0
+
+
+def test_solve_many():
+    """
+    Check that the puzzles are read from the input as they are solved, and returned
+    in order if asked to
+    """
+    read: List[int] = []
+
+    async def sdms() -> AsyncIterator[str]:
+        for index, sdm in enumerate(_SDMS):
+            read.append(index)
+            yield sdm
+
+    async def solve_many(solver: AsyncSolver, ordered: bool):
+        results = []
+        async for result in solver.solve_many(
+            sdms(), Algorithm.BITMASK, concurrency=3, ordered=ordered
+        ):
+            # The input is only read while fewer than 3 puzzles are being solved
+            assert len(read) <= len(results) + 3
+            results.append(result)
+        return results
+
+    with AsyncSolver(workers=2) as solver:
+        ordered = asyncio.run(solve_many(solver, ordered=True))
+        read.clear()
+        unordered = asyncio.run(solve_many(solver, ordered=False))
+    assert [result.sdm for result in ordered] == _SDMS
+    assert sorted(unordered) == sorted(ordered)
+    assert all(result.state == State.VALID for result in ordered)
+
+
+def test_cancel():
+    """
+    Check that cancelling a puzzle stops its search in the process, which is then
+    free to solve the next puzzle
+    """
+
+    async def cancel():
+        # Counting the solutions of the empty board takes much longer than the test
+        counting = asyncio.ensure_future(solver.solve(81 * "0", count_limit=10**9))
+        await asyncio.sleep(0.5)
+        counting.cancel()
+        start = time.perf_counter()
+        result = await solver.solve(_SDMS[0], algorithm=Algorithm.BITMASK)
+        return result, time.perf_counter() - start
+
+    with AsyncSolver(workers=1, max_concurrency=1) as solver:
+        result, seconds = asyncio.run(cancel())
+    assert result.state == State.VALID
+    assert seconds < 5
+
+
+def test_aclose():
+    """
+    Check that the event loop keeps running while the solver stops its search and
+    its processes
+    """
+
+    async def aclose():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        async with AsyncSolver(workers=1) as solver:
+            counting = asyncio.ensure_future(
+                solver.solve(81 * "0", count_limit=10**9)
+            )
+            await asyncio.sleep(0.5)
+            ticker = asyncio.ensure_future(tick())
+            start = time.perf_counter()
+        seconds = time.perf_counter() - start
+        ticker.cancel()
+        counting.cancel()
+        return solver, ticks, seconds
+
+    solver, ticks, seconds = asyncio.run(aclose())
+    assert solver._executor is None  # pylint: disable=protected-access
+    assert ticks > 0
+    assert seconds < 5
@@ -0,0 +1,68 @@
+"""
+Unit tests for the batch sudoku solver
+"""
+from pathlib import Path
+
+import pytest
+
+from sudokusolver.batch import solve_many
+from sudokusolver.solver import get_state, State, Algorithm
+
+_TEST_PUZZLES = (
+    (Path(__file__).parent.parent / "benchmarks" / "corpora" / "tests.sdm")
+    .read_text(encoding="utf-8")
+    .split()
+)
+
+
+@pytest.mark.parametrize("algorithm", Algorithm)
+def test_solve_many(algorithm: Algorithm):
+    """
+    Check that all the boards of a batch are solved, and returned in order
+    """
+    solutions = solve_many(_TEST_PUZZLES, algorithm=algorithm)
+    assert len(solutions) == len(_TEST_PUZZLES)
+    for sdm, solution in zip(_TEST_PUZZLES, solutions):
+        assert get_state(solution) == State.VALID
+        solved_sdm = "".join(cell for row in solution.data for cell in row)
+        assert all(given in ("0", solved) for given, solved in zip(sdm, solved_sdm))
+
+
+def test_solve_many_small_batches():
+    """
+    Check that boards are solved when the batch is smaller than the input
+    """
+    solutions = solve_many(_TEST_PUZZLES, batch_size=7)
+    assert [get_state(solution) for solution in solutions] == len(_TEST_PUZZLES) * [
+        State.VALID
+    ]
+
+
+def test_solve_many_invalid_boards():
+    """
+    Check that boards which can't be solved are returned as they were given,
+    without affecting the other boards of the batch
+    """
+    solutions = solve_many(
+        [
+            "110000000000000000000000000000000000000000000000000000000000000000000000000000000",
+            "516849732307605000809700065135060907472591006968370050253186074684207500791050608",
+            _TEST_PUZZLES[0],
+            "123456789234567891345678912456789123567891234678912345789123456891234567912345678",
+        ]
+    )
+    assert [get_state(solution) for solution in solutions] == [
+        State.HAS_DUPLICATES,
+        State.INCOMPLETE,
+        State.VALID,
+        State.HAS_DUPLICATES,
+    ]
+    assert solutions[1].data[1][1] is None
+
+
+def test_solve_many_invalid_input():
+    """
+    Check that an invalid sdm is rejected
+    """
+    with pytest.raises(ValueError):
+        solve_many(["12345"])
@@ -0,0 +1,66 @@
+"""
+Unit tests for the benchmark harness
+"""
+import pytest
+
+from benchmarks import harness
+from sudokusolver.solver import Algorithm
+
+
+@pytest.mark.parametrize("corpus", harness.CORPORA)
+def test_corpora(corpus: str):
+    """
+    Check that the bundled corpora can be read and solved
+    """
+    measurement = harness.measure(
+        harness.Combination(corpus, Algorithm.BITMASK, "sequential"), repeat=1
+    )
+    assert measurement["puzzles"] > 0
+    assert measurement["solved"] == measurement["puzzles"]
+    if corpus == "17clue":
+        assert all(81 - sdm.count("0") == 17 for sdm in harness.read_corpus(corpus))
+
+
+@pytest.mark.parametrize("mode", harness.MODES)
+def test_modes(mode: str):
+    """
+    Check that each mode solves the corpus, with latencies if it returns the stats
+    of each puzzle, and that the start-up of the pool is measured in its modes
+    """
+    measurement = harness.measure(
+        harness.Combination("easy", Algorithm.BITMASK, mode), repeat=2
+    )
+    assert measurement["solved"] == measurement["puzzles"]
+    assert (measurement["p99_ms"] is None) == (mode == "shared")
+    assert (measurement["startup_seconds"] > 0) == (mode in harness.POOL_MODES)
+    assert measurement["startup_seconds"] < measurement["seconds"]
+
+
+def test_percentile():
+    """
+    Check the nearest-rank percentiles
+    """
+    values = list(range(100, 0, -1))
+    assert harness.percentile(values, 0.5) == 50
+    assert harness.percentile(values, 0.99) == 99
+    assert harness.percentile([3.0], 0.99) == 3.0
+
+
+def test_compare():
+    """
+    Check that only the measurements worse than the thresholds are regressions
+    """
+    baseline = {
+        "solved": 10,
+        "puzzles_per_second": 100.0,
+        "p50_ms": 1.0,
+        "p99_ms": 10.0,
+        "peak_rss_kb": 1000,
+    }
+    thresholds = harness.Thresholds(throughput=0.25, latency=0.5, memory=0.25)
+    tolerated = dict(baseline, puzzles_per_second=80.0, p99_ms=14.0, peak_rss_kb=1200)
+    assert not harness.compare(tolerated, baseline, thresholds)
+    worse = dict(baseline, solved=9, puzzles_per_second=70.0, p50_ms=2.0)
+    assert len(harness.compare(worse, baseline, thresholds)) == 3
+    without_latencies = dict(worse, p50_ms=None, p99_ms=None)
+    assert len(harness.compare(without_latencies, baseline, thresholds)) == 2
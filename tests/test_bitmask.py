@@ -0,0 +1,45 @@
+"""
+Unit tests for the propagation of the bitmask solver
+"""
+from typing import List
+
+from sudokusolver.bitmask import _load, _resolve_unambiguous_cells, _resolve_unit
+from sudokusolver.board import Board
+
+# Only 7 is missing from the first row, and it has a single possible place there
+_HIDDEN_SINGLE_SDM = "123456080" + 26 * "0" + "7" + 45 * "0"
+
+# The 7 missing from the first row has no possible place there, although each of its
+# empty cells has possible numbers
+_UNIT_CONTRADICTION_SDM = "123456000" + 6 * "0" + "7" + 65 * "0"
+
+
+def test_resolve_unit():
+    """
+    Check that the number with a single possible place in a row is put there, and
+    that a number with no possible place is reported
+    """
+    masks = _load(Board(_HIDDEN_SINGLE_SDM))
+    placed: List[int] = []
+    assert _resolve_unit(masks, masks.row_unit[0], placed)
+    assert placed == [6]
+    assert masks.cells[6] == 7
+
+    masks = _load(Board(_UNIT_CONTRADICTION_SDM))
+    assert not _resolve_unit(masks, masks.row_unit[0], [])
+
+
+def test_resolve_unambiguous_cells():
+    """
+    Check that the whole board propagation finds the dead end of a row, and fills in
+    the numbers with a single possible place
+    """
+    masks = _load(Board(_UNIT_CONTRADICTION_SDM))
+    assert not _resolve_unambiguous_cells(masks, [])
+
+    sdm = "700152300000000920000300000100004708000000060000000000009000506040907000800006010"
+    masks = _load(Board(sdm))
+    placed: List[int] = []
+    assert _resolve_unambiguous_cells(masks, placed)
+    assert len(placed) == sdm.count("0")
+    assert all(masks.cells)
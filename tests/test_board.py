@@ -0,0 +1,151 @@
+"""
+Unit tests for the sudoku board
+"""
+import pytest
+
+from sudokusolver.board import Board
+from sudokusolver.geometry import PEERS
+
+_SDM = (
+    "509304070726059040040276005107030050208905000050000032002693507060540009975028003"
+)
+
+
+def test_views():
+    """
+    Check that the views read the numbers of the board, 0 meaning an empty cell
+    """
+    board = Board(_SDM)
+    assert list(board.row_view(0)) == [5, 0, 9, 3, 0, 4, 0, 7, 0]
+    assert list(board.col_view(1)) == [0, 2, 4, 0, 0, 5, 0, 6, 7]
+    assert list(board.square_view(4, 5)) == [0, 3, 0, 9, 0, 5, 0, 0, 0]
+
+    board.set_cell(1, 8)
+    assert board.row_view(0)[1] == 8
+    assert board.col_view(1)[0] == 8
+    assert board.square_view(0, 0)[1] == 8
+
+
+def test_data_compatibility():
+    """
+    Check that the data accessors still read and write strings, None meaning an
+    empty cell
+    """
+    board = Board(_SDM)
+    assert list(board.data[0]) == ["5", None, "9", "3", None, "4", None, "7", None]
+    assert board.get_col(1) == [None, "2", "4", None, None, "5", None, "6", "7"]
+    assert board.get_square(0, 0) == ["5", None, "9", "7", "2", "6", None, "4", None]
+
+    board.data[0][1] = "8"
+    board.data[0][0] = None
+    assert board.cells[0:2] == bytearray([0, 8])
+    assert board.to_sdm() == "08" + _SDM[2:]
+
+
+def test_copy():
+    """
+    Check that a copy can be modified without affecting the original board
+    """
+    board = Board(_SDM)
+    board_copy = board.copy()
+    board_copy.set_cell(1, 8)
+    assert board.to_sdm() == _SDM
+    assert board.empty_count == board_copy.empty_count + 1
+
+
+def test_counts():
+    """
+    Check that the duplicates and the empty cells are counted as the cells change
+    """
+    board = Board(_SDM)
+    assert board.empty_count == _SDM.count("0")
+    assert board.duplicate_count == 0
+    assert board.possible_numbers(1) == [1, 8]
+
+    # 5 is already in the row, the column and the square of the cell
+    board.set_cell(1, 5)
+    assert board.duplicate_count == 3
+    assert board.empty_count == _SDM.count("0") - 1
+    assert board.possible_numbers(6) == [1, 2, 6, 8]
+
+    board.set_cell(1, 8)
+    assert board.duplicate_count == 0
+    board.set_cell(1, 0)
+    assert board.empty_count == _SDM.count("0")
+
+    changed = Board.from_cells(board.cells)
+    assert changed.unit_counts == Board(_SDM).unit_counts
+
+
+def test_peers():
+    """
+    Check the cells sharing a row, column or square with a cell
+    """
+    assert all(len(peers) == 20 for peers in PEERS)
+    assert PEERS[0] == (
+        1,
+        2,
+        3,
+        4,
+        5,
+        6,
+        7,
+        8,
+        9,
+        10,
+        11,
+        18,
+        19,
+        20,
+        27,
+        36,
+        45,
+        54,
+        63,
+        72,
+    )
+
+
+@pytest.mark.parametrize("sdm", ["123", _SDM[:80] + "x", _SDM[:80] + "é"])
+def test_invalid_sdm(sdm: str):
+    """
+    Check that an invalid sdm is rejected
+    """
+    with pytest.raises(ValueError):
+        Board(sdm)
+
+
+@pytest.mark.parametrize("box_size", [2, 4, 5])
+def test_other_sizes(box_size: int):
+    """
+    Check that the boards of other sizes keep their symbols and are formatted by
+    square
+    """
+    size = box_size**2
+    symbols = "123456789ABCDEFGHIJKLMNOP"[:size]
+    sdm = "".join(
+        symbols[(box_size * (row % box_size) + row // box_size + col) % size]
+        for row in range(size)
+        for col in range(size)
+    )
+    sdm = "0" + sdm[1:]
+    board = Board(sdm)
+    assert board.geometry.size == size
+    assert board.to_sdm() == sdm
+    assert board.copy().to_sdm() == sdm
+    lines = board.to_ss().splitlines()
+    assert len(lines) == size + box_size - 1
+    assert lines[0] == "|".join(
+        sdm[start : start + box_size].replace("0", ".")
+        for start in range(0, size, box_size)
+    )
+    assert lines[box_size] == "-" * (size + box_size)
+
+
+@pytest.mark.parametrize("sdm", ["5" + 15 * "0", 255 * "0" + "H"])
+def test_invalid_symbol(sdm: str):
+    """
+    Check that the symbols beyond the size of the board are rejected
+    """
+    with pytest.raises(ValueError):
+        Board(sdm)
@@ -0,0 +1,110 @@
+"""
+Unit tests for the solution cache
+"""
+from pathlib import Path
+
+import pytest
+
+from sudokusolver import solver
+from sudokusolver.board import Board
+from sudokusolver.cache import SolutionCache, canonicalize
+from sudokusolver.solver import Algorithm, State
+
+_TEST_PUZZLES_PATH = (
+    Path(__file__).parent.parent / "benchmarks" / "corpora" / "tests.sdm"
+)
+_SDMS = _TEST_PUZZLES_PATH.read_text(encoding="utf-8").split()
+
+
+def _transform(sdm: str) -> str:
+    """
+    :return: an equivalent puzzle, with other digits, the bands and the rows of the
+    first band swapped, the columns of a stack swapped, and transposed
+    """
+    rows = [sdm[row * 9 : row * 9 + 9] for row in range(9)]
+    rows = [rows[1], rows[0], rows[2]] + rows[6:9] + rows[3:6]
+    rows = [row[0:3] + row[5] + row[4] + row[3] + row[6:9] for row in rows]
+    transposed = "".join(rows[row][col] for col in range(9) for row in range(9))
+    return transposed.translate(str.maketrans("123456789", "918273645"))
+
+
+@pytest.mark.parametrize("sdm", _SDMS)
+def test_canonicalize(sdm: str):
+    """
+    Check that equivalent puzzles have the same canonical form, and that the
+    transform goes from the puzzle to its canonical form and back
+    """
+    canonical_sdm, transform = canonicalize(sdm)
+    assert canonicalize(_transform(sdm))[0] == canonical_sdm
+    assert transform.apply(sdm) == canonical_sdm
+    assert transform.revert(canonical_sdm) == sdm
+
+
+def test_solve():
+    """
+    Check that the solution of an equivalent puzzle is found in the cache, and
+    mapped back to the puzzle
+    """
+    cache = SolutionCache()
+    for sdm in _SDMS:
+        cache.solve(Board(sdm), algorithm=Algorithm.BITMASK)
+        solution = cache.solve(Board(_transform(sdm)), algorithm=Algorithm.BITMASK)
+        assert solver.get_state(solution) == State.VALID
+        assert all(
+            digit in ("0", solved)
+            for digit, solved in zip(_transform(sdm), solution.to_sdm())
+        )
+    assert cache.hits == len(_SDMS)
+    assert cache.misses == len(_SDMS)
+
+
+def test_unsolvable():
+    """
+    Check that the puzzles we couldn't solve aren't cached
+    """
+    sdm = "110000000000000000000000000000000000000000000000000000000000000000000000000000000"
+    cache = SolutionCache()
+    assert cache.solve(Board(sdm)).to_sdm() == sdm
+    assert cache.get(sdm) is None
+    assert cache.misses == 2
+
+
+def test_least_recently_used():
+    """
+    Check that the least recently used solution is evicted from memory
+    """
+    cache = SolutionCache(max_size=2)
+    for sdm in _SDMS[0:2]:
+        cache.solve(Board(sdm))
+    assert cache.get(_SDMS[0]) is not None
+    cache.solve(Board(_SDMS[2]))
+    assert cache.get(_SDMS[1]) is None
+    assert cache.get(_SDMS[0]) is not None
+    assert cache.get(_SDMS[2]) is not None
+
+
+def test_database(tmp_path: Path):
+    """
+    Check that the solutions are kept in the database across caches
+    """
+    path = str(tmp_path / "cache.sqlite")
+    cache = SolutionCache(max_size=0, path=path)
+    solution = cache.solve(Board(_SDMS[0])).to_sdm()
+    cache.close()
+
+    cache = SolutionCache(path=path)
+    assert cache.get(_SDMS[0]) == solution
+    assert cache.hits == 1
+    cache.close()
+
+
+def test_other_sizes():
+    """
+    Check that the puzzles of other sizes are solved, but not cached
+    """
+    cache = SolutionCache()
+    sdm = "1000001001000001"
+    assert cache.solve(Board(sdm)).to_sdm() == "1234341221434321"
+    cache.put(sdm, "1234341221434321")
+    assert cache.get(sdm) is None
+    assert cache.hits == 0
@@ -0,0 +1,43 @@
+"""
+Unit tests for the dancing links solver
+"""
+from sudokusolver import dlx
+from sudokusolver.board import Board
+from sudokusolver.stats import SolveStats
+
+_SDM = (
+    "800000000003600000070090200050007000000045700000100030001000068008500010090000400"
+)
+_SOLUTION = (
+    "812753649943682175675491283154237896369845721287169534521974368438526917796318452"
+)
+# The same puzzle with a wrong 2 in its second cell, which has no solution, but
+# which is only found out after a long search
+_NO_SOLUTION_SDM = (
+    "820000000003600000070090200050007000000045700000100030001000068008500010090000400"
+)
+
+
+def _template_lists():
+    # pylint: disable=protected-access
+    template = dlx._get_template()
+    return [list(getattr(template, name)) for name in template.__slots__]
+
+
+def test_back_to_back():
+    """
+    Check that solving a puzzle, whether it has a solution or not, leaves the links
+    of the empty board unchanged, so that the next puzzle is solved from scratch
+    """
+    template = _template_lists()
+    stats = SolveStats()
+    assert not dlx.find_solutions(Board(_NO_SOLUTION_SDM), 1, stats)
+    assert stats.backtracks > 0
+    assert _template_lists() == template
+
+    solutions = dlx.find_solutions(Board(_SDM), 2)
+    assert [solution.to_sdm() for solution in solutions] == [_SOLUTION]
+    assert _template_lists() == template
+
+    assert not dlx.find_solutions(Board(_NO_SOLUTION_SDM), 1)
+    assert dlx.solve(Board(_SDM)).to_sdm() == _SOLUTION
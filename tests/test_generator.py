@@ -0,0 +1,74 @@
+"""
+Unit tests for the puzzle generator
+"""
+import random
+
+import pytest
+
+from sudokusolver import generator, solver
+from sudokusolver.board import Board
+from sudokusolver.generator import Difficulty
+from sudokusolver.solver import Algorithm, CellSelection, State
+from sudokusolver.stats import SolveStats
+
+
+def test_generate_grid():
+    """
+    Check that the grids are solved, and depend on the random generator
+    """
+    grids = {generator.generate_grid(random.Random(seed)).to_sdm() for seed in range(5)}
+    assert len(grids) == 5
+    for grid in grids:
+        assert solver.get_state(Board(grid)) == State.VALID
+
+
+@pytest.mark.parametrize("difficulty", Difficulty)
+@pytest.mark.parametrize("symmetric", [False, True])
+def test_generate_puzzle(difficulty: Difficulty, symmetric: bool):
+    """
+    Check that the puzzles have a unique solution, and the requested difficulty
+    """
+    puzzle = generator.generate_puzzle(random.Random(1), difficulty, symmetric)
+    assert puzzle.difficulty == difficulty
+    assert all(
+        digit in ("0", solved) for digit, solved in zip(puzzle.sdm, puzzle.solution)
+    )
+    if symmetric:
+        assert all(
+            (puzzle.sdm[index] == "0") == (puzzle.sdm[80 - index] == "0")
+            for index in range(81)
+        )
+    stats = SolveStats()
+    solutions = solver.find_solutions(
+        Board(puzzle.sdm),
+        2,
+        algorithm=Algorithm.BITMASK,
+        cell_selection=CellSelection.MIN_CANDIDATES,
+        stats=stats,
+    )
+    assert [solution.to_sdm() for solution in solutions] == [puzzle.solution]
+    assert generator.grade(stats) == difficulty
+
+
+def test_generate_minimal():
+    """
+    Check that without a difficulty, no clue can be removed without making the
+    solution ambiguous
+    """
+    puzzle = generator.generate_puzzle(random.Random(2))
+    board = Board(puzzle.sdm)
+    for index, number in enumerate(board.cells):
+        if number:
+            board.set_cell(index, 0)
+            assert solver.count_solutions(board, algorithm=Algorithm.BITMASK) == 2
+            board.set_cell(index, number)
+
+
+def test_generate_reproducible():
+    """
+    Check that the same seed generates the same puzzles, in one or several processes
+    """
+    puzzles = list(generator.generate(6, seed=3, chunksize=2))
+    assert len({puzzle.sdm for puzzle in puzzles}) == 6
+    assert list(generator.generate(6, seed=3, workers=2, chunksize=2)) == puzzles
+    assert list(generator.generate(6, seed=4)) != puzzles
@@ -0,0 +1,118 @@
+"""
+Unit tests for the packed puzzle format
+"""
+import pickle
+from pathlib import Path
+
+import pytest
+
+from sudokusolver import packed, pipeline
+from sudokusolver.packed import PackedRange, PackedReader
+from sudokusolver.pipeline import PoolOptions
+from sudokusolver.solver import Algorithm, State
+
+_TEST_PUZZLES_PATH = (
+    Path(__file__).parent.parent / "benchmarks" / "corpora" / "tests.sdm"
+)
+_SDMS = _TEST_PUZZLES_PATH.read_text(encoding="utf-8").split()
+
+
+def _write(path: Path, sdms, solutions=None) -> str:
+    with open(path, "wb") as file:
+        assert packed.write(file, sdms, solutions) == len(sdms)
+    return str(path)
+
+
+def test_round_trip(tmp_path: Path):
+    """
+    Check that the puzzles are read back as they were written, 41 bytes each
+    """
+    path = _write(tmp_path / "puzzles.bin", _SDMS)
+    assert Path(path).stat().st_size == packed.HEADER_SIZE + 41 * len(_SDMS)
+    with PackedReader(path) as reader:
+        assert len(reader) == len(_SDMS)
+        assert not reader.has_solutions
+        assert reader.puzzles() == _SDMS
+        assert reader.puzzles(5, 8) == _SDMS[5:8]
+        assert reader.puzzles(40, 100) == _SDMS[40:]
+        with pytest.raises(ValueError):
+            reader.solutions()
+
+
+def test_solutions(tmp_path: Path):
+    """
+    Check that the solutions are read from their own section
+    """
+    solutions = [sdm.replace("0", "1") for sdm in _SDMS]
+    path = _write(tmp_path / "puzzles.bin", _SDMS, solutions)
+    with PackedReader(path) as reader:
+        assert reader.has_solutions
+        assert reader.puzzles() == _SDMS
+        assert reader.solutions(1, 3) == solutions[1:3]
+    with open(tmp_path / "other.bin", "wb") as file:
+        with pytest.raises(ValueError):
+            packed.write(file, _SDMS, solutions[1:])
+
+
+def test_invalid_files(tmp_path: Path):
+    """
+    Check that the files which aren't packed files, or are damaged, are rejected
+    """
+    path = tmp_path / "puzzles.bin"
+    path.write_text("\n".join(_SDMS), encoding="utf-8")
+    with pytest.raises(ValueError):
+        PackedReader(str(path))
+
+    _write(path, _SDMS)
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError):
+        PackedReader(str(path))
+
+    _write(path, _SDMS[:1])
+    path.write_bytes(path.read_bytes()[:-1] + b"\xf0")
+    with PackedReader(str(path)) as reader, pytest.raises(ValueError):
+        reader.puzzles()
+
+
+def test_range(tmp_path: Path):
+    """
+    Check that ranges are split into consecutive ranges, and read in other processes
+    """
+    path = _write(tmp_path / "puzzles.bin", _SDMS)
+    packed_range = PackedRange.of_file(path)
+    assert len(packed_range) == len(_SDMS)
+    assert list(packed_range) == _SDMS
+    parts = list(PackedRange(path, 3, 20).split(5))
+    assert [(part.start, part.stop) for part in parts] == [
+        (3, 8),
+        (8, 13),
+        (13, 18),
+        (18, 20),
+    ]
+    assert sum((part.read() for part in parts), []) == _SDMS[3:20]
+    assert pickle.loads(pickle.dumps(parts[0])) == parts[0]
+
+
+@pytest.mark.parametrize("chunksize", [None, 7])
+def test_solve_parallel(tmp_path: Path, chunksize):
+    """
+    Check that a pool solves the puzzles of a packed file, given only ranges
+    """
+    path = _write(tmp_path / "puzzles.bin", _SDMS)
+    results = list(
+        pipeline.solve_parallel(
+            PackedRange(path, 2, 30),
+            algorithm=Algorithm.BITMASK,
+            options=PoolOptions(workers=2, chunksize=chunksize, ordered=True),
+        )
+    )
+    assert [result.sdm for result in results] == _SDMS[2:30]
+    assert all(result.state == State.VALID for result in results)
+
+
+def test_other_sizes():
+    """
+    Check that only 9x9 puzzles can be packed
+    """
+    with pytest.raises(ValueError):
+        packed.pack([16 * "0"])
@@ -0,0 +1,109 @@
+"""
+Unit tests for the sdm parser
+"""
+import io
+from typing import List
+
+import pytest
+
+from sudokusolver.parsing import SdmError, parse_sdm, parse_sdms, read_sdms
+
+_SDM = (
+    "450109780027400013080627040805301200002095400314070000000000325030702194040503076"
+)
+_DOTS = _SDM.replace("0", ".")
+_UNDERSCORES = _SDM.replace("0", "_")
+
+
+def test_parse_sdms():
+    """
+    Check the usual format: one puzzle per line
+    """
+    assert parse_sdms(f"{_SDM}\n{_SDM}\n".encode()) == [_SDM, _SDM]
+
+
+def test_parse_sdms_variants():
+    """
+    Check that the line endings, whitespace and blank markers don't matter
+    """
+    data = f"{_DOTS}\r\n  {_UNDERSCORES} \r\n\r\n\t{_SDM}".encode()
+    assert parse_sdms(data) == [_SDM, _SDM, _SDM]
+
+
+def test_parse_sdms_errors():
+    """
+    Check that the malformed lines are reported with their line number, and skipped
+    """
+    errors: List[SdmError] = []
+    data = f"{_SDM}\n{_SDM[:80]}\n\n{_SDM[:80]}x\n{_SDM}1\n{_SDM}\n".encode()
+    assert parse_sdms(data, first_line_number=10, on_error=errors.append) == [
+        _SDM,
+        _SDM,
+    ]
+    assert [(error.line_number, error.reason) for error in errors] == [
+        (11, "80 cells instead of one of 16, 81, 256, 625"),
+        (13, "invalid characters 'x'"),
+        (14, "82 cells instead of one of 16, 81, 256, 625"),
+    ]
+    assert (
+        str(errors[0])
+        == f"Line 11: 80 cells instead of one of 16, 81, 256, 625: '{_SDM[:80]}'"
+    )
+    assert parse_sdms(data) == [_SDM, _SDM]
+
+
+def test_parse_sdms_cell_counts():
+    """
+    Check that the puzzles of other sizes than the given ones are reported, and
+    skipped
+    """
+    errors: List[SdmError] = []
+    data = f"{_SDM}\n{16 * '0'}\n{_SDM}\n".encode()
+    assert parse_sdms(data, on_error=errors.append, cell_counts=(81,)) == [_SDM, _SDM]
+    assert [(error.line_number, error.reason) for error in errors] == [
+        (2, "16 cells instead of 81")
+    ]
+    assert parse_sdms(f"{_SDM}\n".encode(), cell_counts=(16,)) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 82, 1000])
+def test_read_sdms(chunk_size: int):
+    """
+    Check that the lines split across chunks are read whole, with their line numbers
+    """
+    errors: List[SdmError] = []
+    data = f"{_SDM}\r\n{_DOTS}\nbad\n{_UNDERSCORES}".encode()
+    sdms = list(read_sdms(io.BytesIO(data), errors.append, chunk_size=chunk_size))
+    assert sdms == [_SDM, _SDM, _SDM]
+    assert [error.line_number for error in errors] == [3]
+
+
+def test_parse_sdm():
+    """
+    Check the parsing of a single puzzle
+    """
+    assert parse_sdm(f" {_DOTS}\n") == _SDM
+    with pytest.raises(ValueError):
+        parse_sdm(_SDM[:80] + "é")
+
+
+def test_parse_other_sizes():
+    """
+    Check the puzzles of other sizes, in both formats
+    """
+    assert parse_sdm("1.3_" + 12 * "0") == "1030" + 12 * "0"
+    assert parse_sdm("1, 2, 0, 4\n. 3 _ 1\n" + 8 * "0 ") == "1204030100000000"
+    assert parse_sdm("g" + 255 * ".") == "G" + 255 * "0"
+    assert parse_sdm(" ".join(["16"] + 255 * ["0"])) == "G" + 255 * "0"
+    with pytest.raises(ValueError, match="invalid characters '5'"):
+        parse_sdm("5" + 15 * "0")
+    with pytest.raises(ValueError, match="invalid numbers '5 x'"):
+        parse_sdm(" ".join(["5", "x", "5"] + 13 * ["0"]))
+    errors: List[SdmError] = []
+    assert parse_sdms(f"{_SDM}\n1,2,3,4\n{16 * '0'}\n".encode(), 1, errors.append) == [
+        _SDM,
+        16 * "0",
+    ]
+    assert [(error.line_number, error.reason) for error in errors] == [
+        (2, "4 cells instead of one of 16, 81, 256, 625")
+    ]
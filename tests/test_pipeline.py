@@ -0,0 +1,47 @@
+"""
+Unit tests for the results and the chunks of the pipeline
+"""
+from typing import Optional
+
+import pytest
+
+from sudokusolver.budget import Budget
+from sudokusolver.pipeline import _ChunkSizer, solve_sdm
+from sudokusolver.solver import Algorithm, State
+
+_SDM = (
+    "800000000003600000070090200050007000000045700000100030001000068008500010090000400"
+)
+
+
+@pytest.mark.parametrize("algorithm", Algorithm)
+@pytest.mark.parametrize("count_limit", [None, 2])
+def test_solve_sdm_timed_out(algorithm: Algorithm, count_limit: Optional[int]):
+    """
+    Check that the puzzle is returned in the TIMED_OUT state when the budget runs
+    out, and solved otherwise
+    """
+    result = solve_sdm(
+        _SDM, algorithm=algorithm, budget=Budget(max_nodes=1), count_limit=count_limit
+    )
+    assert (result.sdm, result.solution, result.state) == (_SDM, _SDM, State.TIMED_OUT)
+    result = solve_sdm(
+        _SDM, algorithm=algorithm, budget=Budget(timeout=60), count_limit=count_limit
+    )
+    assert result.state == State.VALID
+
+
+def test_chunk_sizer_initial_size():
+    """
+    Check that the adaptive chunks start with several puzzles, before the first
+    chunk is timed, and that a given chunk size is kept
+    """
+    sizer = _ChunkSizer(None, max_size=1024, workers=8)
+    assert sizer.size == 32
+    assert _ChunkSizer(None, max_size=8, workers=8).size == 1
+
+    sizer.update(10, 5.0)
+    assert sizer.size == 1
+    sizer = _ChunkSizer(7, max_size=1024, workers=8)
+    sizer.update(10, 5.0)
+    assert sizer.size == 7
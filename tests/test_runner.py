@@ -0,0 +1,440 @@
+"""
+Unit tests for the command line runner
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from sudokusolver import runner
+from sudokusolver.board import format_ss
+from sudokusolver.server import SolveServer
+
+_TEST_PUZZLES_PATH = (
+    Path(__file__).parent.parent / "benchmarks" / "corpora" / "tests.sdm"
+)
+
+
+def _run(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, *args):
+    monkeypatch.setattr("sys.argv", ["sudokusolver", *args])
+    runner.run()
+    return capsys.readouterr().out
+
+
+def test_run_sdm(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+    """
+    Check the output for a single sdm
+    """
+    sdm = "450109780027400013080627040805301200002095400314070000000000325030702194040503076"
+    assert _run(monkeypatch, capsys, "--sdm", sdm) == (
+        f"{sdm}\n"
+        "456|139|782\n"
+        "927|458|613\n"
+        "183|627|549\n"
+        "------------\n"
+        "895|341|267\n"
+        "672|895|431\n"
+        "314|276|958\n"
+        "------------\n"
+        "761|984|325\n"
+        "538|762|194\n"
+        "249|513|876\n"
+        "\n"
+    )
+
+
+def test_run_sdm_other_size(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+):
+    """
+    Check the output for a 4x4 puzzle written as numbers
+    """
+    assert _run(monkeypatch, capsys, "--sdm", "1 0 0 0, 0 0 1 0, 0 1 0 0, 0 0 0 1") == (
+        "1000001001000001\n12|34\n34|12\n------\n21|43\n43|21\n\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--mode", "parallel", "--ordered"],
+        ["--mode", "parallel", "--ordered", "--chunksize", "5", "--max-in-flight", "2"],
+        ["--ordered", "--chunksize", "auto", "--workers", "2"],
+        [
+            "--ordered",
+            "--start-method",
+            "spawn",
+            "--maxtasksperchild",
+            "2",
+            "--chunksize",
+            "10",
+        ],
+        ["--mode", "batch"],
+        ["--mode", "shared", "--workers", "2"],
+        ["--mode", "shared", "--chunksize", "5", "--start-method", "spawn"],
+    ],
+)
+def test_run_file_ordered(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, args
+):
+    """
+    Check that the modes which keep the input order output the same as the
+    sequential mode
+    """
+    expected = _run(
+        monkeypatch,
+        capsys,
+        "--mode",
+        "sequential",
+        "--algorithm",
+        "bitmask",
+        "--file",
+        str(_TEST_PUZZLES_PATH),
+    )
+    output = _run(
+        monkeypatch,
+        capsys,
+        *args,
+        "--algorithm",
+        "bitmask",
+        "--file",
+        str(_TEST_PUZZLES_PATH),
+    )
+    assert output == expected
+
+
+def test_run_batch_other_sizes(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, tmp_path: Path
+):
+    """
+    Check that the batch mode solves the puzzles of other sizes among the 9x9 ones
+    """
+    input_path = tmp_path / "puzzles.sdm"
+    sdms = _TEST_PUZZLES_PATH.read_text().split()[:3]
+    input_path.write_text("\n".join([sdms[0], "1000001001000001", *sdms[1:]]) + "\n")
+    expected = _run(monkeypatch, capsys, "--file", str(input_path))
+    assert "12|34" in expected
+    assert _run(monkeypatch, capsys, "--mode", "batch", "--file", str(input_path)) == (
+        expected
+    )
+
+
+@pytest.mark.parametrize("args", [["--stats"], ["--count"], ["--cache-size", "10"]])
+def test_run_shared_unsupported(monkeypatch: pytest.MonkeyPatch, args):
+    """
+    Check that the options which need more than the solutions are rejected in shared
+    mode
+    """
+    sdm = _TEST_PUZZLES_PATH.read_text().split()[0]
+    monkeypatch.setattr(
+        "sys.argv", ["sudokusolver", "--mode", "shared", "--sdm", sdm, *args]
+    )
+    with pytest.raises(SystemExit):
+        runner.run()
+
+
+def test_run_file_unordered(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+):
+    """
+    Check that all the solutions are output in parallel mode
+    """
+    expected = _run(
+        monkeypatch, capsys, "--mode", "sequential", "--file", str(_TEST_PUZZLES_PATH)
+    )
+    output = _run(
+        monkeypatch, capsys, "--chunksize", "1", "--file", str(_TEST_PUZZLES_PATH)
+    )
+    assert sorted(output.split("\n\n")) == sorted(expected.split("\n\n"))
+
+
+def test_run_output_file(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, tmp_path: Path
+):
+    """
+    Check that the solutions are written to the output file instead of standard
+    output
+    """
+    expected = _run(
+        monkeypatch, capsys, "--mode", "sequential", "--file", str(_TEST_PUZZLES_PATH)
+    )
+    output_path = tmp_path / "solutions.txt"
+    output = _run(
+        monkeypatch,
+        capsys,
+        "--ordered",
+        "--file",
+        str(_TEST_PUZZLES_PATH),
+        "--output",
+        str(output_path),
+    )
+    assert not output
+    assert output_path.read_text(encoding="utf-8") == expected
+
+
+def test_run_output_closed(tmp_path: Path):
+    """
+    Check that the processes are stopped when the output is closed before all the
+    solutions are written to it, as when piped to head
+    """
+    input_path = tmp_path / "puzzles.sdm"
+    input_path.write_text(50 * _TEST_PUZZLES_PATH.read_text(encoding="utf-8"))
+    with subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "sudokusolver",
+            "--file",
+            str(input_path),
+            "--workers",
+            "2",
+            "--max-in-flight",
+            "8",
+        ],
+        cwd=Path(__file__).parent.parent,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as process:
+        assert process.stdout.readline()
+        process.stdout.close()
+        try:
+            _, err = process.communicate(timeout=30)
+        finally:
+            process.kill()
+    assert not err
+    assert process.returncode == 1
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--mode", "sequential"],
+        ["--mode", "batch"],
+        ["--ordered", "--workers", "2"],
+    ],
+)
+def test_run_cache(
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+    tmp_path: Path,
+    args,
+):
+    """
+    Check that the cache doesn't change the output, and counts the repeated puzzles
+    """
+    input_path = tmp_path / "puzzles.sdm"
+    input_path.write_text(
+        2 * _TEST_PUZZLES_PATH.read_text(encoding="utf-8"), encoding="utf-8"
+    )
+    expected = _run(
+        monkeypatch, capsys, "--mode", "sequential", "--file", str(input_path)
+    )
+    cache_path = tmp_path / "cache.sqlite"
+    monkeypatch.setattr(
+        "sys.argv",
+        ["sudokusolver", *args, "--cache-size", "100", "--cache-file", str(cache_path)]
+        + ["--file", str(input_path)],
+    )
+    runner.run()
+    captured = capsys.readouterr()
+    assert captured.out == expected
+    # Cache: <hits> hits, <misses> misses
+    hits, misses = (int(word) for word in captured.err.split()[1::2])
+    assert hits + misses == 86
+    if "sequential" in args:
+        # The puzzles of a batch, and of the chunks solved at the same time, are all
+        # looked up before any of them is solved
+        assert hits == 43
+
+
+@pytest.mark.parametrize("mode", ["sequential", "batch", "parallel"])
+def test_run_stats(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, mode
+):
+    """
+    Check that the statistics of each puzzle are written to standard error, followed
+    by a summary
+    """
+    monkeypatch.setattr(
+        "sys.argv",
+        ["sudokusolver", "--mode", mode, "--stats", "--file", str(_TEST_PUZZLES_PATH)],
+    )
+    runner.run()
+    lines = capsys.readouterr().err.splitlines()
+    puzzle_stats = [json.loads(line) for line in lines[:-2]]
+    assert sorted(stats["sdm"] for stats in puzzle_stats) == sorted(
+        _TEST_PUZZLES_PATH.read_text(encoding="utf-8").split()
+    )
+    assert all(stats["state"] == "valid" for stats in puzzle_stats)
+    nodes = sum(stats["nodes"] for stats in puzzle_stats)
+    assert lines[-2].startswith(f"43 puzzles: {nodes} nodes, ")
+    assert lines[-1].startswith("Time: parse ")
+
+
+@pytest.mark.parametrize("mode", ["sequential", "batch", "parallel"])
+def test_run_max_nodes(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, mode
+):
+    """
+    Check that the puzzles whose budget runs out are output unsolved, and reported
+    """
+    hard_path = _TEST_PUZZLES_PATH.parent / "hard.sdm"
+    monkeypatch.setattr(
+        "sys.argv",
+        ["sudokusolver", "--mode", mode, "--ordered", "--max-nodes", "1"]
+        + ["--algorithm", "bitmask", "--file", str(hard_path)],
+    )
+    runner.run()
+    captured = capsys.readouterr()
+    timed_out = [line.split()[-1] for line in captured.err.splitlines()]
+    assert timed_out
+    outputs = dict(
+        solution.split("\n", 1) for solution in captured.out.split("\n\n") if solution
+    )
+    for sdm in timed_out:
+        assert "0" in sdm
+        assert outputs[sdm] + "\n" == format_ss(sdm)
+    assert sum("." not in output for output in outputs.values()) == len(outputs) - len(
+        timed_out
+    )
+
+
+@pytest.mark.parametrize("mode", ["sequential", "parallel"])
+def test_run_count(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, mode
+):
+    """
+    Check that each puzzle is output with its number of solutions
+    """
+    sdms = _TEST_PUZZLES_PATH.read_text(encoding="utf-8").split()
+    output = _run(
+        monkeypatch,
+        capsys,
+        "--mode",
+        mode,
+        "--ordered",
+        "--count",
+        "--file",
+        str(_TEST_PUZZLES_PATH),
+    )
+    counts = dict(line.split() for line in output.splitlines())
+    assert list(counts) == sdms
+    # The corpus has two puzzles with several solutions
+    assert sorted(counts.values()).count("1") == len(sdms) - 2
+    assert (
+        counts[
+            "123456789000000000000000000000000000000000000000000000000000000000000000000000000"
+        ]
+        == "2"
+    )
+
+    sdm = "123456789000000000000000000000000000000000000000000000000000000000000000000000000"
+    assert _run(monkeypatch, capsys, "--sdm", sdm, "--count", "3") == f"{sdm} 3\n"
+
+
+def test_run_generate(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+    """
+    Check that the generated puzzles are output in sdm format
+    """
+    args = ["generate", "--count", "3", "--seed", "1", "--difficulty", "medium"]
+    output = _run(monkeypatch, capsys, *args, "--workers", "2")
+    sdms = output.splitlines()
+    assert len(sdms) == 3
+    assert all(len(sdm) == 81 and sdm.isdigit() for sdm in sdms)
+    assert _run(monkeypatch, capsys, *args, "--workers", "1") == output
+
+
+def test_run_malformed_lines(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, tmp_path: Path
+):
+    """
+    Check that the malformed lines are reported, and the other puzzles solved
+    """
+    sdm = "450109780027400013080627040805301200002095400314070000000000325030702194040503076"
+    solved = _run(monkeypatch, capsys, "--sdm", sdm)
+    input_path = tmp_path / "input.sdm"
+    input_path.write_bytes(
+        f"{sdm}\r\n{sdm[:40]}\r\n{sdm.replace('0', '.')} \r\n".encode()
+    )
+    monkeypatch.setattr(
+        "sys.argv",
+        ["sudokusolver", "--mode", "sequential", "--file", str(input_path)],
+    )
+    runner.run()
+    captured = capsys.readouterr()
+    assert captured.out == 2 * solved
+    assert (
+        captured.err
+        == f"Line 2: 40 cells instead of one of 16, 81, 256, 625: '{sdm[:40]}'\n"
+    )
+
+
+def test_run_convert(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, tmp_path: Path
+):
+    """
+    Check the conversion to the packed format and back, and solving a packed file
+    """
+    sdms = _TEST_PUZZLES_PATH.read_text(encoding="utf-8").split()
+    packed_path = str(tmp_path / "puzzles.bin")
+    sdm_path = tmp_path / "puzzles.sdm"
+    solutions_path = tmp_path / "solutions.sdm"
+    _run(
+        monkeypatch, capsys, "convert", str(_TEST_PUZZLES_PATH), packed_path, "--solve"
+    )
+    _run(monkeypatch, capsys, "convert", packed_path, str(sdm_path))
+    assert sdm_path.read_text(encoding="ascii").split() == sdms
+    _run(
+        monkeypatch, capsys, "convert", packed_path, str(solutions_path), "--solutions"
+    )
+    solutions = solutions_path.read_text(encoding="ascii").split()
+    assert len(solutions) == len(sdms)
+    assert all("0" not in solution for solution in solutions)
+
+    args = ["--ordered", "--algorithm", "bitmask", "--file"]
+    assert _run(monkeypatch, capsys, *args, packed_path) == _run(
+        monkeypatch, capsys, *args, str(_TEST_PUZZLES_PATH)
+    )
+
+
+def test_run_convert_other_sizes(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture, tmp_path: Path
+):
+    """
+    Check that the puzzles which aren't 9x9 are reported and skipped, without
+    stopping the conversion
+    """
+    sdms = _TEST_PUZZLES_PATH.read_text(encoding="utf-8").split()[:2]
+    input_path = tmp_path / "puzzles.sdm"
+    input_path.write_text(
+        f"{sdms[0]}\n{256 * '0'}\n{625 * '0'}\n{sdms[1]}\n", encoding="ascii"
+    )
+    packed_path = tmp_path / "puzzles.bin"
+    sdm_path = tmp_path / "converted.sdm"
+    monkeypatch.setattr(
+        "sys.argv",
+        ["sudokusolver", "convert", str(input_path), str(packed_path), "--solve"],
+    )
+    runner.run()
+    assert capsys.readouterr().err.splitlines() == [
+        f"Line 2: 256 cells instead of 81: '{256 * '0'}'",
+        f"Line 3: 625 cells instead of 81: '{625 * '0'}'",
+    ]
+    _run(monkeypatch, capsys, "convert", str(packed_path), str(sdm_path))
+    assert sdm_path.read_text(encoding="ascii").split() == sdms
+
+
+def test_run_serve(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+    """
+    Check that the server starts on the given address, and stops on Ctrl-C
+    """
+
+    def serve_forever(_server):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(SolveServer, "serve_forever", serve_forever)
+    monkeypatch.setattr("sys.argv", ["sudokusolver", "serve", "--port", "0"])
+    runner.run()
+    assert capsys.readouterr().err.startswith("Serving on http://127.0.0.1:")
@@ -0,0 +1,152 @@
+"""
+Unit tests for the HTTP server
+"""
+import http.client
+import json
+import multiprocessing
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pytest
+
+from sudokusolver.server import ServerOptions, SolveServer
+from sudokusolver.solver import State
+
+_SDMS = (
+    (Path(__file__).parent.parent / "benchmarks" / "corpora" / "tests.sdm")
+    .read_text()
+    .split()
+)
+
+
+@pytest.fixture(name="url", scope="module")
+def fixture_url() -> Iterator[str]:
+    """
+    :return: the URL of a server running on localhost, on any free port
+    """
+    server = SolveServer(("127.0.0.1", 0), ServerOptions(workers=2, batch_window=0.05))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def _post(url: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+    request = urllib.request.Request(f"{url}/solve", data=body)
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as error:
+        return error.code, json.load(error)
+
+
+def test_solve(url: str):
+    """
+    Check the response for a single puzzle, and for a batch of puzzles
+    """
+    status, response = _post(url, json.dumps({"sdm": _SDMS[0]}).encode())
+    assert status == 200
+    assert response["result"]["sdm"] == _SDMS[0]
+    assert response["result"]["state"] == State.VALID
+    assert "stats" not in response["result"]
+    assert response["seconds"] > 0
+
+    status, response = _post(
+        url, json.dumps({"sdms": _SDMS[:5], "stats": True}).encode()
+    )
+    assert status == 200
+    assert [result["sdm"] for result in response["results"]] == _SDMS[:5]
+    assert all(result["state"] == State.VALID for result in response["results"])
+    assert all(result["stats"]["nodes"] >= 0 for result in response["results"])
+    assert response["batch_size"] >= 5
+
+
+def test_batching(url: str):
+    """
+    Check that the puzzles of concurrent requests are solved in the same batches,
+    and that each request gets the results of its own puzzles
+    """
+    responses: List[Dict[str, Any]] = [{} for _ in range(10)]
+
+    def post(index: int):
+        responses[index] = _post(url, json.dumps({"sdm": _SDMS[index]}).encode())[1]
+
+    threads = [threading.Thread(target=post, args=(index,)) for index in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [response["result"]["sdm"] for response in responses] == _SDMS[:10]
+    assert max(response["batch_size"] for response in responses) > 1
+
+
+@pytest.mark.parametrize(
+    "body,error",
+    [
+        (b"{", "Expecting"),
+        (b"[]", "JSON object"),
+        (b'{"sdms": "123"}', '"sdms"'),
+        (b'{"sdms": ["1", 2]}', "Puzzle 0: 1 cells"),
+    ],
+)
+def test_bad_request(url: str, body: bytes, error: str):
+    """
+    Check that the invalid requests are rejected with the reason
+    """
+    status, response = _post(url, body)
+    assert status == 400
+    assert error in response["error"]
+
+
+def test_health(url: str):
+    """
+    Check the health check, and the unknown paths
+    """
+    with urllib.request.urlopen(f"{url}/health", timeout=30) as response:
+        assert json.load(response) == {"status": "ok"}
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{url}/other", timeout=30)
+    assert error.value.code == 404
+
+
+@pytest.mark.parametrize(
+    "length,status",
+    [
+        (None, 411),
+        ("abc", 400),
+        ("-1", 400),
+        (str(1 << 30), 413),
+    ],
+)
+def test_bad_length(url: str, length: Optional[str], status: int):
+    """
+    Check that the requests without a valid Content-Length are rejected, without
+    reading their body
+    """
+    connection = http.client.HTTPConnection(url.split("//")[1], timeout=30)
+    try:
+        connection.putrequest("POST", "/solve")
+        if length is not None:
+            connection.putheader("Content-Length", length)
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == status
+        assert json.load(response)["error"]
+    finally:
+        connection.close()
+
+
+def test_address_in_use(url: str):
+    """
+    Check that no processes are left running when the address is already in use
+    """
+    children = multiprocessing.active_children()
+    host, port = url.split("//")[1].split(":")
+    with pytest.raises(OSError):
+        SolveServer((host, int(port)), ServerOptions(workers=1))
+    assert multiprocessing.active_children() == children
@@ -0,0 +1,110 @@
+"""
+Unit tests for solving through shared memory
+"""
+import time
+from functools import partial
+from pathlib import Path
+from typing import Tuple
+
+import pytest
+
+from sudokusolver import shared
+from sudokusolver.budget import Budget
+from sudokusolver.pipeline import PoolOptions
+from sudokusolver.solver import Algorithm, State
+from sudokusolver.stats import SolveStats
+
+_SOLVE_RANGE = shared._solve_range  # pylint: disable=protected-access
+
+_SDMS = (
+    (Path(__file__).parent.parent / "benchmarks" / "corpora" / "tests.sdm")
+    .read_text()
+    .split()
+)
+
+
+@pytest.mark.parametrize("block_size,chunksize", [(100000, None), (7, 3), (1, 1)])
+def test_solve_shared(block_size: int, chunksize):
+    """
+    Check that the solutions are read back in order, whatever the blocks and chunks,
+    among puzzles of different sizes
+    """
+    sdms = [*_SDMS[:5], "1000001001000001", "0" * 16, *_SDMS[5:]]
+    stats = SolveStats()
+    results = list(
+        shared.solve_shared(
+            sdms,
+            Algorithm.BITMASK,
+            options=PoolOptions(workers=2, chunksize=chunksize),
+            stats=stats,
+            block_size=block_size,
+        )
+    )
+    assert [result.sdm for result in results] == sdms
+    assert all(result.state == State.VALID for result in results)
+    assert all(
+        digit in ("0", solved)
+        for result in results
+        for digit, solved in zip(result.sdm, result.solution)
+    )
+    assert results[5].solution == "1234341221434321"
+    assert stats.propagated_cells > 0
+
+
+def test_solve_shared_states():
+    """
+    Check that the states other than valid are written back
+    """
+    sdms = [
+        "11" + 79 * "0",
+        81 * "0",
+    ]
+    results = list(
+        shared.solve_shared(
+            sdms,
+            Algorithm.RECURSIVE,
+            options=PoolOptions(workers=1),
+            budget=Budget(max_nodes=1),
+        )
+    )
+    assert [result.state for result in results] == [
+        State.HAS_DUPLICATES,
+        State.TIMED_OUT,
+    ]
+    assert [result.solution for result in results] == sdms
+
+
+def _solve_range_after_flag(bounds: Tuple[int, int], **kwargs) -> SolveStats:
+    """
+    Same as _solve_range(), waiting for the flag file before solving the ranges
+    other than the first one, for at most 10 seconds
+    """
+    flag = Path(kwargs.pop("flag"))
+    deadline = time.monotonic() + 10
+    while bounds[0] and not flag.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return _SOLVE_RANGE(bounds, **kwargs)
+
+
+def test_solve_shared_streaming(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """
+    Check that the results of the first chunk are returned before the other chunks
+    of the block are solved
+    """
+    flag = tmp_path / "flag"
+    # Inherited by the forked processes
+    monkeypatch.setattr(
+        shared,
+        "_solve_range",
+        partial(_solve_range_after_flag, flag=str(flag)),
+    )
+    start = time.monotonic()
+    results = shared.solve_shared(
+        _SDMS[:4],
+        Algorithm.BITMASK,
+        options=PoolOptions(workers=1, chunksize=1, start_method="fork"),
+    )
+    assert next(results).sdm == _SDMS[0]
+    assert time.monotonic() - start < 5
+    flag.touch()
+    assert [result.sdm for result in results] == _SDMS[1:4]
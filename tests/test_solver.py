@@ -1,10 +1,29 @@
 """
 Unit tests for the sudoku solver
 """
+import random
+import time
+from typing import List
+
 import pytest
 
-from sudokusolver.solver import solve, get_state, State, Algorithm
+from sudokusolver.solver import (
+    Algorithm,
+    Cell,
+    CellSelection,
+    State,
+    _Propagation,
+    _Search,
+    _search_in_place,
+    count_solutions,
+    find_solutions,
+    get_state,
+    solve,
+)
 from sudokusolver.board import Board
+from sudokusolver.geometry import ROW_UNIT
+from sudokusolver.budget import UNLIMITED, Budget, BudgetExceeded
+from sudokusolver.stats import SolveStats
 
 
 @pytest.mark.parametrize("algorithm", Algorithm)
@@ -534,9 +553,172 @@ def test_diabolical_10(algorithm: Algorithm):
     )
 
 
-def _test_sudoku(sdm: str, algorithm: Algorithm):
+@pytest.mark.parametrize("algorithm", Algorithm)
+@pytest.mark.parametrize(
+    "sdm",
+    [
+        "123456789000000000000000000000000000000000000000000000000000000000000000000000000",
+        "600050007030000000080409200015300000008000300000007590009501030000000080200070004",
+        "000000000560000032230040079000060000070501090000708000053000920009806500700000004",
+    ],
+)
+def test_min_candidates(algorithm: Algorithm, sdm: str):
+    """
+    Test guessing in the cell with the fewest possible numbers
+    """
+    _test_sudoku(sdm, algorithm=algorithm, cell_selection=CellSelection.MIN_CANDIDATES)
+
+
+@pytest.mark.parametrize("algorithm", Algorithm)
+def test_min_candidates_unsolvable(algorithm: Algorithm):
+    """
+    Test guessing in the cell with the fewest possible numbers, for a sudoku which
+    isn't solvable
+    """
+    _test_incomplete_sudoku(
+        "516849732307605000809700065135060907472591006968370050253186074684207500791050608",
+        algorithm=algorithm,
+        cell_selection=CellSelection.MIN_CANDIDATES,
+    )
+
+
+# The algorithms which fill in the unambiguous cells. Dancing links only selects the
+# constraints with a single candidate, which it counts as guesses.
+_PROPAGATING_ALGORITHMS = [
+    algorithm for algorithm in Algorithm if algorithm != Algorithm.DANCING_LINKS
+]
+
+# Only 7 is missing from the first row, and it has a single possible place there
+_HIDDEN_SINGLE_SDM = "123456080" + 26 * "0" + "7" + 45 * "0"
+
+# The 7 missing from the first row has no possible place there, although each of its
+# empty cells has possible numbers
+_UNIT_CONTRADICTION_SDM = "123456000" + 6 * "0" + "7" + 65 * "0"
+
+
+@pytest.mark.parametrize("algorithm", _PROPAGATING_ALGORITHMS)
+@pytest.mark.parametrize(
+    "sdm",
+    [
+        "000300100805170000001800407730000002000400000016000003029030000000702601567010034",
+        "700152300000000920000300000100004708000000060000000000009000506040907000800006010",
+    ],
+)
+def test_hidden_singles(algorithm: Algorithm, sdm: str):
+    """
+    Check that the sudokus which the cells with a single possible number don't
+    solve, but the numbers with a single possible cell in a row, column or square
+    do, are solved without guessing
+    """
+    stats = SolveStats()
+    board = solve(Board(sdm), algorithm=algorithm, stats=stats)
+    assert get_state(board) == State.VALID
+    assert stats.guesses == 0
+    assert stats.propagated_cells == sdm.count("0")
+
+
+@pytest.mark.parametrize("algorithm", _PROPAGATING_ALGORITHMS)
+def test_unit_contradiction(algorithm: Algorithm):
+    """
+    Check that a number with no possible place in a row is a dead end found before
+    searching
+    """
+    stats = SolveStats()
+    assert not find_solutions(
+        Board(_UNIT_CONTRADICTION_SDM), 1, algorithm=algorithm, stats=stats
+    )
+    assert stats.nodes == 0
+
+
+def test_propagation_resolve_unit():
+    """
+    Check that the number with a single possible place in a row is put there, and
+    that a number with no possible place is reported
+    """
+    board = Board(_HIDDEN_SINGLE_SDM)
+    assert _Propagation(board, None).resolve_unit(ROW_UNIT[0])
+    assert board.cells[6] == 7
+
+    board = Board(_UNIT_CONTRADICTION_SDM)
+    assert not _Propagation(board, None).resolve_unit(ROW_UNIT[0])
+
+
+@pytest.mark.parametrize("algorithm", Algorithm)
+def test_stats(algorithm: Algorithm):
+    """
+    Check what the solver records while solving a sudoku which needs guessing
+    """
+    stats = SolveStats()
+    board = solve(
+        Board(
+            "600050007030000000080409200015300000008000300000007590009501030000000080200070004"
+        ),
+        algorithm=algorithm,
+        stats=stats,
+    )
+    assert get_state(board) == State.VALID
+    assert board.iteration_count == stats.nodes
+    assert stats.nodes > 1
+    assert stats.guesses > stats.backtracks > 0
+    assert stats.max_depth > 1
+    assert stats.search_seconds > 0
+    assert stats.validate_seconds > 0
+
+    total = SolveStats(nodes=1, max_depth=100)
+    total.add(stats)
+    assert total.nodes == stats.nodes + 1
+    assert total.max_depth == 100
+
+
+@pytest.mark.parametrize("algorithm", Algorithm)
+@pytest.mark.parametrize(
+    "budget", [Budget(max_nodes=2), Budget(timeout=1e-9)], ids=["nodes", "timeout"]
+)
+def test_budget(algorithm: Algorithm, budget: Budget):
+    """
+    Check that the search gives up when its budget runs out
+    """
+    sdm = "800000000003600000070090200050007000000045700000100030001000068008500010090000400"
     board = Board(sdm)
-    board = solve(board, algorithm=algorithm)
+    stats = SolveStats()
+    with pytest.raises(BudgetExceeded):
+        solve(board, algorithm=algorithm, stats=stats, budget=budget)
+    assert stats.timeouts == 1
+    assert board.to_sdm() == sdm
+
+    board = solve(board, algorithm=algorithm, budget=Budget(timeout=60))
+    assert get_state(board) == State.VALID
+
+
+@pytest.mark.parametrize("algorithm", Algorithm)
+def test_budget_shared_stats(algorithm: Algorithm):
+    """
+    Check that the nodes of the previous puzzles of shared stats don't count against
+    the budget of the next one
+    """
+    sdm = "600050007030000000080409200015300000008000300000007590009501030000000080200070004"
+    nodes = solve(Board(sdm), algorithm=algorithm).iteration_count
+    stats = SolveStats()
+    for _ in range(2):
+        board = solve(
+            Board(sdm),
+            algorithm=algorithm,
+            stats=stats,
+            budget=Budget(max_nodes=nodes),
+        )
+        assert get_state(board) == State.VALID
+        assert board.iteration_count == nodes
+    assert stats.nodes == 2 * nodes
+    assert stats.timeouts == 0
+
+
+def _test_sudoku(
+    sdm: str,
+    algorithm: Algorithm,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+):
+    board = Board(sdm)
+    board = solve(board, algorithm=algorithm, cell_selection=cell_selection)
     assert get_state(board) == State.VALID
 
 
@@ -546,7 +728,168 @@ def _test_sudoku_has_duplicates(sdm: str, algorithm: Algorithm):
     assert get_state(board) == State.HAS_DUPLICATES
 
 
-def _test_incomplete_sudoku(sdm: str, algorithm: Algorithm):
+def _test_incomplete_sudoku(
+    sdm: str,
+    algorithm: Algorithm,
+    cell_selection: CellSelection = CellSelection.FIRST_EMPTY,
+):
     board = Board(sdm)
-    board = solve(board, algorithm=algorithm)
+    board = solve(board, algorithm=algorithm, cell_selection=cell_selection)
     assert get_state(board) == State.INCOMPLETE
+
+
+@pytest.mark.parametrize("algorithm", Algorithm)
+@pytest.mark.parametrize("cell_selection", CellSelection)
+@pytest.mark.parametrize(
+    "sdm, limit, count",
+    [
+        (
+            "600050007030000000080409200015300000008000300000007590009501030000000080200070004",
+            2,
+            1,
+        ),
+        (
+            "123456789000000000000000000000000000000000000000000000000000000000000000000000000",
+            2,
+            2,
+        ),
+        (
+            "123456789000000000000000000000000000000000000000000000000000000000000000000000000",
+            5,
+            5,
+        ),
+        (
+            "000000000000003085001020000000507000004000100090000000500000073002010000000040009",
+            3,
+            1,
+        ),
+        (
+            "516849732307605000809700065135060907472591006968370050253186074684207500791050608",
+            2,
+            0,
+        ),
+        (
+            "110000000000000000000000000000000000000000000000000000000000000000000000000000000",
+            2,
+            0,
+        ),
+    ],
+    ids=["unique", "several", "limit", "17-clue", "unsolvable", "duplicates"],
+)
+def test_count_solutions(
+    algorithm: Algorithm, cell_selection: CellSelection, sdm: str, limit: int, count
+):
+    """
+    Check that the search goes on after the first solution, and stops at the limit
+    """
+    board = Board(sdm)
+    solutions = find_solutions(
+        board, limit, algorithm=algorithm, cell_selection=cell_selection
+    )
+    assert len(solutions) == count
+    assert len({solution.to_sdm() for solution in solutions}) == count
+    for solution in solutions:
+        assert get_state(solution) == State.VALID
+        assert all(
+            digit in ("0", solved) for digit, solved in zip(sdm, solution.to_sdm())
+        )
+    assert board.to_sdm() == sdm
+    assert (
+        count_solutions(
+            board, limit, algorithm=algorithm, cell_selection=cell_selection
+        )
+        == count
+    )
+
+
+def _pattern_puzzle(box_size: int, holes: float, seed: int) -> str:
+    """
+    :return: a puzzle made from a solved board of the given box size, with the given
+    fraction of its cells emptied at random
+    """
+    size = box_size**2
+    symbols = "123456789ABCDEFGHIJKLMNOP"[:size]
+    rng = random.Random(seed)
+    return "".join(
+        "0"
+        if rng.random() < holes
+        else symbols[(box_size * (row % box_size) + row // box_size + col) % size]
+        for row in range(size)
+        for col in range(size)
+    )
+
+
+@pytest.mark.parametrize("algorithm", Algorithm)
+@pytest.mark.parametrize("box_size,holes", [(2, 0.7), (4, 0.6), (5, 0.4)])
+def test_other_sizes(algorithm: Algorithm, box_size: int, holes: float):
+    """
+    Check that the boards of other sizes are solved, whatever the algorithm
+    """
+    sdm = _pattern_puzzle(box_size, holes, seed=box_size)
+    solution = solve(Board(sdm), algorithm=algorithm)
+    assert get_state(solution) == State.VALID
+    assert all(digit in ("0", solved) for digit, solved in zip(sdm, solution.to_sdm()))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_large_board_budget(seed: int):
+    """
+    Check that a 25x25 puzzle with a realistic number of empty cells, which may take
+    minutes to solve, is either solved or given up on within its budget
+    """
+    sdm = _pattern_puzzle(5, 0.55, seed)
+    start = time.perf_counter()
+    try:
+        solution = solve(Board(sdm), budget=Budget(timeout=0.5))
+    except BudgetExceeded:
+        pass
+    else:
+        assert get_state(solution) == State.VALID
+        assert all(
+            digit in ("0", solved) for digit, solved in zip(sdm, solution.to_sdm())
+        )
+    assert time.perf_counter() - start < 5
+
+
+def test_count_4x4():
+    """
+    Check the number of 4x4 solved boards
+    """
+    assert count_solutions(Board(16 * "0"), limit=1000) == 288
+
+
+def test_search_in_place_undo():
+    """
+    Check that the in-place search puts the board back as it was once all its
+    guesses failed, and that the solutions it found don't share anything with it
+    """
+    sdm = "800000000003600000070090200050007000000045700000100030001000068008500010090000400"
+    board = Board(sdm)
+    original = (
+        bytes(board.cells),
+        bytes(board.unit_counts),
+        board.empty_count,
+        board.duplicate_count,
+    )
+    stats = SolveStats()
+    # Looking for a second solution of a puzzle with a single one backtracks out of
+    # every guess
+    search = _Search(CellSelection.FIRST_EMPTY, stats, UNLIMITED, limit=2)
+    trail: List[Cell] = []
+    assert not _search_in_place(board, trail, search, 1)
+    assert stats.backtracks > 0
+    assert not trail
+    assert (
+        bytes(board.cells),
+        bytes(board.unit_counts),
+        board.empty_count,
+        board.duplicate_count,
+    ) == original
+
+    assert len(search.solutions) == 1
+    solution = search.solutions[0]
+    assert get_state(solution) == State.VALID
+    assert solution.cells is not board.cells
+    assert solution.unit_counts is not board.unit_counts
+    solution.set_cell(0, 0)
+    assert board.to_sdm() == sdm
@@ -0,0 +1,157 @@
+"""
+Check that the C extension of the bitmask solver, if it was built, behaves like the
+pure-Python solver
+"""
+import random
+from dataclasses import astuple, replace
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pytest
+
+from sudokusolver import bitmask
+from sudokusolver.board import Board
+from sudokusolver.budget import (
+    UNLIMITED,
+    Budget,
+    BudgetExceeded,
+    Cancelled,
+    Countdown,
+)
+from sudokusolver.stats import SolveStats
+
+if bitmask._speedups is None:  # pylint: disable=protected-access
+    pytest.skip("The C extension isn't built, or is disabled", allow_module_level=True)
+
+_CORPORA_PATH = Path(__file__).parent.parent / "benchmarks" / "corpora"
+
+
+def _pattern_puzzle(box_size: int, holes: float, seed: int) -> str:
+    """
+    :return: a puzzle made from a solved board of the given box size, with the given
+    fraction of its cells emptied at random
+    """
+    size = box_size**2
+    symbols = "123456789ABCDEFGHIJKLMNOP"[:size]
+    rng = random.Random(seed)
+    return "".join(
+        "0"
+        if rng.random() < holes
+        else symbols[(box_size * (row % box_size) + row // box_size + col) % size]
+        for row in range(size)
+        for col in range(size)
+    )
+
+
+_SDMS = (
+    (_CORPORA_PATH / "tests.sdm").read_text().split()
+    + (_CORPORA_PATH / "hard.sdm").read_text().split()[:10]
+    + [
+        # Duplicates
+        "11" + 79 * "0",
+        # Unsolvable
+        "12345678" + 9 * "0" + "9" + 63 * "0",
+        81 * "0",
+        _pattern_puzzle(2, 0.8, seed=1),
+        _pattern_puzzle(4, 0.6, seed=2),
+        _pattern_puzzle(5, 0.4, seed=3),
+    ]
+)
+
+
+def _find_solutions(
+    monkeypatch: pytest.MonkeyPatch,
+    compiled: bool,
+    sdm: str,
+    limit: int,
+    min_candidates: bool,
+    countdown: Countdown = UNLIMITED,
+) -> Tuple[Optional[List[str]], SolveStats]:
+    """
+    :return: the solutions found by the C extension or by the pure-Python solver,
+    None if the search raised BudgetExceeded, and the stats without the timings
+    """
+    with monkeypatch.context() as context:
+        if not compiled:
+            context.setattr(bitmask, "_speedups", None)
+        stats = SolveStats()
+        try:
+            solutions: Optional[List[str]] = [
+                solution.to_sdm()
+                for solution in bitmask.find_solutions(
+                    Board(sdm), limit, min_candidates, stats, countdown
+                )
+            ]
+        except BudgetExceeded:
+            solutions = None
+    return solutions, replace(
+        stats,
+        parse_seconds=0,
+        propagate_seconds=0,
+        search_seconds=0,
+        validate_seconds=0,
+    )
+
+
+@pytest.mark.parametrize("min_candidates", [False, True])
+@pytest.mark.parametrize("limit", [1, 2])
+@pytest.mark.parametrize("sdm", _SDMS)
+def test_parity(
+    monkeypatch: pytest.MonkeyPatch, sdm: str, limit: int, min_candidates: bool
+):
+    """
+    Check that both solvers find the same solutions, with the same statistics
+    """
+    compiled = _find_solutions(monkeypatch, True, sdm, limit, min_candidates)
+    python = _find_solutions(monkeypatch, False, sdm, limit, min_candidates)
+    assert compiled[0] == python[0]
+    assert astuple(compiled[1]) == astuple(python[1])
+
+
+@pytest.mark.parametrize("max_nodes", [1, 5, 50])
+def test_budget_parity(monkeypatch: pytest.MonkeyPatch, max_nodes: int):
+    """
+    Check that both solvers stop at the same node when the budget runs out
+    """
+    budget = Budget(max_nodes=max_nodes)
+    results = [
+        _find_solutions(monkeypatch, compiled, 81 * "0", 1000, False, budget.start())
+        for compiled in (True, False)
+    ]
+    assert results[0][0] is None
+    assert results[0] == results[1]
+    assert results[0][1].nodes == max_nodes + 1
+
+
+@pytest.mark.parametrize("max_nodes", [5, 60])
+def test_budget_parity_shared_stats(monkeypatch: pytest.MonkeyPatch, max_nodes: int):
+    """
+    Check that both solvers give the same outcomes when the stats are shared by
+    several puzzles, whose nodes don't count against the budget of the next ones
+    """
+    budget = Budget(max_nodes=max_nodes)
+    outcomes = []
+    for compiled in (True, False):
+        with monkeypatch.context() as context:
+            if not compiled:
+                context.setattr(bitmask, "_speedups", None)
+            stats = SolveStats()
+            solved = []
+            for sdm in _SDMS:
+                try:
+                    bitmask.find_solutions(Board(sdm), 1, False, stats, budget.start())
+                    solved.append(True)
+                except BudgetExceeded:
+                    solved.append(False)
+            outcomes.append((solved, stats.nodes))
+    assert outcomes[0] == outcomes[1]
+    assert any(outcomes[0][0]) and not all(outcomes[0][0])
+
+
+def test_cancelled():
+    """
+    Check that the exceptions raised by the countdown stop the search
+    """
+    countdown = Countdown(cancelled=lambda: True)
+    with pytest.raises(Cancelled):
+        bitmask.find_solutions(Board(81 * "0"), 1, countdown=countdown)